@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩包输入（zip / tar）
+压缩包中的音频文件用虚拟路径 "压缩包路径!/内部路径" 表示，和普通文件一样排队、分配和上报，
+转换时成员数据直接通过管道交给解码的ffmpeg进程，不需要先解压到磁盘。
+zip 成员可以并发读取（每个任务独立解压各自的成员）；tar（包括 .tar.gz 等压缩格式）
+不能随机访问，同一个包的成员读取需要串行，读出的成员数据较小时放在内存中，较大时写入临时文件。
+打开的压缩包在任务之间共享，最多同时保持 MAX_OPEN_READERS 个（最近最少使用的先关闭），
+长时间运行的队列/分布式工作节点不会一直占用用过的所有压缩包。
+输出文件按压缩包内的目录结构保存在以压缩包命名的子文件夹中（文件夹名保留扩展名：pack.tar.gz -> pack_tar.gz）。
+输出目录也可以是压缩包（ArchiveWriter）：完成的输出文件由单个写入线程依次追加到压缩包中，
+不再需要转换后重新读取整个输出目录打包
+"""
+
+import os
+import queue
+import re
+import shutil
+import tarfile
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+# 虚拟路径中压缩包和内部路径的分隔符
+MEMBER_SEPARATOR = "!/"
+
+# 压缩包扩展名 -> 格式（格式名用于源文件格式筛选）
+ARCHIVE_SUFFIXES = {
+    ".zip": "zip",
+    ".tar": "tar", ".tar.gz": "tar", ".tgz": "tar", ".tar.bz2": "tar", ".tbz2": "tar",
+    ".tar.xz": "tar", ".txz": "tar",
+}
+ARCHIVE_FORMATS = ("zip", "tar")
+
+# 源文件格式筛选中只选了压缩包时，转换压缩包中所有这些格式的文件
+MEMBER_FORMATS = ("mp3", "wav", "flac", "aac", "m4a", "ogg", "wma", "ape", "tta")
+
+# 虚拟路径：第一个以压缩包扩展名结尾、后面跟着 "!/" 的部分是压缩包
+# （Windows 上经过 Path 转换后分隔符可能变为 "!\"）
+_MEMBER_RE = re.compile(
+    r"^(.*?(?:%s))![/\\](.+)$" % "|".join(re.escape(suffix) for suffix in ARCHIVE_SUFFIXES),
+    re.IGNORECASE | re.DOTALL)
+
+# 通过管道无法可靠解码、需要先解压为临时文件的格式（容器索引可能在文件末尾）
+SEEKABLE_FORMATS = ("m4a", "ape")
+
+# 解压/转发成员数据时每次读取的大小
+CHUNK_SIZE = 1024 * 1024
+
+# tar 成员读出后放在内存中的大小上限，超过时写入临时文件
+MEMORY_LIMIT = 32 * 1024 * 1024
+
+# 同时保持打开的压缩包数上限
+MAX_OPEN_READERS = 8
+
+
+def archive_format(path: str) -> Optional[str]:
+    """压缩包格式（zip / tar），不是压缩包时返回None"""
+    name = str(path).lower()
+    for suffix, fmt in ARCHIVE_SUFFIXES.items():
+        if name.endswith(suffix):
+            return fmt
+    return None
+
+
+def is_member(path) -> bool:
+    """是否为压缩包成员的虚拟路径"""
+    return _MEMBER_RE.match(str(path)) is not None
+
+
+def member_path(archive: str, name: str) -> str:
+    return f"{archive}{MEMBER_SEPARATOR}{name}"
+
+
+def split_member(path) -> Tuple[str, str]:
+    """虚拟路径 -> (压缩包路径, 内部路径)"""
+    match = _MEMBER_RE.match(str(path))
+    if match is None:
+        raise ValueError(f"不是压缩包成员: {path}")
+    archive, name = match.groups()
+    if os.sep != "/":
+        name = name.replace(os.sep, "/")
+    return archive, name
+
+
+def archive_stem(archive: str) -> str:
+    """压缩包去掉所有扩展名后的名称（album.tar.gz -> album）"""
+    name = os.path.basename(archive)
+    lower = name.lower()
+    for suffix in sorted(ARCHIVE_SUFFIXES, key=len, reverse=True):
+        if lower.endswith(suffix):
+            return name[:-len(suffix)]
+    return os.path.splitext(name)[0]
+
+
+def output_folder(archive: str) -> str:
+    """
+    成员输出所在的子文件夹名：压缩包名，扩展名的 "." 换为 "_"（album.zip -> album_zip，
+    album.tar.gz -> album_tar.gz），同名的 zip 和 tar 不会输出到同一个文件夹，也不会与压缩包本身重名
+    """
+    name = os.path.basename(archive)
+    stem = archive_stem(archive)
+    return f"{stem}_{name[len(stem) + 1:]}" if len(name) > len(stem) + 1 else f"{stem}_"
+
+
+def safe_relative_path(name: str) -> PurePosixPath:
+    """
+    压缩包内部路径转换为安全的相对路径
+    去掉开头的 / 、盘符和 .. ，避免输出写到输出目录之外
+    """
+    parts = [part for part in name.replace("\\", "/").split("/")
+             if part not in ("", ".", "..") and not part.endswith(":")]
+    return PurePosixPath(*parts) if parts else PurePosixPath("_")
+
+
+def output_path(path: str, output_format: str, output_dir: Optional[str]) -> Path:
+    """成员的输出路径：输出目录（默认为压缩包所在目录）/压缩包名/内部目录/文件名.格式"""
+    archive, name = split_member(path)
+    folder = Path(output_dir) if output_dir else Path(archive).parent
+    relative = safe_relative_path(name)
+    return folder / output_folder(archive) / relative.parent / f"{relative.stem}.{output_format}"
+
+
+def folder_conflicts(paths: Iterable, output_dir: Optional[str]) -> Dict[str, str]:
+    """
+    输出到同一目录时子文件夹重名的压缩包（不同目录下的同名压缩包），
+    返回 {压缩包: 先出现的同名压缩包}，这些压缩包的成员会互相覆盖输出
+    """
+    if not output_dir:
+        return {}
+    owners: Dict[str, str] = {}
+    conflicts: Dict[str, str] = {}
+    for path in paths:
+        if not is_member(path):
+            continue
+        archive = os.path.abspath(split_member(path)[0])
+        owner = owners.setdefault(output_folder(archive).lower(), archive)
+        if owner != archive:
+            conflicts[archive] = owner
+    return conflicts
+
+
+class _ArchiveReader:
+    """
+    一个打开的压缩包（在任务之间共享，避免每个成员都重新读取目录）
+    成员按规范化后的内部路径索引（"./a.wav"、"../a.wav" 都记为 "a.wav"），
+    这样虚拟路径经过 os.path.abspath 等规范化后仍然能找到成员
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.format = archive_format(path)
+        self._lock = threading.Lock()
+        # 正在使用的调用数；移出缓存后最后一个使用者结束时关闭（由 _readers_lock 保护）
+        self.users = 0
+        self.evicted = False
+        # 打开时的文件状态，压缩包被替换后重新打开
+        stat = os.stat(path)
+        self.signature = (stat.st_size, stat.st_mtime_ns)
+        if self.format == "zip":
+            # ZipFile 的读取可以在多个线程中并发进行
+            self._zip = zipfile.ZipFile(path)
+            self._tar = None
+            members = [(info.filename, info, info.file_size)
+                       for info in self._zip.infolist() if not info.is_dir()]
+        else:
+            self._zip = None
+            self._tar = tarfile.open(path)
+            members = [(member.name, member, member.size)
+                       for member in self._tar.getmembers() if member.isfile()]
+        # 规范化的内部路径 -> (成员信息, 解压后大小)，重名时保留第一个
+        self._members: Dict[str, tuple] = {}
+        for name, info, size in members:
+            self._members.setdefault(str(safe_relative_path(name)), (info, size))
+
+    def names(self) -> List[str]:
+        return list(self._members)
+
+    def size(self, name: str) -> int:
+        return self._members[name][1]
+
+    def open(self, name: str, temp_dir: Optional[str] = None) -> BinaryIO:
+        """
+        打开成员（zip 为流式读取；tar 串行读出，不超过 MEMORY_LIMIT 时放在内存中，
+        否则写入 temp_dir 中的临时文件，多个任务同时读取大成员时不会占满内存）
+        """
+        if self._zip is not None:
+            return self._zip.open(self._members[name][0])
+        spool = tempfile.SpooledTemporaryFile(max_size=MEMORY_LIMIT, dir=temp_dir)
+        try:
+            self.copy(name, spool)
+            spool.seek(0)
+        except BaseException:
+            spool.close()
+            raise
+        return spool
+
+    def copy(self, name: str, target: BinaryIO):
+        """把成员数据写入 target（tar 在锁内串行读取）"""
+        info = self._members[name][0]
+        if self._zip is not None:
+            with self._zip.open(info) as stream:
+                shutil.copyfileobj(stream, target, CHUNK_SIZE)
+            return
+        with self._lock:
+            shutil.copyfileobj(self._tar.extractfile(info), target, CHUNK_SIZE)
+
+    def close(self):
+        # zip 已经打开的成员流各自持有文件引用，关闭压缩包后仍可读完
+        (self._zip or self._tar).close()
+
+
+# 按最近使用顺序排列，最早使用的在前
+_readers: "OrderedDict[str, _ArchiveReader]" = OrderedDict()
+_readers_lock = threading.Lock()
+
+
+def _evict(key: str):
+    """移出缓存，没有使用者时立即关闭（调用时持有 _readers_lock）"""
+    reader = _readers.pop(key)
+    reader.evicted = True
+    if reader.users == 0:
+        reader.close()
+
+
+@contextmanager
+def _using(archive: str):
+    """取得共享的压缩包对象，使用期间不会被关闭"""
+    key = os.path.abspath(archive)
+    stat = os.stat(key)
+    with _readers_lock:
+        reader = _readers.get(key)
+        if reader is not None and reader.signature != (stat.st_size, stat.st_mtime_ns):
+            # 压缩包已被替换：正在使用旧对象的任务仍可读完
+            _evict(key)
+            reader = None
+        if reader is None:
+            reader = _readers[key] = _ArchiveReader(key)
+            while len(_readers) > MAX_OPEN_READERS:
+                _evict(next(iter(_readers)))
+        else:
+            _readers.move_to_end(key)
+        reader.users += 1
+    try:
+        yield reader
+    finally:
+        with _readers_lock:
+            reader.users -= 1
+            if reader.evicted and reader.users == 0:
+                reader.close()
+
+
+def close_readers():
+    """关闭所有打开的压缩包（批量转换和队列处理结束时调用；正在使用的在用完后关闭）"""
+    with _readers_lock:
+        for key in list(_readers):
+            _evict(key)
+
+
+def list_members(archive: str, formats: Iterable[str]) -> List[str]:
+    """压缩包中指定格式的音频文件（虚拟路径，按内部路径排序）"""
+    formats = {f.lower() for f in formats}
+    with _using(archive) as reader:
+        names = sorted(name for name in reader.names()
+                       if os.path.splitext(name)[1][1:].lower() in formats)
+    return [member_path(archive, name) for name in names]
+
+
+def exists(path: str) -> bool:
+    """虚拟路径对应的成员是否存在（普通路径检查文件是否存在）"""
+    if not is_member(path):
+        return os.path.exists(path)
+    archive, name = split_member(path)
+    try:
+        with _using(archive) as reader:
+            reader.size(name)
+    except (KeyError, OSError, zipfile.BadZipFile, tarfile.TarError):
+        return False
+    return True
+
+
+def member_size(path: str) -> int:
+    """成员解压后的大小"""
+    archive, name = split_member(path)
+    with _using(archive) as reader:
+        return reader.size(name)
+
+
+def open_member(path: str, temp_dir: Optional[str] = None) -> BinaryIO:
+    """打开成员数据流（调用方负责关闭，可以用 with）；temp_dir 为大的 tar 成员的临时文件目录"""
+    archive, name = split_member(path)
+    with _using(archive) as reader:
+        return reader.open(name, temp_dir)
+
+
+def extract_to(path: str, folder: str) -> str:
+    """
+    把成员解压为临时文件（需要随机访问或多次读取时使用），返回文件路径
+    文件名保留扩展名，便于ffmpeg识别格式
+    """
+    archive, name = split_member(path)
+    target = os.path.join(folder, "input" + os.path.splitext(name)[1].lower())
+    with open(target, "wb") as f, _using(archive) as reader:
+        reader.copy(name, f)
+    return target
+
+
+# 已经压缩过的输出格式在 zip 中直接存储，不再压缩
+_STORED_FORMATS = ("mp3", "flac", "aac", "ogg", "m4a")
+
+# tar 输出的压缩方式（流式写入）
+_TAR_MODES = {".tar": "w|", ".tar.gz": "w|gz", ".tgz": "w|gz", ".tar.bz2": "w|bz2",
+              ".tbz2": "w|bz2", ".tar.xz": "w|xz", ".txz": "w|xz"}
+
+
+class ArchiveWriter:
+    """
+    把输出文件依次写入 zip/tar 压缩包
+    各个工作线程调用 add 提交文件，由一个写入线程按完成顺序串行写入，写入后删除文件；
+    压缩包先写到 "路径.part"，close 时才改名为最终路径，未完成的压缩包不会被当作交付结果
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        self.error: Optional[str] = None
+        self._partial = path + ".part"
+        self._queue: "queue.Queue[Optional[Tuple[str, str]]]" = queue.Queue()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        if archive_format(path) == "zip":
+            self._zip = zipfile.ZipFile(self._partial, "w")
+            self._tar = None
+        else:
+            suffix = next(suffix for suffix in sorted(_TAR_MODES, key=len, reverse=True)
+                          if path.lower().endswith(suffix))
+            self._zip = None
+            self._tar = tarfile.open(self._partial, _TAR_MODES[suffix])
+        self._thread = threading.Thread(target=self._run, name="archive-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, file_path: str, name: str):
+        """提交一个已写完的输出文件，name 为压缩包内的路径"""
+        self._queue.put((file_path, name))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            file_path, name = item
+            if self.error is None:
+                try:
+                    self._write(file_path, name)
+                    self.count += 1
+                except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    # 写入失败后压缩包已不完整，之后的文件只删除不再写入
+                    self.error = f"{name}: {e}"
+            try:
+                os.remove(file_path)
+            except OSError:
+                pass
+
+    def _write(self, file_path: str, name: str):
+        if self._zip is not None:
+            fmt = os.path.splitext(name)[1][1:].lower()
+            compression = zipfile.ZIP_STORED if fmt in _STORED_FORMATS else zipfile.ZIP_DEFLATED
+            self._zip.write(file_path, name, compress_type=compression)
+        else:
+            self._tar.add(file_path, name, recursive=False)
+
+    def close(self) -> Optional[str]:
+        """等待所有文件写完并结束压缩包，返回写入错误（没有错误时为None）"""
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            (self._zip or self._tar).close()
+            if self.error is None:
+                os.replace(self._partial, self.path)
+        except (OSError, zipfile.BadZipFile, tarfile.TarError) as e:
+            self.error = self.error or str(e)
+        if self.error is not None:
+            # 不完整的压缩包不以最终文件名交付
+            try:
+                os.remove(self._partial)
+            except OSError:
+                pass
+        return self.error
@@ -0,0 +1,903 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+asyncio转换引擎
+每个任务直接运行一个ffmpeg子进程（asyncio.create_subprocess_exec），
+由信号量限制并发数，通过 -progress 输出解析进度，支持超时和取消。
+事件循环运行在独立线程中，发出的事件与 MusicConverter 完全相同，
+界面、命令行和基准测试无需区分引擎。
+压缩包成员只需要一遍处理时，数据在线程中解压后经标准输入直接交给ffmpeg。
+大量短小文件（音效、采样）可以分组，每组由一个ffmpeg进程同时转换（多个输入、多个输出），
+进程失败时逐个文件重新转换
+"""
+
+import os
+import re
+import time
+import asyncio
+import threading
+import tarfile
+import zipfile
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from pydub import AudioSegment
+
+import archive
+import silence
+from cue import CueSheet, is_cue, parse_cue
+from converter import MusicConverter, _JobContext, codec_args, format_filter, metadata_args
+from devices import DeviceSlots, job_devices
+from ffmpeg_config import subprocess_kwargs
+from scratch import wav_size
+from verify import parse_duration, parse_sample_bits, parse_stream_layout
+from options import ConversionOptions
+from events import (BatchStarted, BatchProgress, BatchFinished, JobQueued, JobStarted,
+                    JobFinished)
+
+# 从ffmpeg日志中解析输入时长
+_DURATION_RE = re.compile(rb"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+
+
+def _parse_duration(log: bytes) -> Optional[float]:
+    """解析ffmpeg日志中的输入时长（秒）"""
+    match = _DURATION_RE.search(log)
+    if not match:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+class _EventLoopThread:
+    """在后台线程中运行的事件循环"""
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="async-engine-loop", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """在事件循环中执行协程并等待结果（在其他线程中调用）"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+
+    def call_soon(self, callback, *args):
+        """线程安全地在事件循环中调用函数"""
+        self.loop.call_soon_threadsafe(callback, *args)
+
+    def close(self):
+        """停止事件循环"""
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+
+class AsyncFFmpegConverter(MusicConverter):
+    """直接驱动ffmpeg子进程的asyncio转换引擎"""
+
+    ENGINE = "ffmpeg-async"
+
+    # 单个任务的默认超时（秒），与线程池引擎一致
+    DEFAULT_JOB_TIMEOUT = 300
+
+    # 可以分组转换的小文件大小上限（字节）
+    DEFAULT_BATCH_MAX_BYTES = 4 * 1024 * 1024
+
+    def __init__(self, max_workers: Optional[int] = None, ffmpeg_path: Optional[str] = None,
+                 job_timeout: Optional[float] = DEFAULT_JOB_TIMEOUT, batch_files: int = 1,
+                 batch_max_bytes: int = DEFAULT_BATCH_MAX_BYTES):
+        """
+        初始化转换器
+
+        Args:
+            max_workers: 同时运行的ffmpeg进程数，如果为None则使用CPU核数
+            ffmpeg_path: ffmpeg可执行文件路径，如果为None则使用pydub配置的路径
+            job_timeout: 单个任务的超时（秒），为None时不限制
+            batch_files: 批量转换时每个ffmpeg进程最多转换的小文件数，1表示不分组
+            batch_max_bytes: 参与分组的文件大小上限（字节）
+        """
+        super().__init__(max_workers or os.cpu_count() or 1)
+        self.ffmpeg_path = ffmpeg_path or AudioSegment.converter
+        self.job_timeout = job_timeout
+        self.batch_files = batch_files
+        self.batch_max_bytes = batch_max_bytes
+        self._loop_thread: Optional[_EventLoopThread] = None
+        self._loop_lock = threading.Lock()
+        # 正在执行的任务（用于取消）：队列和分布式工作节点会从多个线程同时调用 convert_single_file，
+        # 只在事件循环线程中修改
+        self._active_tasks: Set[asyncio.Task] = set()
+        # 所有任务拆分出的音轨共用的并发名额（在事件循环中创建，事件循环关闭时丢弃）
+        self._track_slots: Optional[asyncio.Semaphore] = None
+        # 输出校验线程池（校验不占用转换的并发名额）
+        self._verify_executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def loop_thread(self) -> _EventLoopThread:
+        """按需启动事件循环线程"""
+        with self._loop_lock:
+            if self._loop_thread is None:
+                self._loop_thread = _EventLoopThread()
+            return self._loop_thread
+
+    @property
+    def verify_executor(self) -> ThreadPoolExecutor:
+        """按需创建输出校验线程池"""
+        with self._loop_lock:
+            if self._verify_executor is None:
+                self._verify_executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                           thread_name_prefix="verify")
+            return self._verify_executor
+
+    def close(self):
+        """停止事件循环线程和校验线程池"""
+        with self._loop_lock:
+            if self._loop_thread is not None:
+                self._loop_thread.close()
+                self._loop_thread = None
+                self._track_slots = None
+            if self._verify_executor is not None:
+                self._verify_executor.shutdown(wait=False)
+                self._verify_executor = None
+
+    # ---- 同步入口（与 MusicConverter 接口相同） ----
+
+    def convert_single_file(self, input_path: str, output_format: str,
+                            output_dir: str = None, job_id: Optional[int] = None,
+                            queued_ns: Optional[int] = None,
+                            options: Optional[ConversionOptions] = None) -> bool:
+        job_id = next(self._job_ids) if job_id is None else job_id
+        return self._run_cancellable(
+            self.convert_file_async(input_path, output_format, output_dir, job_id, queued_ns,
+                                    options=options)
+        ) or False
+
+    def _convert_files(self, files: List[Path], output_format: str,
+                       output_dir: Optional[str]) -> int:
+        return self._run_cancellable(
+            self.convert_files_async(files, output_format, output_dir)
+        ) or 0
+
+    def _run_cancellable(self, coro):
+        """在事件循环中运行协程，stop_conversion 可以取消它"""
+        async def runner():
+            task = asyncio.current_task()
+            self._active_tasks.add(task)
+            try:
+                return await coro
+            except asyncio.CancelledError:
+                return None
+            finally:
+                self._active_tasks.discard(task)
+        return self.loop_thread.run(runner())
+
+    def _cancel_all(self):
+        for task in list(self._active_tasks):
+            task.cancel()
+
+    def stop_conversion(self):
+        """停止转换：取消所有任务并结束正在运行的ffmpeg进程"""
+        super().stop_conversion()
+        if self._loop_thread is not None:
+            self._loop_thread.call_soon(self._cancel_all)
+
+    # ---- 协程实现 ----
+
+    async def convert_files_async(self, files: List[Path], output_format: str,
+                                  output_dir: Optional[str]) -> int:
+        """并发转换文件列表，返回成功数量"""
+        total_files = len(files)
+        success_count = 0
+        failed_count = 0
+        start = time.perf_counter()
+        if output_dir:
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+        self._emit(BatchStarted(total_files, output_format, output_dir))
+
+        groups = await asyncio.to_thread(self._plan_groups, files, output_format, output_dir,
+                                         self.options)
+        semaphore = asyncio.Semaphore(self.max_workers)
+        # 按设备限制时，任务先取得输入和输出所在设备的名额，再取得CPU名额
+        slots = DeviceSlots(self.device_limits) if self.device_limits else None
+        tasks = []
+        for group in groups:
+            job_ids = [next(self._job_ids) for _ in group]
+            for job_id, (path, _) in zip(job_ids, group):
+                self._emit(JobQueued(job_id, path))
+            guard = semaphore
+            if slots is not None:
+                devices = set()
+                for path, _ in group:
+                    devices.update(job_devices(path, output_dir))
+                guard = slots.guard(tuple(sorted(devices)), semaphore)
+            if len(group) == 1:
+                tasks.append(asyncio.ensure_future(self.convert_file_async(
+                    group[0][0], output_format, output_dir, job_ids[0],
+                    time.perf_counter_ns(), guard
+                )))
+            else:
+                tasks.append(asyncio.ensure_future(self.convert_group_async(
+                    group, job_ids, output_format, output_dir, time.perf_counter_ns(), guard
+                )))
+
+        try:
+            # 按完成顺序统计进度（一组文件同时完成）
+            completed = 0
+            for future in asyncio.as_completed(tasks):
+                result = await future
+                for ok in (result if isinstance(result, list) else [result]):
+                    completed += 1
+                    if ok:
+                        success_count += 1
+                    else:
+                        failed_count += 1
+                self._emit(BatchProgress(completed, total_files, success_count, failed_count))
+        finally:
+            # 被取消时结束所有仍在排队或运行的任务
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            archive.close_readers()
+            self._emit(BatchFinished(total_files, success_count, failed_count,
+                                     time.perf_counter() - start))
+        return success_count
+
+    async def convert_file_async(self, input_path: str, output_format: str,
+                                 output_dir: Optional[str] = None, job_id: Optional[int] = None,
+                                 queued_ns: Optional[int] = None,
+                                 semaphore: Optional[asyncio.Semaphore] = None,
+                                 options: Optional[ConversionOptions] = None) -> bool:
+        """转换单个文件"""
+        job = _JobContext(next(self._job_ids) if job_id is None else job_id, str(input_path))
+        options = options or self.options
+        try:
+            if semaphore is None:
+                result = await self._run_job(job, output_format, output_dir, queued_ns, options)
+            else:
+                async with semaphore:
+                    result = await self._run_job(job, output_format, output_dir, queued_ns,
+                                                 options)
+            if isinstance(result, JobFinished):
+                # 需要校验：已释放并发名额，校验与其他任务的转换同时进行
+                return await self._verify_async(job, result, output_format, options)
+            return result
+        except asyncio.CancelledError:
+            # 排队中和运行中的任务都报告为失败，保证每个任务都有结束事件
+            self._fail(job, f"转换已取消: {Path(job.input_path).name}")
+            raise
+
+    def _plan_groups(self, files: List[Path], output_format: str, output_dir: Optional[str],
+                     options: ConversionOptions) -> List[List[Tuple[str, Optional[int]]]]:
+        """
+        把文件列表分组，返回 [(路径, 大小), ...] 的列表，只有一个文件的组按普通任务转换
+        只有不超过 batch_max_bytes 的普通文件参与分组：cue、压缩包成员和wav直通有各自的路径，
+        响度标准化、静音处理和淡出需要先分别分析每个文件，这些情况不分组
+        """
+        singles = [[(str(path), None)] for path in files]
+        if (self.batch_files <= 1 or options.normalize or options.edits_silence
+                or options.fade_out > 0 or output_format not in self.SUPPORTED_OUTPUT_FORMATS):
+            return singles
+        groups = []
+        current: List[Tuple[str, Optional[int]]] = []
+        outputs = set()
+        for path in map(str, files):
+            suffix = Path(path).suffix.lower()[1:]
+            size = None
+            if (suffix in self.SUPPORTED_INPUT_FORMATS and not is_cue(path)
+                    and not archive.is_member(path) and not archive.archive_format(path)
+                    and not (suffix == "wav" and output_format == "wav")):
+                try:
+                    # 暂存模式下本地副本可能还没有复制，按原文件大小分组
+                    size = os.path.getsize(self._staging.source(path) if self._staging else path)
+                except OSError:
+                    pass
+            if size is None or size > self.batch_max_bytes:
+                groups.append([(path, None)])
+                continue
+            # 同名文件输出到同一个路径，不能由同一个进程写入
+            output = self._output_path(Path(path), output_format, output_dir)
+            if output in outputs or len(current) == self.batch_files:
+                groups.append(current)
+                current, outputs = [], set()
+            current.append((path, size))
+            outputs.add(output)
+        if current:
+            groups.append(current)
+        return groups
+
+    async def convert_group_async(self, group: List[Tuple[str, int]], job_ids: List[int],
+                                  output_format: str, output_dir: Optional[str],
+                                  queued_ns: int, semaphore: asyncio.Semaphore) -> List[bool]:
+        """
+        用一个ffmpeg进程转换一组小文件，返回各文件是否成功
+        进程失败（某个输入无法解码、超时等）时删除这一组的输出，再逐个文件独立转换，
+        一个文件的问题不会影响同组的其他文件
+        """
+        options = self.options
+        jobs = [_JobContext(job_id, path) for job_id, (path, _) in zip(job_ids, group)]
+        results: Dict[int, bool] = {}
+
+        async def settle(job: _JobContext, result):
+            if isinstance(result, JobFinished):
+                # 需要校验：校验与其他任务的转换同时进行
+                result = await self._verify_async(job, result, output_format, options)
+            results[job.job_id] = result
+
+        async def isolated(job: _JobContext):
+            async with semaphore:
+                result = await self._transcode(job, output_format, output_dir, options)
+            await settle(job, result)
+
+        start_ns = time.perf_counter_ns()
+        try:
+            async with semaphore:
+                events = await self._run_group(jobs, [size for _, size in group], output_format,
+                                               output_dir, queued_ns, options)
+            if events is None:
+                await asyncio.gather(*(isolated(job) for job in jobs))
+            elif options.verify:
+                await asyncio.gather(*(settle(job, event) for job, event in zip(jobs, events)))
+            else:
+                for job, event in zip(jobs, events):
+                    self._emit(event)
+                    results[job.job_id] = True
+        except asyncio.CancelledError:
+            for job in jobs:
+                if job.job_id not in results:
+                    self._fail(job, f"转换已取消: {Path(job.input_path).name}")
+            raise
+        finally:
+            if self.tracer is not None:
+                end_ns = time.perf_counter_ns()
+                for job in jobs:
+                    self.tracer.record("job", start_ns, end_ns, job.job_id,
+                                       file=os.path.basename(job.input_path))
+        return [results[job.job_id] for job in jobs]
+
+    async def _run_group(self, jobs: List[_JobContext], sizes: List[int], output_format: str,
+                         output_dir: Optional[str], queued_ns: int,
+                         options: ConversionOptions) -> Optional[List[JobFinished]]:
+        """运行一组文件的ffmpeg进程，成功时返回各任务尚未发出的完成事件，失败时返回None"""
+        start_ns = time.perf_counter_ns()
+        for job in jobs:
+            self._record_stage("queue_wait", queued_ns, start_ns, job)
+            self._emit(JobStarted(job.job_id, job.input_path, output_format))
+            self._job_progress(job, 0)
+        for job in jobs:
+            if await self._wait_staged_async(job):
+                # 复制失败的文件在逐个转换时报告
+                return None
+            job.stage = "transcode"
+        paths = [self._output_path(Path(job.input_path), output_format, output_dir)
+                 for job in jobs]
+        command = self._build_group_command([job.input_path for job in jobs], paths,
+                                            output_format, self._track_filters(options, None),
+                                            options.bit_depth)
+        timeout = self.job_timeout * len(jobs) if self.job_timeout is not None else None
+        log = None
+        try:
+            log = await asyncio.wait_for(self._run_logged(command), timeout)
+        except (asyncio.TimeoutError, OSError, RuntimeError):
+            pass
+        finally:
+            if log is None:
+                for path in paths:
+                    self._remove_partial(path)
+            # 整个进程的耗时平均分给组内各任务（阶段计时的总和与实际耗时一致）
+            end_ns = time.perf_counter_ns()
+            share = (end_ns - start_ns) // len(jobs)
+            for index, (job, size) in enumerate(zip(jobs, sizes)):
+                self._record_stage("transcode", start_ns + index * share,
+                                   start_ns + (index + 1) * share, job,
+                                   {"format": output_format, "bytes": size, "batch": len(jobs)})
+        if log is None:
+            return None
+
+        # 日志中按输入顺序打印每个输入的时长
+        durations = [_parse_duration(match.group(0))
+                     for match in _DURATION_RE.finditer(log)]
+        if len(durations) != len(jobs):
+            durations = [None] * len(jobs)
+        events = []
+        for job, size, path, duration in zip(jobs, sizes, paths, durations):
+            self._job_progress(job, 100)
+            events.append(JobFinished(
+                job.job_id, job.input_path, str(path),
+                input_bytes=size,
+                output_bytes=path.stat().st_size,
+                audio_seconds=duration or 0.0,
+                elapsed=job.elapsed,
+                timings=dict(job.timings),
+                engine=self.ENGINE,
+            ))
+        return events
+
+    async def _verify_async(self, job: _JobContext, event: JobFinished, output_format: str,
+                            options: ConversionOptions) -> bool:
+        """在校验线程池中解码校验输出（被取消时不再发出结果事件）"""
+        problem = await asyncio.get_running_loop().run_in_executor(
+            self.verify_executor, self._check_outputs, job, event, output_format, options,
+            self.ffmpeg_path)
+        return self._report_verification(job, event, problem)
+
+    async def _run_job(self, job: _JobContext, output_format: str, output_dir: Optional[str],
+                       queued_ns: Optional[int], options: ConversionOptions):
+        """取得并发名额后执行任务，需要校验时返回尚未发出的完成事件"""
+        start_ns = time.perf_counter_ns()
+        if queued_ns is not None:
+            self._record_stage("queue_wait", queued_ns, start_ns, job)
+        self._emit(JobStarted(job.job_id, job.input_path, output_format))
+        try:
+            return await self._transcode(job, output_format, output_dir, options)
+        finally:
+            if self.tracer is not None:
+                self.tracer.record("job", start_ns, time.perf_counter_ns(), job.job_id,
+                                   file=os.path.basename(job.input_path))
+
+    def _build_command(self, input_path: Path, output_path: Path, output_format: str,
+                       filters: Optional[List[str]] = None,
+                       bit_depth: Optional[int] = None,
+                       start: float = 0.0, length: Optional[float] = None,
+                       tags: Optional[Dict[str, str]] = None) -> List[str]:
+        """构造ffmpeg命令行，start/length 指定只转换其中一段（秒），tags 为写入的标签"""
+        filter_args = ["-af", ",".join(filters)] if filters else []
+        # -ss 放在 -i 之前，直接定位到片段开头，滤镜看到的时间戳从0开始
+        seek_args = ["-ss", f"{start:.3f}"] if start > 0 else []
+        length_args = ["-t", f"{length:.3f}"] if length is not None else []
+        return [
+            self.ffmpeg_path, "-hide_banner", "-nostdin", "-y",
+            *seek_args, "-i", str(input_path), *length_args,
+            "-vn", *filter_args, *codec_args(output_format, bit_depth),
+            *(metadata_args(tags) if tags else []),
+            "-progress", "pipe:1", "-nostats",
+            str(output_path),
+        ]
+
+    def _build_group_command(self, input_paths: List[str], output_paths: List[Path],
+                             output_format: str, filters: List[str],
+                             bit_depth: Optional[int] = None) -> List[str]:
+        """
+        一个进程转换多个文件的命令行：第 i 个输入的音频写到第 i 个输出，
+        标签和章节也从对应的输入复制（默认全部取自第一个输入）
+        """
+        filter_args = ["-af", ",".join(filters)] if filters else []
+        command = [self.ffmpeg_path, "-hide_banner", "-nostdin", "-y"]
+        for path in input_paths:
+            command += ["-i", str(path)]
+        for index, path in enumerate(output_paths):
+            command += ["-map", f"{index}:a:0", "-map_metadata", str(index),
+                        "-map_chapters", str(index), *filter_args,
+                        *codec_args(output_format, bit_depth), str(path)]
+        return command
+
+    async def _audio_filters_async(self, job: _JobContext, options: ConversionOptions,
+                                   input_path: str) -> List[str]:
+        """与 MusicConverter._audio_filters 的响度部分相同，响度测量以子进程异步运行"""
+        filters = []
+        if options.normalize:
+            start_ns = time.perf_counter_ns()
+            try:
+                measurement = await self.loudness.analyze_async(input_path)
+            finally:
+                self._record_stage("loudness", start_ns, time.perf_counter_ns(), job)
+            filters.append(f"volume={self._loudness_gain(job, options, measurement):.2f}dB")
+        return filters
+
+    def _track_filters(self, options: ConversionOptions, duration: Optional[float]) -> List[str]:
+        """
+        每个输出文件的滤镜：这个引擎不在Python中解码，淡入淡出由ffmpeg的 afade 滤镜完成，
+        淡出需要知道输出的时长
+        """
+        filters = []
+        if options.fade_in > 0:
+            filters.append(f"afade=t=in:d={options.fade_in}")
+        if options.fade_out > 0:
+            if duration is None:
+                raise RuntimeError("无法获取时长，不能淡出")
+            start = max(0.0, duration - options.fade_out)
+            filters.append(f"afade=t=out:st={start:.3f}:d={options.fade_out}")
+        conversion = format_filter(options, self.ffmpeg_path)
+        if conversion:
+            filters.append(conversion)
+        return filters
+
+    async def _track_ranges_async(self, job: _JobContext, source: Path,
+                                  options: ConversionOptions) -> List[Tuple[float, Optional[float]]]:
+        """
+        输出音轨的 (开始, 时长) 列表（秒）
+        不裁剪静音时只有一项：整个文件，时长只在需要淡出时读取；
+        否则用 silencedetect 解码一遍找出静音区间，全部为静音时返回空列表
+        """
+        if not options.edits_silence:
+            duration = await self._probe_duration(str(source)) if options.fade_out > 0 else None
+            return [(0.0, duration)]
+
+        start_ns = time.perf_counter_ns()
+        try:
+            log = await self._run_logged([
+                self.ffmpeg_path, "-hide_banner", "-nostdin", "-i", str(source), "-vn",
+                "-af", silence.silencedetect_filter(options.silence_threshold), "-f", "null", "-",
+            ])
+        finally:
+            self._record_stage("silence", start_ns, time.perf_counter_ns(), job)
+        duration = _parse_duration(log)
+        if duration is None:
+            raise RuntimeError("无法获取时长")
+        silences = silence.parse_silencedetect(log.decode("utf-8", "replace"), duration)
+        return [(start, end - start) for start, end in silence.track_ranges(
+            silences, duration, options.trim_silence, options.split_silence, options.min_silence)]
+
+    async def _run_logged(self, command: List[str]) -> bytes:
+        """运行不需要进度的ffmpeg命令，返回日志；被取消时结束进程"""
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+            **subprocess_kwargs()
+        )
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            if process.returncode is None:
+                process.kill()
+                await process.wait()
+            raise
+        if process.returncode != 0:
+            log = stderr.decode("utf-8", "replace").strip()
+            raise RuntimeError(log.splitlines()[-1] if log else f"退出码 {process.returncode}")
+        return stderr
+
+    async def _probe(self, input_path: str) -> bytes:
+        """只读取文件头（ffmpeg不指定输出时打印输入信息后退出），返回日志"""
+        process = await asyncio.create_subprocess_exec(
+            self.ffmpeg_path, "-hide_banner", "-nostdin", "-i", str(input_path),
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+            **subprocess_kwargs()
+        )
+        _, stderr = await process.communicate()
+        return stderr
+
+    async def _probe_duration(self, input_path: str) -> Optional[float]:
+        """只读取文件头获取时长"""
+        return _parse_duration(await self._probe(input_path))
+
+    async def _decode_image(self, job: _JobContext, image: str, folder: str,
+                            probe: str) -> Tuple[str, float]:
+        """
+        把cue的整轨镜像解码为临时wav（保持样本位数），返回 (wav路径, 时长)
+        之后各音轨直接定位到wav中的位置编码，不需要重复解码镜像；probe 为镜像的文件头信息
+        """
+        bits = parse_sample_bits(probe)
+        if bits is None:
+            sample_codec = "pcm_f32le"
+        else:
+            sample_codec = "pcm_s16le" if bits <= 16 else f"pcm_s{(bits + 7) // 8 * 8}le"
+        wav_path = os.path.join(folder, "image.wav")
+        with self._span("decode", job, format=Path(image).suffix.lower()[1:]):
+            log = await self._run_logged([
+                self.ffmpeg_path, "-hide_banner", "-nostdin", "-y", "-i", image,
+                "-map", "0:a:0", "-c:a", sample_codec, wav_path,
+            ])
+        duration = _parse_duration(log)
+        if duration is None:
+            raise RuntimeError("无法获取时长")
+        return wav_path, duration
+
+    async def _transcode(self, job: _JobContext, output_format: str,
+                         output_dir: Optional[str], options: ConversionOptions) -> bool:
+        """运行ffmpeg完成解码和编码，按静音拆分或cue分轨时每个音轨一个进程并发运行"""
+        error = await self._wait_staged_async(job) or self._check_job(job, output_format)
+        if error:
+            return self._fail(job, error)
+        input_path = Path(job.input_path)
+        if is_cue(input_path):
+            return await self._transcode_cue(job, output_format, output_dir, options)
+        output_path = self._output_path(input_path, output_format, output_dir)
+        if archive.is_member(job.input_path):
+            return await self._transcode_member(job, output_path, output_format, options)
+        if input_path.suffix.lower() == ".wav" and output_format == "wav":
+            # wav 转 wav 的直通在线程中运行，不启动ffmpeg
+            result = await asyncio.to_thread(self._transcode_wav, job, input_path, output_path,
+                                             options)
+            if result is not None:
+                if result is False or options.verify:
+                    # 需要校验时由 convert_file_async 在释放并发名额后校验
+                    return result
+                self._emit(result)
+                return True
+        with self._span("stat", job):
+            file_size = input_path.stat().st_size
+        return await self._transcode_file(job, input_path, output_path, file_size,
+                                          output_format, options)
+
+    async def _wait_staged_async(self, job: _JobContext) -> Optional[str]:
+        """暂存模式下等待输入复制到本地（不占用线程），复制失败时返回错误信息"""
+        staging = self._staging
+        if staging is None:
+            return None
+        with self._span("download", job):
+            return await staging.wait_async(job.input_path)
+
+    async def _transcode_file(self, job: _JobContext, source: Path, output_path: Path,
+                              file_size: int, output_format: str,
+                              options: ConversionOptions) -> bool:
+        """转换磁盘上的文件 source（压缩包成员为解压出的临时文件）"""
+        input_name = Path(job.input_path).name
+        try:
+            filters = await self._audio_filters_async(job, options, str(source))
+            ranges = await self._track_ranges_async(job, source, options)
+        except (OSError, RuntimeError, ValueError) as e:
+            return self._fail(job, f"分析音频失败: {input_name}: {e}")
+        if not ranges:
+            return self._fail(job, f"音频全部为静音: {input_name}")
+
+        if options.split_silence:
+            paths = [silence.track_path(output_path, index)
+                     for index in range(1, len(ranges) + 1)]
+        else:
+            paths = [output_path]
+        return await self._encode_ranges(job, source, ranges, paths, None, filters,
+                                         output_format, options, file_size,
+                                         limit_length=options.edits_silence)
+
+    async def _transcode_member(self, job: _JobContext, output_path: Path, output_format: str,
+                                options: ConversionOptions) -> bool:
+        """
+        转换压缩包成员：只需要一遍处理时成员数据通过管道交给ffmpeg；
+        响度测量、静音检测和淡出（需要先读时长）要多次读取输入，
+        容器索引可能在末尾的格式不能从管道解码，这些情况解压为临时文件
+        """
+        input_name = Path(job.input_path).name
+        try:
+            with self._span("stat", job):
+                file_size = archive.member_size(job.input_path)
+            output_path.parent.mkdir(parents=True, exist_ok=True)
+        except (OSError, KeyError) as e:
+            return self._fail(job, f"无法读取压缩包成员 {input_name}: {e}")
+        input_format = Path(job.input_path).suffix.lower()[1:]
+        if not (options.normalize or options.edits_silence or options.fade_out > 0
+                or input_format in archive.SEEKABLE_FORMATS):
+            return await self._encode_ranges(job, Path("pipe:0"), [(0.0, None)], [output_path],
+                                             None, [], output_format, options, file_size,
+                                             limit_length=False, feed=job.input_path)
+
+        async with self.scratch.directory_async(file_size) as folder:
+            try:
+                with self._span("extract", job, bytes=file_size):
+                    source = await asyncio.to_thread(archive.extract_to, job.input_path, folder)
+            except OSError as e:
+                return self._fail(job, f"解压 {input_name} 失败: {e}")
+            return await self._transcode_file(job, Path(source), output_path, file_size,
+                                              output_format, options)
+
+    async def _transcode_cue(self, job: _JobContext, output_format: str,
+                             output_dir: Optional[str], options: ConversionOptions) -> bool:
+        """按cue分轨：镜像解码一次到临时wav，各音轨并发编码"""
+        name = Path(job.input_path).name
+        try:
+            sheet: CueSheet = parse_cue(job.input_path)
+        except (OSError, ValueError) as e:
+            return self._fail(job, f"无法解析cue文件 {name}: {e}")
+        image = sheet.image_path
+        if image is None:
+            return self._fail(job, f"找不到cue引用的文件: {sheet.file}")
+        with self._span("stat", job):
+            file_size = os.path.getsize(image)
+
+        # 按文件头中的时长和格式预留临时wav的空间
+        probe = (await self._probe(image)).decode("utf-8", "replace")
+        rate, channels = parse_stream_layout(probe) or (48000, 2)
+        size = wav_size(parse_duration(probe), rate, channels,
+                        parse_sample_bits(probe) or 32)
+        async with self.scratch.directory_async(size) as folder:
+            try:
+                filters = await self._audio_filters_async(job, options, image)
+                wav_path, duration = await self._decode_image(job, image, folder, probe)
+            except (OSError, RuntimeError, ValueError) as e:
+                return self._fail(job, f"解码镜像失败: {Path(image).name}: {e}")
+            paths = sheet.track_paths(output_dir, output_format)
+            paths[0].parent.mkdir(parents=True, exist_ok=True)
+            tags = [sheet.tags(index) for index in range(len(paths))]
+            return await self._encode_ranges(job, Path(wav_path), sheet.ranges(duration), paths,
+                                             tags, filters, output_format, options, file_size,
+                                             limit_length=True)
+
+    async def _encode_ranges(self, job: _JobContext, source: Path,
+                             ranges: List[Tuple[float, Optional[float]]], paths: List[Path],
+                             tags: Optional[List[Dict[str, str]]], filters: List[str],
+                             output_format: str, options: ConversionOptions, file_size: int,
+                             limit_length: bool, feed: Optional[str] = None) -> bool:
+        """
+        把 source 的各个 (开始, 时长) 区间编码到对应的输出文件，每个区间一个ffmpeg进程并发运行
+        limit_length 为False时只有一个区间，转换整个文件（时长只用于淡出和进度）；
+        feed 为压缩包成员时 source 为 pipe:0，成员数据写入ffmpeg的标准输入
+        """
+        input_name = Path(job.input_path).name
+        try:
+            track_filters = [filters + self._track_filters(options, length)
+                             for _, length in ranges]
+        except RuntimeError as e:
+            return self._fail(job, f"分析音频失败: {input_name}: {e}")
+        self._job_progress(job, 0)
+
+        # 每个进程的时长和已输出时长，整体进度按总时长计算
+        # （整个文件转换时时长由 _read_log 从日志中解析）
+        states = [{"duration": length, "out_seconds": 0.0} for _, length in ranges]
+        last_percent = 0
+
+        def report():
+            nonlocal last_percent
+            total = sum(state["duration"] or 0.0 for state in states)
+            if total:
+                done = sum(state["out_seconds"] for state in states)
+                percent = min(99, int(done / total * 100))
+                if percent > last_percent:
+                    last_percent = percent
+                    self._job_progress(job, percent)
+
+        # 拆分出的音轨同时运行；名额由所有任务共用，多个任务同时拆分时进程总数也不超过并发数
+        if self._track_slots is None:
+            self._track_slots = asyncio.Semaphore(self.max_workers)
+        semaphore = self._track_slots
+
+        async def run(index: int):
+            start, length = ranges[index]
+            command = self._build_command(
+                source, paths[index], output_format, track_filters[index],
+                options.bit_depth, start, length if limit_length else None,
+                tags[index] if tags else None)
+            async with semaphore:
+                return await self._run_ffmpeg(command, paths[index], states[index], report, feed)
+
+        # ffmpeg进程同时完成解码和编码，整体记为 transcode 阶段
+        job.stage = "transcode"
+        start_ns = time.perf_counter_ns()
+        tasks = [asyncio.ensure_future(run(index)) for index in range(len(ranges))]
+        try:
+            errors = await asyncio.gather(*tasks)
+        except asyncio.TimeoutError:
+            return self._fail(job, f"转换超时（{self.job_timeout}秒）: {input_name}")
+        except OSError as e:
+            return self._fail(job, f"无法启动ffmpeg: {e}")
+        finally:
+            # 一个音轨失败或任务被取消时结束其余的进程
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._record_stage("transcode", start_ns, time.perf_counter_ns(), job,
+                               {"format": output_format, "bytes": file_size})
+
+        detail = next((error for error in errors if error), None)
+        if detail:
+            return self._fail(job, f"转换 {input_name} 失败: {detail}")
+
+        self._job_progress(job, 100)
+        event = JobFinished(
+            job.job_id, job.input_path, str(paths[0]),
+            input_bytes=file_size,
+            output_bytes=sum(path.stat().st_size for path in paths),
+            audio_seconds=sum(state["out_seconds"] or state["duration"] or 0.0
+                              for state in states),
+            elapsed=job.elapsed,
+            timings=dict(job.timings),
+            engine=self.ENGINE,
+            outputs=tuple(str(path) for path in paths) if len(paths) > 1 else (),
+        )
+        if options.verify:
+            # 由 convert_file_async 在释放并发名额后校验
+            return event
+        self._emit(event)
+        return True
+
+    async def _run_ffmpeg(self, command: List[str], output_path: Path, state: dict,
+                          report, feed: Optional[str] = None) -> Optional[str]:
+        """
+        运行一个转换进程，成功时返回None，失败时返回ffmpeg日志的最后一行
+        feed 为压缩包成员时把成员数据写入进程的标准输入；
+        超时抛出 asyncio.TimeoutError；超时或取消时结束进程并删除未写完的文件
+        """
+        process = await asyncio.create_subprocess_exec(
+            *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            stdin=asyncio.subprocess.PIPE if feed else None,
+            **subprocess_kwargs()
+        )
+        stderr_tail = deque(maxlen=20)
+        readers = [
+            self._read_progress(process.stdout, state, report),
+            self._read_log(process.stderr, state, stderr_tail),
+        ]
+        if feed:
+            readers.append(self._feed_member(process.stdin, feed, self.scratch.root))
+        running = asyncio.gather(*readers, process.wait())
+        try:
+            await asyncio.wait_for(running, self.job_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            await self._kill(process, running)
+            self._remove_partial(output_path)
+            raise
+        except RuntimeError as e:
+            # 读取压缩包成员出错：输入不完整，不能保留输出
+            await self._kill(process, running)
+            self._remove_partial(output_path)
+            return str(e)
+
+        if process.returncode != 0:
+            self._remove_partial(output_path)
+            return stderr_tail[-1] if stderr_tail else f"退出码 {process.returncode}"
+        return None
+
+    @staticmethod
+    async def _read_progress(stream, state: dict, report):
+        """解析 -progress 输出（key=value，每个周期以 progress=... 结束）"""
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            key, _, value = line.decode("ascii", "replace").strip().partition("=")
+            if key == "out_time_us" and value.isdigit():
+                state["out_seconds"] = int(value) / 1e6
+            elif key == "progress":
+                report()
+
+    @staticmethod
+    async def _feed_member(stdin, member: str, temp_dir: Optional[str] = None):
+        """
+        把压缩包成员的数据写入ffmpeg的标准输入（解压在线程中进行，不阻塞事件循环）
+        ffmpeg提前退出时停止写入，错误由进程的退出码报告；读取成员失败时抛出 RuntimeError
+        """
+        try:
+            stream = await asyncio.to_thread(archive.open_member, member, temp_dir)
+        except (OSError, KeyError, zipfile.BadZipFile, tarfile.TarError) as e:
+            stdin.close()
+            raise RuntimeError(f"读取压缩包成员失败: {e}") from e
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.to_thread(stream.read, archive.CHUNK_SIZE)
+                except (OSError, EOFError, zipfile.BadZipFile, tarfile.TarError) as e:
+                    raise RuntimeError(f"读取压缩包成员失败: {e}") from e
+                if not chunk:
+                    break
+                stdin.write(chunk)
+                await stdin.drain()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            stream.close()
+            stdin.close()
+
+    @staticmethod
+    async def _read_log(stream, state: dict, tail: deque):
+        """读取ffmpeg日志：解析输入时长，保留最后几行用于错误信息"""
+        while True:
+            line = await stream.readline()
+            if not line:
+                break
+            if state["duration"] is None:
+                state["duration"] = _parse_duration(line)
+            text = line.decode("utf-8", "replace").strip()
+            if text:
+                tail.append(text)
+
+    @staticmethod
+    async def _kill(process, running):
+        """结束ffmpeg进程，并回收读取输出的协程"""
+        running.cancel()
+        await asyncio.gather(running, return_exceptions=True)
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass
+            await process.wait()
+
+    @staticmethod
+    def _remove_partial(output_path: Path):
+        """删除未写完的输出文件"""
+        try:
+            output_path.unlink()
+        except OSError:
+            pass
@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音乐格式转换器 - 性能基准测试脚本
+使用ffmpeg lavfi在本地生成确定性的测试音频，按输出格式、线程数和引擎组合
+运行转换，并把吞吐量和内存峰值写入JSON结果文件
+
+用法:
+    python benchmark.py                          # 默认参数运行
+    python benchmark.py -f mp3 flac -w 1 2 4     # 指定格式和线程数
+    python benchmark.py --baseline old.json      # 与历史结果比较，发现性能回退
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import platform
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from itertools import product
+from typing import List, Dict, Optional
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from ffmpeg_config import get_ffmpeg_path
+from tracing import Tracer
+
+# 默认测试语料：(信号源, 时长秒, 采样率, 声道数, 格式)
+DEFAULT_CORPUS = [
+    ("sine", 5, 44100, 2, "wav"),
+    ("sine", 30, 44100, 2, "mp3"),
+    ("noise", 30, 48000, 2, "flac"),
+    ("sine", 120, 44100, 2, "flac"),
+    ("noise", 10, 22050, 1, "ogg"),
+    ("sine", 60, 96000, 2, "wav"),
+    ("noise", 3, 44100, 2, "m4a"),
+]
+
+# 生成语料时各格式使用的编码参数
+CORPUS_CODECS = {
+    "wav": ["-c:a", "pcm_s16le"],
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "192k"],
+    "flac": ["-c:a", "flac"],
+    "ogg": ["-c:a", "libvorbis", "-q:a", "5"],
+    "m4a": ["-c:a", "aac", "-b:a", "192k"],
+}
+
+# 可用的转换引擎
+ENGINES = ["pydub", "ffmpeg-async"]
+
+DEFAULT_FORMATS = ["mp3", "flac", "wav"]
+DEFAULT_WORKERS = [1, 2, 4]
+
+
+def corpus_entries(copies: int = 1) -> List[Dict]:
+    """展开语料规格，每个条目生成 copies 份（频率/随机种子不同）"""
+    entries = []
+    index = 0
+    for copy in range(copies):
+        for source, seconds, rate, channels, fmt in DEFAULT_CORPUS:
+            name = f"{index:03d}_{source}_{seconds}s_{rate}_{channels}ch.{fmt}"
+            entries.append({
+                "name": name,
+                "source": source,
+                "seconds": seconds,
+                "rate": rate,
+                "channels": channels,
+                "format": fmt,
+                # 确定性参数：同一个索引永远生成相同的信号
+                "frequency": 220 * (1 + index % 8),
+                "seed": 1000 + index,
+            })
+            index += 1
+    return entries
+
+
+def _lavfi_source(entry: Dict) -> str:
+    """构造lavfi信号源描述"""
+    if entry["source"] == "sine":
+        return (f"sine=frequency={entry['frequency']}:sample_rate={entry['rate']}"
+                f":duration={entry['seconds']}")
+    return (f"anoisesrc=duration={entry['seconds']}:color=pink:amplitude=0.3"
+            f":sample_rate={entry['rate']}:seed={entry['seed']}")
+
+
+def generate_corpus(corpus_dir: Path, copies: int = 1, ffmpeg: str = None) -> List[Dict]:
+    """
+    生成测试语料（已存在且规格一致时直接复用）
+
+    Args:
+        corpus_dir: 语料目录
+        copies: 每个规格条目的份数
+        ffmpeg: ffmpeg可执行文件路径
+
+    Returns:
+        List[Dict]: 语料条目列表
+    """
+    ffmpeg = ffmpeg or get_ffmpeg_path()
+    entries = corpus_entries(copies)
+    spec_hash = hashlib.sha256(json.dumps(entries, sort_keys=True).encode()).hexdigest()
+    manifest_path = corpus_dir / "manifest.json"
+
+    if manifest_path.exists():
+        try:
+            manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+            if (manifest.get("spec_hash") == spec_hash and
+                    all((corpus_dir / e["name"]).exists() for e in entries)):
+                print(f"♻️  复用已有语料: {corpus_dir} ({len(entries)} 个文件)")
+                return entries
+        except (OSError, ValueError):
+            pass
+
+    if corpus_dir.exists():
+        shutil.rmtree(corpus_dir)
+    corpus_dir.mkdir(parents=True)
+
+    print(f"🎼 生成测试语料: {corpus_dir} ({len(entries)} 个文件)")
+    for entry in entries:
+        cmd = [
+            ffmpeg, "-hide_banner", "-loglevel", "error", "-y",
+            "-f", "lavfi", "-i", _lavfi_source(entry),
+            "-ac", str(entry["channels"]),
+            # 去掉编码器版本等元数据，保证输出逐字节可复现
+            "-map_metadata", "-1", "-fflags", "+bitexact", "-flags:a", "+bitexact",
+            *CORPUS_CODECS[entry["format"]],
+            str(corpus_dir / entry["name"]),
+        ]
+        subprocess.run(cmd, check=True)
+
+    manifest_path.write_text(json.dumps({"spec_hash": spec_hash, "entries": entries},
+                                        ensure_ascii=False, indent=2), encoding="utf-8")
+    return entries
+
+
+def make_converter(engine: str, workers: int):
+    """按引擎名称创建转换器"""
+    from converter import create_converter
+
+    if engine not in ENGINES:
+        raise ValueError(f"未知的转换引擎: {engine}")
+    return create_converter(engine, workers)
+
+
+def _peak_rss_mb(who) -> Optional[float]:
+    """获取进程内存峰值（MB），不支持的平台返回None"""
+    try:
+        import resource
+    except ImportError:
+        if who != "self":
+            return None
+        try:
+            import psutil
+            return psutil.Process().memory_info().peak_wset / (1024 * 1024)
+        except (ImportError, AttributeError):
+            return None
+
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # Linux上ru_maxrss单位为KB，macOS上为字节
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return usage.ru_maxrss / divisor
+
+
+def run_scenario(corpus_dir: str, output_dir: str, output_format: str,
+                 workers: int, engine: str, trace_path: Optional[str] = None) -> Dict:
+    """
+    运行单个测试场景（在独立子进程中调用，以便单独统计内存峰值）
+    """
+    from ffmpeg_config import setup_ffmpeg
+    setup_ffmpeg()
+
+    from events import JobFailed, Message
+
+    errors = []
+
+    def collect_errors(event):
+        if isinstance(event, JobFailed):
+            errors.append(event.error)
+        elif isinstance(event, Message) and event.level == "error":
+            errors.append(event.text)
+
+    converter = make_converter(engine, workers)
+    converter.events.subscribe(collect_errors)
+    tracer = Tracer()
+    converter.set_tracer(tracer)
+
+    start = time.perf_counter()
+    converter.convert_folder(corpus_dir, output_format, output_dir)
+    elapsed = time.perf_counter() - start
+
+    if trace_path:
+        tracer.export_chrome_trace(trace_path)
+
+    converted = [p for p in Path(output_dir).iterdir()
+                 if p.suffix.lower() == f".{output_format}"]
+    return {
+        "seconds": elapsed,
+        "files_converted": len(converted),
+        "output_bytes": sum(p.stat().st_size for p in converted),
+        "errors": errors,
+        "peak_rss_mb": _peak_rss_mb("self"),
+        "peak_child_rss_mb": _peak_rss_mb("children"),
+        "stages": tracer.summary(),
+    }
+
+
+def _run_in_subprocess(args: Dict) -> Dict:
+    """在子进程中运行场景并解析结果"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--scenario", json.dumps(args)],
+        capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"场景运行失败: {result.stderr.strip()}")
+    # 最后一行为JSON结果，之前可能有补丁等模块的打印输出
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def _ffmpeg_version(ffmpeg: str) -> str:
+    """获取ffmpeg版本字符串"""
+    try:
+        output = subprocess.run([ffmpeg, "-version"], capture_output=True, text=True).stdout
+        return output.splitlines()[0] if output else "unknown"
+    except OSError:
+        return "unknown"
+
+
+def run_benchmark(formats: List[str], workers: List[int], engines: List[str],
+                  repeat: int, copies: int, work_dir: Path,
+                  trace_dir: Optional[Path] = None) -> Dict:
+    """运行全部场景组合并汇总结果（trace_dir不为空时导出每个场景最后一次运行的trace）"""
+    ffmpeg = get_ffmpeg_path()
+    corpus_dir = work_dir / "corpus"
+    entries = generate_corpus(corpus_dir, copies, ffmpeg)
+    audio_seconds = sum(e["seconds"] for e in entries)
+    input_bytes = sum((corpus_dir / e["name"]).stat().st_size for e in entries)
+
+    results = []
+    for output_format, worker_count, engine in product(formats, workers, engines):
+        label = f"{engine} -> {output_format} x{worker_count}"
+        runs = []
+        trace_path = None
+        if trace_dir:
+            trace_dir.mkdir(parents=True, exist_ok=True)
+            trace_path = str(trace_dir / f"{engine}_{output_format}_x{worker_count}.trace.json")
+        for i in range(repeat):
+            output_dir = work_dir / "output"
+            if output_dir.exists():
+                shutil.rmtree(output_dir)
+            output_dir.mkdir()
+
+            runs.append(_run_in_subprocess({
+                "corpus_dir": str(corpus_dir),
+                "output_dir": str(output_dir),
+                "output_format": output_format,
+                "workers": worker_count,
+                "engine": engine,
+                "trace_path": trace_path,
+            }))
+
+        # 取中位数耗时，内存取最大值
+        seconds = statistics.median(r["seconds"] for r in runs)
+        files = runs[-1]["files_converted"]
+        peak_rss = [r["peak_rss_mb"] for r in runs if r["peak_rss_mb"] is not None]
+        peak_child = [r["peak_child_rss_mb"] for r in runs if r["peak_child_rss_mb"] is not None]
+        result = {
+            "engine": engine,
+            "output_format": output_format,
+            "workers": worker_count,
+            "repeat": repeat,
+            "seconds": seconds,
+            "seconds_all": [r["seconds"] for r in runs],
+            "files": files,
+            "files_per_s": files / seconds if seconds else 0.0,
+            "audio_seconds_per_s": audio_seconds / seconds if seconds else 0.0,
+            "output_bytes": runs[-1]["output_bytes"],
+            "peak_rss_mb": max(peak_rss) if peak_rss else None,
+            "peak_child_rss_mb": max(peak_child) if peak_child else None,
+            "errors": runs[-1]["errors"],
+            # 各阶段耗时汇总，用于判断瓶颈在I/O、解码还是编码
+            "stages": runs[-1]["stages"],
+        }
+        results.append(result)
+        print(f"⏱️  {label}: {seconds:.2f}s, {result['files_per_s']:.2f} 文件/s, "
+              f"{result['audio_seconds_per_s']:.1f} 音频秒/s"
+              + (f", ❌ {len(result['errors'])} 个错误" if result["errors"] else ""))
+
+    return {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "ffmpeg": _ffmpeg_version(ffmpeg),
+            "corpus_files": len(entries),
+            "corpus_audio_seconds": audio_seconds,
+            "corpus_bytes": input_bytes,
+        },
+        "results": results,
+    }
+
+
+def compare_with_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    与基线结果比较，返回吞吐量下降超过容差的场景描述
+    """
+    def key(r):
+        return (r["engine"], r["output_format"], r["workers"])
+
+    previous = {key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in report["results"]:
+        old = previous.get(key(result))
+        if not old or not old.get("files_per_s"):
+            continue
+        change = result["files_per_s"] / old["files_per_s"] - 1
+        if change < -tolerance:
+            engine, fmt, workers = key(result)
+            regressions.append(f"{engine} -> {fmt} x{workers}: "
+                               f"{old['files_per_s']:.2f} -> {result['files_per_s']:.2f} 文件/s "
+                               f"({change:+.1%})")
+    return regressions
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="音乐格式转换器性能基准测试")
+    parser.add_argument("-f", "--formats", nargs="+", default=DEFAULT_FORMATS,
+                        help="输出格式列表")
+    parser.add_argument("-w", "--workers", nargs="+", type=int, default=DEFAULT_WORKERS,
+                        help="线程数列表")
+    parser.add_argument("-e", "--engines", nargs="+", default=ENGINES, choices=ENGINES,
+                        help="转换引擎列表")
+    parser.add_argument("-r", "--repeat", type=int, default=3, help="每个场景重复次数")
+    parser.add_argument("-c", "--copies", type=int, default=1, help="语料规格的份数")
+    parser.add_argument("-d", "--work-dir", default="bench_work", help="语料和输出的工作目录")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="结果JSON文件")
+    parser.add_argument("--trace-dir", help="导出各场景Chrome/Perfetto trace文件的目录")
+    parser.add_argument("--baseline", help="用于比较的历史结果JSON文件")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="允许的吞吐量下降比例（默认0.10）")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        # 子进程模式：运行单个场景并输出JSON
+        print(json.dumps(run_scenario(**json.loads(args.scenario))))
+        return True
+
+    print("=" * 50)
+    print("🎵 音乐格式转换器 - 性能基准测试")
+    print("=" * 50)
+
+    report = run_benchmark(args.formats, args.workers, args.engines,
+                           args.repeat, args.copies, Path(args.work_dir),
+                           Path(args.trace_dir) if args.trace_dir else None)
+    Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2),
+                                 encoding="utf-8")
+    print(f"\n📊 结果已保存: {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        regressions = compare_with_baseline(report, baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠️  发现 {len(regressions)} 个性能回退:")
+            for line in regressions:
+                print(f"  - {line}")
+            return False
+        print("\n✅ 未发现超过容差的性能回退")
+
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
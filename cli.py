@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+音乐格式转换器 - 命令行（无界面）入口
+适用于无人值守的批量转换，可导出指标和阶段计时
+
+用法:
+    python cli.py 输入文件或文件夹... -f mp3 [-o 输出目录] [-w 线程数]
+    python cli.py music/ -f flac --metrics-port 9464 --metrics-textfile /var/lib/node_exporter/mc.prom
+    python cli.py /mnt/share/music -f mp3 --spool /mnt/share/spool   # 提交到共享队列并参与转换
+    python cli.py --spool /mnt/share/spool                           # 从共享队列认领任务
+"""
+
+import os
+import sys
+import argparse
+import threading
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置ffmpeg路径（在导入pydub之前）
+from ffmpeg_config import setup_ffmpeg
+setup_ffmpeg()
+
+from converter import MusicConverter, ENGINES, create_converter
+from events import (ThrottledDispatcher, ConversionFinished, JobFailed, Message,
+                    describe_event)
+from metrics import (ConverterMetrics, PeriodicExporter, PrometheusTextFileSink,
+                     PrometheusHTTPExporter, JsonLinesSink)
+from tracing import Tracer
+from scanner import expand_paths
+from archive import archive_format
+from options import add_option_arguments, options_from_args
+from spool import LEASE_TIMEOUT, SpoolQueue, SpoolWorker
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构造命令行参数解析器"""
+    parser = argparse.ArgumentParser(description="音乐格式转换器（命令行模式）")
+    parser.add_argument("inputs", nargs="*", help="输入文件或文件夹")
+    parser.add_argument("-f", "--format",
+                        choices=MusicConverter.SUPPORTED_OUTPUT_FORMATS, help="输出格式")
+    parser.add_argument("-o", "--output-dir",
+                        help="输出目录（留空则使用默认输出目录；以 .zip/.tar/.tar.gz 等结尾时直接写入压缩包）")
+    parser.add_argument("-w", "--workers", type=int, help="并行转换的线程数")
+    parser.add_argument("-e", "--engine", choices=ENGINES, default="pydub",
+                        help="转换引擎（ffmpeg-async 直接并发运行ffmpeg子进程）")
+    parser.add_argument("-s", "--source-formats", nargs="+",
+                        choices=MusicConverter.SUPPORTED_INPUT_FORMATS, help="源文件格式筛选")
+    parser.add_argument("--device-limit", action="append", default=[], metavar="[PATH=]N",
+                        help="每个存储设备（输入和输出所在的磁盘）同时运行的任务数上限：N 为所有设备的默认上限，"
+                             "PATH=N 为该路径所在设备的上限，可以指定多次")
+    parser.add_argument("--batch-files", type=int, default=1, metavar="N",
+                        help="ffmpeg-async 引擎：每个ffmpeg进程同时转换的小文件数（大量短音频时减少启动进程的开销）")
+    parser.add_argument("--batch-max-size", type=float, default=4.0, metavar="MB",
+                        help="参与分组转换的文件大小上限（MB）")
+    parser.add_argument("--scratch-dir", metavar="DIR",
+                        help="临时文件目录（压缩包成员解压、cue镜像解码等），例如 tmpfs；默认为系统临时目录")
+    parser.add_argument("--scratch-limit", type=float, metavar="MB",
+                        help="临时文件目录的容量上限（MB），超出时任务等待其他任务释放空间")
+    parser.add_argument("--stage", action="store_true",
+                        help="暂存模式：输入先复制到本地临时目录再转换，输出在后台写回（SMB共享、U盘等慢速存储），"
+                             "本地空间受 --scratch-limit 限制")
+    parser.add_argument("--stage-bandwidth", type=float, metavar="MB/S",
+                        help="暂存模式下复制和写回共用的带宽上限（MB/s），避免占满共享链路")
+    parser.add_argument("--prefetch", type=int, default=0, metavar="N",
+                        help="在后台提前读取接下来的N个输入文件（机械硬盘、NAS上转换时读取与编码重叠）")
+    parser.add_argument("--prefetch-limit", type=float, default=512.0, metavar="MB",
+                        help="已预读但尚未开始转换的文件总大小上限（MB）")
+    parser.add_argument("-q", "--quiet", action="store_true", help="只输出错误信息")
+    parser.add_argument("--updates-per-second", type=float, default=5.0,
+                        help="每秒最多输出的状态更新次数")
+
+    add_option_arguments(parser)
+
+    group = parser.add_argument_group("共享目录队列")
+    group.add_argument("--spool", help="共享任务队列目录：有输入时先提交任务，然后认领并执行队列中的任务，"
+                                       "直到队列为空")
+    group.add_argument("--lease-timeout", type=float, default=LEASE_TIMEOUT,
+                       help="任务租约有效期（秒），节点崩溃后经过该时间任务会被其他节点收回")
+    group.add_argument("--max-attempts", type=int, default=3, help="单个任务的最大认领次数")
+
+    group = parser.add_argument_group("指标与计时")
+    group.add_argument("--metrics-port", type=int, help="在本地端口提供Prometheus /metrics 端点")
+    group.add_argument("--metrics-host", default="127.0.0.1", help="指标端点监听地址")
+    group.add_argument("--metrics-textfile", help="定期写入的Prometheus文本文件")
+    group.add_argument("--metrics-jsonl", help="定期追加的JSON Lines指标快照文件")
+    group.add_argument("--metrics-interval", type=float, default=10.0, help="指标导出间隔（秒）")
+    group.add_argument("--trace", help="导出Chrome/Perfetto trace文件")
+    group.add_argument("--trace-jsonl", help="导出JSON Lines格式的阶段计时")
+    return parser
+
+
+def spool_jobs(args):
+    """展开输入，返回提交到队列的 (文件列表, 输出格式, 输出目录, 转换选项)"""
+    formats = args.source_formats or MusicConverter.SUPPORTED_INPUT_FORMATS
+    files = [os.path.abspath(path) for path in expand_paths(args.inputs, formats)]
+    output_dir = args.output_dir
+    if output_dir is None and len(args.inputs) == 1 and os.path.isdir(args.inputs[0]):
+        # 与单机转换文件夹时的默认输出目录一致
+        output_dir = os.path.join(args.inputs[0], "converted")
+    if output_dir:
+        output_dir = os.path.abspath(output_dir)
+    return files, args.format, output_dir, options_from_args(args)
+
+
+def main(argv=None) -> bool:
+    """主函数"""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.inputs and not args.format:
+        parser.error("需要指定输出格式 -f/--format")
+    if not args.inputs and not args.spool:
+        parser.error("需要指定输入文件或 --spool 队列目录")
+    if args.spool and args.output_dir and archive_format(args.output_dir):
+        parser.error("队列模式的任务由多个进程完成，不支持输出到压缩包")
+    if args.updates_per_second <= 0:
+        parser.error("--updates-per-second 必须大于 0")
+    if args.batch_files < 1:
+        parser.error("--batch-files 至少为 1")
+    if args.batch_files > 1 and args.engine != "ffmpeg-async":
+        parser.error("--batch-files 需要使用 ffmpeg-async 引擎（-e ffmpeg-async）")
+    if args.stage_bandwidth is not None and not args.stage:
+        parser.error("--stage-bandwidth 需要同时指定 --stage")
+
+    device_limits = None
+    if args.device_limit:
+        from devices import DeviceLimits
+        try:
+            device_limits = DeviceLimits.parse(args.device_limit)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.output_dir and not archive_format(args.output_dir):
+        # 单文件模式的转换器不会创建输出目录
+        try:
+            os.makedirs(args.output_dir, exist_ok=True)
+        except OSError as e:
+            print(f"❌ 无法创建输出目录: {e}", file=sys.stderr)
+            return False
+
+    converter = create_converter(args.engine, args.workers)
+    converter.set_device_limits(device_limits)
+    if args.batch_files > 1:
+        converter.batch_files = args.batch_files
+        converter.batch_max_bytes = int(args.batch_max_size * 1024 * 1024)
+    if args.scratch_dir or args.scratch_limit:
+        from scratch import ScratchSpace
+        limit = int(args.scratch_limit * 1024 * 1024) if args.scratch_limit else None
+        converter.set_scratch(ScratchSpace(args.scratch_dir, limit))
+    if args.stage:
+        bandwidth = args.stage_bandwidth * 1024 * 1024 if args.stage_bandwidth else None
+        converter.set_staging(True, bandwidth)
+    options = options_from_args(args)
+    if args.loudness_cache:
+        from loudness import LoudnessCache
+        converter.set_options(options, LoudnessCache(args.loudness_cache))
+    else:
+        converter.set_options(options)
+    done = threading.Event()
+    result = {"success": False}
+
+    def on_events(events):
+        for event in events:
+            text = describe_event(event)
+            if not text:
+                continue
+            if isinstance(event, JobFailed) or (isinstance(event, Message) and event.level == "error"):
+                print(f"❌ {text}", file=sys.stderr, flush=True)
+            elif not args.quiet:
+                print(text, flush=True)
+
+    def on_finished(event):
+        if isinstance(event, ConversionFinished):
+            result["success"] = event.success
+            done.set()
+
+    # 状态输出经过合并限流，结束信号直接订阅以免延迟
+    dispatcher = ThrottledDispatcher(on_events, args.updates_per_second)
+    converter.events.subscribe(dispatcher.push)
+    converter.events.subscribe(on_finished)
+
+    # 指标输出端
+    exporter = None
+    if args.metrics_port is not None or args.metrics_textfile or args.metrics_jsonl:
+        metrics = ConverterMetrics()
+        converter.set_metrics(metrics)
+        sinks = []
+        if args.metrics_port is not None:
+            http_sink = PrometheusHTTPExporter(metrics.registry, args.metrics_port, args.metrics_host)
+            print(f"📈 指标端点: http://{args.metrics_host}:{http_sink.port}/metrics", flush=True)
+            sinks.append(http_sink)
+        if args.metrics_textfile:
+            sinks.append(PrometheusTextFileSink(args.metrics_textfile))
+        if args.metrics_jsonl:
+            sinks.append(JsonLinesSink(args.metrics_jsonl))
+        exporter = PeriodicExporter(metrics.registry, sinks, args.metrics_interval)
+        exporter.start()
+
+    prefetcher = None
+    if args.prefetch > 0:
+        from prefetch import Prefetcher
+        prefetcher = Prefetcher(args.prefetch, int(args.prefetch_limit * 1024 * 1024))
+        converter.set_prefetcher(prefetcher)
+        prefetcher.start()
+
+    tracer = None
+    if args.trace or args.trace_jsonl:
+        tracer = Tracer()
+        converter.set_tracer(tracer)
+
+    stop = converter.stop_conversion
+    if args.spool:
+        queue = SpoolQueue(args.spool, lease_timeout=args.lease_timeout,
+                           max_attempts=args.max_attempts)
+        if args.inputs:
+            submitted = queue.submit(*spool_jobs(args))
+            print(f"📥 已向队列提交 {submitted} 个任务", flush=True)
+        worker = SpoolWorker(queue, converter)
+        worker_thread = threading.Thread(target=worker.run, name="spool-worker", daemon=True)
+        worker_thread.start()
+
+        def stop():
+            # 等待被中断的任务放回队列
+            worker.stop()
+            worker_thread.join(30)
+    else:
+        is_batch = len(args.inputs) > 1 or os.path.isdir(args.inputs[0])
+        converter.start_conversion(args.inputs, args.format, args.output_dir, is_batch,
+                                   source_formats=args.source_formats)
+    try:
+        # 使用带超时的等待，保证Ctrl+C可以及时响应
+        while not done.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        stop()
+        print("\n⚠️ 用户中断转换", file=sys.stderr)
+    finally:
+        dispatcher.stop()
+        if prefetcher:
+            prefetcher.stop()
+        if exporter:
+            exporter.stop()
+        if tracer and args.trace:
+            tracer.export_chrome_trace(args.trace)
+        if tracer and args.trace_jsonl:
+            tracer.export_jsonl(args.trace_jsonl)
+
+    return result["success"]
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -8,42 +8,310 @@
 import os
 import threading
 import gc
-import asyncio
 import time
-from concurrent.futures import ThreadPoolExecutor
-from typing import List, Optional, Callable
+import functools
+import itertools
+import shutil
+import subprocess
+import tempfile
+import dataclasses
+from contextlib import contextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Callable, Union
 from pathlib import Path
 from pydub import AudioSegment
 from pydub.exceptions import CouldntDecodeError
 
+from scanner import iter_audio_files, expand_paths, has_format
+from cue import is_cue, parse_cue
+import archive
+from options import ConversionOptions
+from scratch import ScratchSpace
+from devices import DeviceLimits, DeviceQueue, job_devices
+import silence
+from events import (EventBus, LegacyCallbackAdapter, BatchStarted, JobQueued, JobStarted,
+                    JobProgress, JobFinished, JobFailed, BatchProgress, BatchFinished,
+                    ConversionFinished, Message)
+
+
+# 可用的转换引擎
+ENGINES = ["pydub", "ffmpeg-async"]
+
+# ffmpeg输出各格式使用的编码参数（与pydub引擎的导出参数保持一致）
+OUTPUT_CODEC_ARGS = {
+    "mp3": ["-c:a", "libmp3lame", "-b:a", "192k", "-q:a", "2"],
+    "wav": ["-c:a", "pcm_s16le"],
+    "flac": ["-c:a", "flac"],
+    "aac": ["-c:a", "aac"],
+    "m4a": ["-c:a", "aac"],
+    "ogg": ["-c:a", "libvorbis"],
+}
+
+# 重采样质量预设（aresample 参数）
+RESAMPLER_PRESETS = {
+    "fast": "filter_size=8:phase_shift=6",
+    "standard": "",
+    "high": "resampler=soxr:precision=28",
+}
+# ffmpeg没有编译 libsoxr 时 high 使用的 swr 参数
+_HIGH_QUALITY_SWR = "filter_size=64:phase_shift=14:cutoff=0.97"
+
+# 位深 -> aresample 输出样本格式（24位使用s32容器）
+_SAMPLE_FORMATS = {16: "s16", 24: "s32", 32: "s32"}
+
+
+@functools.lru_cache(maxsize=None)
+def ffmpeg_has_soxr(ffmpeg_path: str) -> bool:
+    """ffmpeg是否编译了 libsoxr"""
+    try:
+        result = subprocess.run([ffmpeg_path, "-hide_banner", "-buildconf"],
+                                capture_output=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return False
+    return b"--enable-libsoxr" in result.stdout + result.stderr
+
+
+def format_filter(options: ConversionOptions, ffmpeg_path: str) -> Optional[str]:
+    """
+    采样率、声道和位深转换滤镜，放在滤镜链最后，由一个 aresample 一次完成；
+    不需要转换时返回None
+    """
+    params = []
+    if options.sample_rate:
+        params.append(f"osr={options.sample_rate}")
+    if options.channels:
+        params.append(f"ochl={'mono' if options.channels == 1 else 'stereo'}")
+    if options.bit_depth:
+        # 降低位深时加三角抖动
+        params += [f"osf={_SAMPLE_FORMATS[options.bit_depth]}", "dither_method=triangular"]
+    if not params:
+        return None
+    if options.sample_rate:
+        preset = RESAMPLER_PRESETS.get(options.resampler, "")
+        if options.resampler == "high" and not ffmpeg_has_soxr(ffmpeg_path):
+            preset = _HIGH_QUALITY_SWR
+        if preset:
+            params.append(preset)
+    return "aresample=" + ":".join(params)
+
+
+def metadata_args(tags: dict) -> List[str]:
+    """写入输出文件标签的ffmpeg参数"""
+    arguments = []
+    for key, value in tags.items():
+        arguments += ["-metadata", f"{key}={value}"]
+    return arguments
+
+
+def codec_args(output_format: str, bit_depth: Optional[int] = None) -> List[str]:
+    """输出格式的编码参数，bit_depth 只对无损格式生效"""
+    args = list(OUTPUT_CODEC_ARGS.get(output_format, []))
+    if bit_depth and output_format == "wav":
+        args = ["-c:a", f"pcm_s{bit_depth}le"]
+    elif bit_depth and output_format == "flac":
+        args += ["-sample_fmt", _SAMPLE_FORMATS[bit_depth]]
+        if bit_depth == 24:
+            args += ["-bits_per_raw_sample", "24"]
+    return args
+
+
+def create_converter(engine: str = "pydub", max_workers: Optional[int] = None) -> "MusicConverter":
+    """
+    按引擎名称创建转换器
+    
+    Args:
+        engine: "pydub"（线程池 + pydub）或 "ffmpeg-async"（asyncio驱动ffmpeg子进程）
+        max_workers: 并行转换数
+    """
+    if engine == "pydub":
+        return MusicConverter(max_workers=max_workers)
+    if engine == "ffmpeg-async":
+        from async_engine import AsyncFFmpegConverter
+        return AsyncFFmpegConverter(max_workers=max_workers)
+    raise ValueError(f"未知的转换引擎: {engine}")
+
+
+class _JobContext:
+    """单个任务的状态和各阶段耗时"""
+    
+    __slots__ = ("job_id", "input_path", "stage", "timings", "start")
+    
+    def __init__(self, job_id: int, input_path: str):
+        self.job_id = job_id
+        self.input_path = input_path
+        self.stage = "queued"
+        self.timings = {}
+        self.start = time.perf_counter()
+    
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+
 class MusicConverter:
     """音乐格式转换器核心类"""
     
-    # 支持的输入格式
-    SUPPORTED_INPUT_FORMATS = ['mp3', 'wav', 'flac', 'aac', 'm4a', 'ogg', 'wma', 'ape', 'tta']
+    # 支持的输入格式（cue 表示按 cue 文件把整轨镜像分轨转换）
+    SUPPORTED_INPUT_FORMATS = ['mp3', 'wav', 'flac', 'aac', 'm4a', 'ogg', 'wma', 'ape', 'tta', 'cue',
+                               'zip', 'tar']
     
     # 支持的输出格式
     SUPPORTED_OUTPUT_FORMATS = ['mp3', 'wav', 'flac', 'aac', 'ogg', 'm4a']
     
-    def __init__(self):
-        """初始化转换器"""
+    # 转换引擎名称，随任务结果事件上报
+    ENGINE = "pydub"
+    
+    def __init__(self, max_workers: Optional[int] = None):
+        """
+        初始化转换器
+        
+        Args:
+            max_workers: 并行转换的线程数，如果为None则使用 min(4, CPU核数)
+        """
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
         self.is_converting = False
         self.current_file = ""
-        self.progress_callback = None
-        self.status_callback = None
-        self.error_callback = None
-        self.complete_callback = None
+        # 结构化事件总线，界面、命令行和指标统计都从这里订阅
+        self.events = EventBus()
+        # 阶段计时器（tracing.Tracer），默认关闭
+        self.tracer = None
+        self._job_ids = itertools.count(1)
+        self._unsubscribe_callbacks = None
+        self._unsubscribe_metrics = None
+        self._unsubscribe_prefetcher = None
+        # 默认转换选项（单个任务可以单独指定）
+        self.options = ConversionOptions()
+        # 响度测量缓存（loudness.LoudnessCache），为None时使用默认缓存文件
+        self.loudness_cache = None
+        self._loudness = None
+        self._loudness_lock = threading.Lock()
+        # 同时运行的编码进程数上限（所有任务共用，按静音拆分或cue分轨的音轨并行编码时也不超过并发数）
+        self._encode_slots = threading.BoundedSemaphore(self.max_workers)
+        # 临时文件目录和容量上限（scratch.ScratchSpace），默认为系统临时目录
+        self.scratch = ScratchSpace()
+        # 每个存储设备的并发上限（devices.DeviceLimits），为None时只限制总并发数
+        self.device_limits: Optional[DeviceLimits] = None
+        # 暂存模式：输入复制到本地转换，输出由后台线程写回（staging.StagingArea）
+        self.stage_io = False
+        self.stage_bandwidth: Optional[float] = None
+        self._staging = None
+        # 暂存模式下在事件发出前把本地路径换回原始路径（_convert_staged 设置）
+        self._translate_event: Optional[Callable] = None
+        # 批量转换期间的校验线程池（与编码线程池分开，校验和后续任务的编码同时进行）
+        self._verify_pool: Optional[ThreadPoolExecutor] = None
     
-    def set_callbacks(self, progress_cb: Callable, status_cb: Callable, 
+    def set_callbacks(self, progress_cb: Callable, status_cb: Callable,
                      error_cb: Callable, complete_cb: Callable):
-        """设置回调函数"""
-        self.progress_callback = progress_cb
-        self.status_callback = status_cb
-        self.error_callback = error_cb
-        self.complete_callback = complete_cb
-    
-    def convert_single_file(self, input_path: str, output_format: str, 
-                           output_dir: str = None) -> bool:
+        """设置回调函数（兼容旧接口，内部由事件转换而来，新代码请订阅 events）"""
+        if self._unsubscribe_callbacks:
+            self._unsubscribe_callbacks()
+        self._unsubscribe_callbacks = self.events.subscribe(
+            LegacyCallbackAdapter(progress_cb, status_cb, error_cb, complete_cb)
+        )
+    
+    def set_tracer(self, tracer):
+        """设置阶段计时器（tracing.Tracer），为None时关闭计时"""
+        self.tracer = tracer
+    
+    def set_metrics(self, metrics):
+        """设置指标集合（metrics.ConverterMetrics），为None时关闭指标统计"""
+        if self._unsubscribe_metrics:
+            self._unsubscribe_metrics()
+            self._unsubscribe_metrics = None
+        if metrics is not None:
+            self._unsubscribe_metrics = self.events.subscribe(metrics.handle)
+    
+    def set_prefetcher(self, prefetcher):
+        """设置输入预读（prefetch.Prefetcher，由调用方启动和停止），为None时关闭预读"""
+        if self._unsubscribe_prefetcher:
+            self._unsubscribe_prefetcher()
+            self._unsubscribe_prefetcher = None
+        if prefetcher is not None:
+            self._unsubscribe_prefetcher = self.events.subscribe(prefetcher.handle)
+    
+    def set_device_limits(self, limits: Optional[DeviceLimits]):
+        """设置每个存储设备的并发上限，为None时不按设备限制"""
+        self.device_limits = limits if limits is not None and limits.enabled else None
+    
+    def set_staging(self, enabled: bool, bandwidth: Optional[float] = None):
+        """
+        设置暂存模式（适用于SMB共享、U盘等慢速存储上的批量转换）
+        本地空间使用 scratch 目录和容量上限；bandwidth 为复制和写回共用的带宽上限（字节/秒）
+        """
+        self.stage_io = enabled
+        self.stage_bandwidth = bandwidth
+    
+    def set_scratch(self, scratch: Optional[ScratchSpace]):
+        """设置临时文件目录（scratch.ScratchSpace），为None时使用系统临时目录且不限容量"""
+        self.scratch = scratch or ScratchSpace()
+    
+    def set_options(self, options: Optional[ConversionOptions], loudness_cache=None):
+        """设置默认转换选项和响度测量缓存"""
+        self.options = options or ConversionOptions()
+        if loudness_cache is not None:
+            with self._loudness_lock:
+                self.loudness_cache = loudness_cache
+                self._loudness = None
+    
+    @property
+    def loudness(self):
+        """响度分析器（loudness.LoudnessAnalyzer），第一次需要标准化时创建"""
+        with self._loudness_lock:
+            if self._loudness is None:
+                from loudness import LoudnessAnalyzer, LoudnessCache
+                cache = self.loudness_cache if self.loudness_cache is not None else LoudnessCache()
+                self._loudness = LoudnessAnalyzer(AudioSegment.converter, cache)
+            return self._loudness
+    
+    def _loudness_gain(self, job: _JobContext, options: ConversionOptions, measurement) -> float:
+        """由测量结果计算标准化增益，并提示测量值"""
+        gain = measurement.gain_for(options.loudness_target, options.true_peak_limit)
+        self._emit(Message("info", f"{Path(job.input_path).name}: 响度 "
+                                   f"{measurement.integrated:.1f} LUFS，真峰值 "
+                                   f"{measurement.true_peak:.1f} dBTP，增益 {gain:+.2f} dB",
+                           job.job_id))
+        return gain
+    
+    def _audio_filters(self, job: _JobContext, options: ConversionOptions,
+                       input_path: str) -> List[str]:
+        """导出时由ffmpeg应用的音频滤镜（cue 分轨时 input_path 为镜像文件，按整张专辑标准化）"""
+        filters = []
+        if options.normalize:
+            with self._span("loudness", job):
+                if archive.is_member(input_path):
+                    # 响度测量需要完整读取两遍，压缩包成员先解压为临时文件
+                    with self.scratch.directory(archive.member_size(input_path)) as folder:
+                        measurement = self.loudness.analyze(archive.extract_to(input_path,
+                                                                               folder))
+                else:
+                    measurement = self.loudness.analyze(input_path)
+            filters.append(f"volume={self._loudness_gain(job, options, measurement):.2f}dB")
+        conversion = format_filter(options, AudioSegment.converter)
+        if conversion:
+            filters.append(conversion)
+        return filters
+    
+    @contextmanager
+    def _span(self, stage: str, job: _JobContext, **args):
+        """记录一个阶段的耗时"""
+        job.stage = stage
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self._record_stage(stage, start_ns, time.perf_counter_ns(), job, args)
+    
+    def _record_stage(self, stage: str, start_ns: int, end_ns: int,
+                      job: _JobContext, args: Optional[dict] = None):
+        """累计任务的阶段耗时，并转发给计时器"""
+        job.timings[stage] = job.timings.get(stage, 0.0) + (end_ns - start_ns) / 1e9
+        if self.tracer is not None:
+            self.tracer.record(stage, start_ns, end_ns, job.job_id, **(args or {}))
+    
+    def convert_single_file(self, input_path: str, output_format: str,
+                           output_dir: str = None, job_id: Optional[int] = None,
+                           queued_ns: Optional[int] = None,
+                           options: Optional[ConversionOptions] = None) -> bool:
         """
         转换单个音乐文件（优化版）
         
@@ -51,108 +319,604 @@ class MusicConverter:
             input_path: 输入文件路径
             output_format: 输出格式（如 'mp3', 'wav'）
             output_dir: 输出目录，如果为None则使用输入文件所在目录
-            
+            job_id: 任务编号，为None时自动分配
+            queued_ns: 任务提交到线程池的时间（perf_counter_ns），用于统计排队耗时
+            options: 转换选项，为None时使用 self.options
+        
         Returns:
-            bool: 转换是否成功
+            bool: 转换是否成功（开启校验时包括校验结果）
         """
+        result = self._convert_job(input_path, output_format, output_dir, job_id, queued_ns,
+                                   options)
+        return result.result() if isinstance(result, Future) else result
+    
+    def _convert_job(self, input_path: str, output_format: str, output_dir: Optional[str],
+                     job_id: Optional[int], queued_ns: Optional[int],
+                     options: Optional[ConversionOptions]) -> Union[bool, Future]:
+        """执行转换，校验在校验线程池中进行时返回校验结果的 Future"""
+        job = _JobContext(next(self._job_ids) if job_id is None else job_id, str(input_path))
+        start_ns = time.perf_counter_ns()
+        if queued_ns is not None:
+            self._record_stage("queue_wait", queued_ns, start_ns, job)
+        
+        self._emit(JobStarted(job.job_id, job.input_path, output_format))
+        try:
+            error = self._wait_staged(job)
+            if error:
+                return self._fail(job, error)
+            return self._convert_single_file(job, output_format, output_dir,
+                                             options or self.options)
+        finally:
+            if self.tracer is not None:
+                self.tracer.record("job", start_ns, time.perf_counter_ns(), job.job_id,
+                                   file=os.path.basename(job.input_path))
+    
+    def _wait_staged(self, job: _JobContext) -> Optional[str]:
+        """暂存模式下等待输入复制到本地，复制失败时返回错误信息"""
+        staging = self._staging
+        if staging is None:
+            return None
+        with self._span("download", job):
+            return staging.wait(job.input_path)
+    
+    def _run_next(self, queue: DeviceQueue):
+        """按设备限制时线程池的每次提交：从队列中取一个设备有空闲名额的任务执行"""
+        devices, (arguments, future) = queue.take()
+        try:
+            future.set_result(self._convert_job(*arguments))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            queue.release(devices)
+    
+    def _convert_single_file(self, job: _JobContext, output_format: str,
+                             output_dir: Optional[str], options: ConversionOptions) -> bool:
+        """转换单个文件的具体实现"""
         audio = None  # 确保在finally中可以清理
         try:
-            if not os.path.exists(input_path):
-                self._error(f"文件不存在: {input_path}")
-                return False
+            error = self._check_job(job, output_format)
+            if error:
+                return self._fail(job, error)
             
             # 获取文件信息
-            input_path = Path(input_path)
-            input_stem = input_path.stem
+            input_path = Path(job.input_path)
+            sheet = None
+            if is_cue(input_path):
+                # 按cue分轨：解码cue引用的整轨镜像
+                try:
+                    sheet = parse_cue(str(input_path))
+                except (OSError, ValueError) as e:
+                    return self._fail(job, f"无法解析cue文件 {input_path.name}: {str(e)}")
+                image = sheet.image_path
+                if image is None:
+                    return self._fail(job, f"找不到cue引用的文件: {sheet.file}")
+                input_path = Path(image)
             input_suffix = input_path.suffix.lower()[1:]  # 去掉点
+            member = archive.is_member(job.input_path)
+            output_path = self._output_path(input_path, output_format, output_dir)
+            if member:
+                output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            # 检查输入格式支持
-            if input_suffix not in self.SUPPORTED_INPUT_FORMATS:
-                self._error(f"不支持的输入格式: {input_suffix}")
-                return False
+            self._job_progress(job, 0)
             
-            # 检查输出格式支持
-            if output_format not in self.SUPPORTED_OUTPUT_FORMATS:
-                self._error(f"不支持的输出格式: {output_format}")
-                return False
-            
-            # 设置输出路径
-            if output_dir:
-                output_path = Path(output_dir) / f"{input_stem}.{output_format}"
-            else:
-                output_path = input_path.parent / f"{input_stem}.{output_format}"
-            
-            # 避免覆盖原文件
-            if output_path.exists() and output_path == input_path:
-                output_path = input_path.parent / f"{input_stem}_converted.{output_format}"
-            
-            self._status(f"正在转换: {input_path.name} -> {output_format}")
-            self._progress(0)
+            if input_suffix == "wav" and output_format == "wav" and not member and sheet is None:
+                # wav 转 wav 优先走直通，不需要解码
+                result = self._transcode_wav(job, input_path, output_path, options)
+                if result is False:
+                    return False
+                if result is not None:
+                    return self._finish(job, result, output_format, options)
             
             # 加载音频文件（使用内存优化）
             try:
                 # 使用临时文件减少内存占用（对于大文件）
-                file_size = input_path.stat().st_size
+                with self._span("stat", job):
+                    if member:
+                        file_size = archive.member_size(job.input_path)
+                    else:
+                        file_size = input_path.stat().st_size
                 if file_size > 100 * 1024 * 1024:  # 大于100MB
-                    self._status(f"正在加载大文件: {input_path.name} ({file_size/(1024*1024):.1f}MB)")
+                    self._emit(Message("info", f"正在加载大文件: {input_path.name} "
+                                               f"({file_size/(1024*1024):.1f}MB)", job.job_id))
                 
-                audio = AudioSegment.from_file(str(input_path), format=input_suffix)
+                with self._span("decode", job, format=input_suffix, bytes=file_size):
+                    if member:
+                        # 直接从压缩包中流式读取，不解压到磁盘
+                        with archive.open_member(job.input_path, self.scratch.root) as stream:
+                            audio = AudioSegment.from_file(stream, format=input_suffix)
+                    else:
+                        audio = AudioSegment.from_file(str(input_path), format=input_suffix)
+                audio_seconds = audio.duration_seconds
                 
                 # 及时清理原始数据
-                import gc
-                gc.collect()
-                
+                with self._span("gc", job):
+                    gc.collect()
+            
             except CouldntDecodeError:
-                self._error(f"无法解码文件: {input_path.name}")
-                return False
+                return self._fail(job, f"无法解码文件: {input_path.name}")
             except Exception as e:
-                self._error(f"加载文件失败: {str(e)}")
-                return False
+                return self._fail(job, f"加载文件失败: {str(e)}")
             
-            self._progress(50)
+            try:
+                filters = self._audio_filters(job, options, job.input_path if member
+                                              else str(input_path))
+            except Exception as e:
+                return self._fail(job, f"响度分析失败: {input_path.name}: {str(e)}")
+            
+            self._job_progress(job, 50)
+            
+            if options.needs_processing or sheet is not None:
+                ranges = None
+                if sheet is not None:
+                    ranges = [(start, start + length)
+                              for start, length in sheet.ranges(audio_seconds)]
+                try:
+                    with self._span("process", job):
+                        tracks = self._process_samples(audio, options, ranges)
+                    # 样本已转换为NumPy数组，立即释放 AudioSegment
+                    audio = None
+                except Exception as e:
+                    return self._fail(job, f"处理音频失败: {str(e)}")
+                if not tracks:
+                    return self._fail(job, f"音频全部为静音: {input_path.name}")
+                
+                tags = None
+                if sheet is not None:
+                    paths = sheet.track_paths(output_dir, output_format)
+                    paths[0].parent.mkdir(parents=True, exist_ok=True)
+                    tags = [sheet.tags(index) for index in range(len(tracks))]
+                elif options.split_silence:
+                    paths = [silence.track_path(output_path, index)
+                             for index in range(1, len(tracks) + 1)]
+                else:
+                    paths = [output_path]
+                return self._encode_tracks(job, tracks, paths, tags, output_format, filters,
+                                           options, file_size, audio_seconds)
             
             # 导出音频文件
             try:
-                # MP3需要指定编码器参数
-                if output_format == 'mp3':
-                    audio.export(str(output_path), format=output_format, 
-                               bitrate='192k', parameters=['-q:a', '2'])
-                else:
-                    audio.export(str(output_path), format=output_format)
+                with self._span("encode", job, format=output_format):
+                    import pcm
+                    # 解码数据通过管道交给编码的ffmpeg进程，不经过临时文件；
+                    # 滤镜由编码的ffmpeg进程应用，不需要额外处理一遍音频
+                    bit_depth = options.bit_depth
+                    if output_format == "wav" and not bit_depth:
+                        # 保持解码数据的位宽
+                        bit_depth = max(16, 8 * audio.sample_width)
+                    pcm.encode_raw(audio.raw_data, audio.frame_rate, audio.channels,
+                                   audio.sample_width, output_path, AudioSegment.converter,
+                                   codec_args(output_format, bit_depth), filters)
                 
                 # 导出后清理内存
                 del audio
-                gc.collect()
-                
-            except Exception as e:
-                self._error(f"导出文件失败: {str(e)}")
-                return False
-            
-            self._progress(100)
-            self._status(f"转换完成: {output_path.name}")
+                with self._span("gc", job):
+                    gc.collect()
             
-            return True
+            except Exception as e:
+                return self._fail(job, f"导出文件失败: {str(e)}")
             
+            self._job_progress(job, 100)
+            return self._finish(job, JobFinished(
+                job.job_id, job.input_path, str(output_path),
+                input_bytes=file_size,
+                output_bytes=output_path.stat().st_size,
+                audio_seconds=audio_seconds,
+                elapsed=job.elapsed,
+                timings=dict(job.timings),
+                engine=self.ENGINE,
+            ), output_format, options)
+        
         except Exception as e:
-            self._error(f"转换过程中发生错误: {str(e)}")
-            return False
+            return self._fail(job, f"转换过程中发生错误: {str(e)}")
         finally:
             # 确保内存清理
             if 'audio' in locals() and audio is not None:
                 del audio
-            gc.collect()
+            with self._span("gc", job):
+                gc.collect()
+    
+    def _transcode_wav(self, job: _JobContext, input_path: Path, output_path: Path,
+                       options: ConversionOptions) -> Union[None, bool, JobFinished]:
+        """
+        wav 转 wav 的直通（wavfile.py）：内存映射输入，分块转换后直接写出，不启动ffmpeg
+        不适用时返回None（由调用方走常规路径），失败时返回False，成功时返回尚未发出的完成事件
+        """
+        import wavfile
+        try:
+            info = wavfile.read_info(str(input_path))
+        except (OSError, ValueError):
+            # 文件头无法识别的交给ffmpeg处理
+            return None
+        if not wavfile.native_supported(info, options):
+            return None
+        file_size = input_path.stat().st_size
+        last_percent = 0
+        
+        def progress(percent):
+            nonlocal last_percent
+            if percent > last_percent and percent < 100:
+                last_percent = percent
+                self._job_progress(job, percent)
+        
+        try:
+            with self._span("transcode", job, format="wav", bytes=file_size, native=True):
+                wavfile.transcode(str(input_path), output_path, options, progress)
+        except (OSError, ValueError) as e:
+            return self._fail(job, f"转换 {input_path.name} 失败: {str(e)}")
+        
+        self._job_progress(job, 100)
+        return JobFinished(
+            job.job_id, job.input_path, str(output_path),
+            input_bytes=file_size,
+            output_bytes=output_path.stat().st_size,
+            audio_seconds=info.duration_seconds,
+            elapsed=job.elapsed,
+            timings=dict(job.timings),
+            engine=self.ENGINE,
+        )
+    
+    @staticmethod
+    def _process_samples(audio: AudioSegment, options: ConversionOptions,
+                         ranges: Optional[List[tuple]] = None) -> list:
+        """
+        把样本转换为 pcm.PcmBuffer 并原地处理
+        返回输出的各音轨（cue 分轨、去掉静音/拆分后的片段共享同一块样本内存），
+        全部为静音时返回空列表。ranges 为cue音轨的 (开始, 结束) 秒，指定时不做静音处理
+        """
+        import pcm
+        if not pcm.available():
+            raise RuntimeError("淡入淡出、静音裁剪、cue分轨等样本处理需要安装 numpy")
+        buffer = pcm.PcmBuffer.from_segment(audio)
+        tracks = [buffer]
+        if ranges is not None:
+            tracks = [buffer.slice(start, end) for start, end in ranges]
+        elif options.edits_silence:
+            silences = buffer.detect_silence(options.silence_threshold,
+                                             min_length=silence.MIN_SILENCE)
+            ranges = silence.track_ranges(silences, buffer.duration_seconds,
+                                          options.trim_silence, options.split_silence,
+                                          options.min_silence)
+            tracks = [buffer.slice(start, end) for start, end in ranges]
+        for track in tracks:
+            if options.fade_in > 0:
+                track.fade_in(options.fade_in)
+            if options.fade_out > 0:
+                track.fade_out(options.fade_out)
+        return tracks
+    
+    def _encode_tracks(self, job: _JobContext, tracks: list, paths: List[Path],
+                       tags: Optional[List[dict]], output_format: str, filters: List[str],
+                       options: ConversionOptions, file_size: int, audio_seconds: float) -> bool:
+        """通过管道把处理后的样本交给ffmpeg编码，多个音轨并行编码；tags 为各音轨的标签"""
+        import pcm
+        bit_depth = options.bit_depth
+        if output_format == "wav" and not bit_depth:
+            # 保持源文件的位宽
+            bit_depth = tracks[0].bits
+        arguments = codec_args(output_format, bit_depth)
+        
+        def encode(index):
+            extra = metadata_args(tags[index]) if tags else []
+            with self._encode_slots:
+                pcm.encode(tracks[index], paths[index], AudioSegment.converter,
+                           arguments + extra, filters)
+        
+        try:
+            with self._span("encode", job, format=output_format, tracks=len(tracks)):
+                if len(tracks) == 1:
+                    encode(0)
+                else:
+                    # 编码在ffmpeg子进程中进行，线程只负责写管道
+                    with ThreadPoolExecutor(max_workers=min(len(tracks), self.max_workers),
+                                            thread_name_prefix="encode") as executor:
+                        list(executor.map(encode, range(len(tracks))))
+        except Exception as e:
+            return self._fail(job, f"导出文件失败: {str(e)}")
+        
+        self._job_progress(job, 100)
+        return self._finish(job, JobFinished(
+            job.job_id, job.input_path, str(paths[0]),
+            input_bytes=file_size,
+            output_bytes=sum(path.stat().st_size for path in paths),
+            audio_seconds=audio_seconds,
+            elapsed=job.elapsed,
+            timings=dict(job.timings),
+            engine=self.ENGINE,
+            outputs=tuple(str(path) for path in paths) if len(paths) > 1 else (),
+        ), output_format, options)
+    
+    def _finish(self, job: _JobContext, event: JobFinished, output_format: str,
+                options: ConversionOptions) -> Union[bool, Future]:
+        """
+        输出文件已写完：不需要校验时直接报告完成；
+        批量转换时校验交给单独的线程池，返回 Future，编码线程可以立即开始下一个任务
+        """
+        if not options.verify:
+            self._emit(event)
+            return True
+        pool = self._verify_pool
+        if pool is None:
+            return self._verify(job, event, output_format, options)
+        return pool.submit(self._verify, job, event, output_format, options)
+    
+    def _verify(self, job: _JobContext, event: JobFinished, output_format: str,
+                options: ConversionOptions) -> bool:
+        problem = self._check_outputs(job, event, output_format, options, AudioSegment.converter)
+        return self._report_verification(job, event, problem)
+    
+    def _check_outputs(self, job: _JobContext, event: JobFinished, output_format: str,
+                       options: ConversionOptions, ffmpeg_path: str) -> Optional[str]:
+        """解码校验任务的输出文件，返回问题描述（通过时为None）"""
+        from verify import OutputVerifier
+        outputs = list(event.outputs) or [event.output_path]
+        verifier = OutputVerifier(ffmpeg_path)
+        with self._span("verify", job, format=output_format):
+            try:
+                source = job.input_path
+                if is_cue(source):
+                    # 各音轨与整轨镜像比较总时长
+                    source = parse_cue(source).image_path or source
+                elif archive.is_member(source):
+                    # 输入需要读取多遍（文件头、完整解码），解压为临时文件
+                    with self.scratch.directory(archive.member_size(source)) as folder:
+                        return verifier.verify(archive.extract_to(source, folder), outputs,
+                                               output_format, options)
+                return verifier.verify(source, outputs, output_format, options)
+            except Exception as e:
+                return str(e)
+    
+    def _report_verification(self, job: _JobContext, event: JobFinished,
+                             problem: Optional[str]) -> bool:
+        """根据校验结果发出完成或失败事件（完成事件的耗时包含校验）"""
+        if problem:
+            return self._fail(job, f"校验失败: {Path(job.input_path).name}: {problem}")
+        self._emit(dataclasses.replace(event, elapsed=job.elapsed, timings=dict(job.timings)))
+        return True
+    
+    def _check_job(self, job: _JobContext, output_format: str) -> Optional[str]:
+        """检查输入文件和格式，有问题时返回错误信息"""
+        with self._span("stat", job):
+            exists = archive.exists(job.input_path)
+        if not exists:
+            return f"文件不存在: {job.input_path}"
+        
+        # 检查输入格式支持
+        input_suffix = Path(job.input_path).suffix.lower()[1:]
+        if archive.archive_format(job.input_path):
+            # 压缩包由 scanner 展开为各个成员，每个成员一个任务
+            return f"压缩包需要展开后转换: {Path(job.input_path).name}"
+        if input_suffix not in self.SUPPORTED_INPUT_FORMATS:
+            return f"不支持的输入格式: {input_suffix}"
+        
+        # 检查输出格式支持
+        if output_format not in self.SUPPORTED_OUTPUT_FORMATS:
+            return f"不支持的输出格式: {output_format}"
+        return None
+    
+    @staticmethod
+    def _output_path(input_path: Path, output_format: str, output_dir: Optional[str]) -> Path:
+        """计算输出文件路径（压缩包成员按压缩包内的目录结构输出）"""
+        if archive.is_member(input_path):
+            return archive.output_path(str(input_path), output_format, output_dir)
+        input_stem = input_path.stem
+        if output_dir:
+            output_path = Path(output_dir) / f"{input_stem}.{output_format}"
+        else:
+            output_path = input_path.parent / f"{input_stem}.{output_format}"
+        
+        # 避免覆盖原文件
+        if output_path.exists() and output_path == input_path:
+            output_path = input_path.parent / f"{input_stem}_converted.{output_format}"
+        return output_path
+    
+    def _convert_files(self, files: List[Path], output_format: str,
+                       output_dir: Optional[str]) -> int:
+        """
+        使用线程池并行转换文件列表
+        
+        Args:
+            files: 输入文件列表
+            output_format: 输出格式
+            output_dir: 输出目录
+        
+        Returns:
+            int: 成功转换的文件数量
+        """
+        total_files = len(files)
+        success_count = 0
+        failed_count = 0
+        start = time.perf_counter()
+        if output_dir:
+            Path(output_dir).mkdir(parents=True, exist_ok=True)
+        self._emit(BatchStarted(total_files, output_format, output_dir))
+        
+        # 使用线程池进行并行处理（限制并发数），输出校验使用单独的线程池
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor, \
+                ThreadPoolExecutor(max_workers=self.max_workers,
+                                   thread_name_prefix="verify") as verify_pool:
+            self._verify_pool = verify_pool
+            queue = DeviceQueue(self.device_limits) if self.device_limits else None
+            # 提交所有任务
+            futures = []
+            for file_path in files:
+                job_id = next(self._job_ids)
+                self._emit(JobQueued(job_id, str(file_path)))
+                arguments = (str(file_path), output_format, output_dir, job_id,
+                             time.perf_counter_ns(), None)
+                if queue is None:
+                    future = executor.submit(self._convert_job, *arguments)
+                else:
+                    # 空闲的线程执行的是设备有空闲名额的任务，不一定是这一个
+                    future = Future()
+                    queue.put(job_devices(str(file_path), output_dir), (arguments, future))
+                    executor.submit(self._run_next, queue)
+                futures.append((job_id, future, file_path))
+            
+            # 等待完成并收集结果
+            for i, (job_id, future, file_path) in enumerate(futures, 1):
+                try:
+                    success = future.result(timeout=300)  # 5分钟超时
+                    if isinstance(success, Future):
+                        success = success.result(timeout=300)
+                except Exception as e:
+                    success = False
+                    self._emit(JobFailed(job_id, str(file_path),
+                                         f"转换 {file_path.name} 失败: {str(e)}",
+                                         engine=self.ENGINE))
+                
+                if success:
+                    success_count += 1
+                else:
+                    failed_count += 1
+                self._emit(BatchProgress(i, total_files, success_count, failed_count))
+                
+                # 定期强制垃圾回收
+                if i % 5 == 0:
+                    gc.collect()
+        self._verify_pool = None
+        archive.close_readers()
+        
+        self._emit(BatchFinished(total_files, success_count, failed_count,
+                                 time.perf_counter() - start))
+        return success_count
     
-    def convert_folder(self, folder_path: str, output_format: str, 
-                      output_dir: str = None, source_formats: List[str] = None) -> bool:
+    def _convert_batch(self, files: List[Path], output_format: str,
+                       output_dir: Optional[str]) -> int:
+        """
+        批量转换；输出目录为压缩包（.zip/.tar/.tar.gz 等）时，各任务先输出到压缩包旁边的临时目录，
+        每完成一个就由 archive.ArchiveWriter 写入压缩包并删除，不需要转换后再读取整个目录打包
+        """
+        conflicts = archive.folder_conflicts(files, output_dir)
+        if conflicts:
+            # 不同目录下的同名压缩包的成员会输出到同一个子文件夹，跳过后出现的压缩包
+            for later, earlier in conflicts.items():
+                self._error(f"压缩包 {later} 与 {earlier} 的输出文件夹相同，已跳过")
+            files = [path for path in files if not (
+                archive.is_member(path)
+                and os.path.abspath(archive.split_member(path)[0]) in conflicts)]
+        if not (output_dir and archive.archive_format(output_dir)):
+            if self.stage_io:
+                return self._convert_staged(files, output_format, output_dir)
+            return self._convert_files(files, output_format, output_dir)
+        target = os.path.abspath(output_dir)
+        try:
+            writer = archive.ArchiveWriter(target)
+            if self.scratch.root or self.stage_io:
+                # 指定了临时目录（例如 tmpfs）时暂存在那里，文件写入压缩包后立即删除
+                staging = self.scratch.mkdtemp()
+            else:
+                # 与压缩包在同一文件系统，输出文件写完后直接从页缓存中读取
+                staging = tempfile.mkdtemp(prefix=".music-converter-",
+                                           dir=os.path.dirname(target))
+        except OSError as e:
+            self._error(f"无法创建压缩包 {target}: {str(e)}")
+            return 0
+        
+        def collect(event):
+            if isinstance(event, JobFinished):
+                for path in event.outputs or (event.output_path,):
+                    writer.add(path, Path(os.path.relpath(path, staging)).as_posix())
+        
+        unsubscribe = self.events.subscribe(collect)
+        try:
+            if self.stage_io:
+                # 输出已经写在本地，由 ArchiveWriter 写入压缩包，只暂存输入
+                success_count = self._convert_staged(files, output_format, staging, upload=False)
+            else:
+                success_count = self._convert_files(files, output_format, staging)
+        finally:
+            unsubscribe()
+            error = writer.close()
+            shutil.rmtree(staging, ignore_errors=True)
+        if error:
+            # 压缩包没有交付，已完成的任务也不算成功
+            self._error(f"写入压缩包 {target} 失败: {error}")
+            return 0
+        self._status(f"已写入压缩包 {target}（{writer.count} 个文件）")
+        return success_count
+    
+    def _convert_staged(self, files: List[Path], output_format: str,
+                        output_dir: Optional[str], upload: bool = True) -> int:
+        """
+        暂存模式的批量转换：输入按任务顺序复制到本地后转换，输出由上传线程写回原来的位置
+        upload 为False时 output_dir 已经在本地（写入压缩包的暂存目录），只暂存输入。
+        任务在本地副本上运行，发出的事件中的路径换回原始输入和写回的目标位置
+        """
+        from staging import StagingArea
+        try:
+            # 本地最多保留正在转换的和接下来要转换的各一轮输入
+            area = StagingArea(self.scratch, self.stage_bandwidth, 2 * self.max_workers)
+        except OSError as e:
+            self._error(f"无法创建暂存目录: {str(e)}")
+            return 0
+        local_files = [Path(area.add(str(path))) for path in files]
+        local_output = area.output_dir if upload and output_dir else output_dir
+        
+        def upload_outputs(event: JobFinished, source: str) -> List[str]:
+            """提交写回，返回各输出的目标位置"""
+            if local_output is None and not area.is_staged(event.input_path):
+                # 未暂存的压缩包成员已直接输出到压缩包旁边
+                return []
+            # 本地输出相对于本地输出目录（未指定输出目录时为本地输入所在目录）的位置不变
+            local_base = local_output or os.path.dirname(event.input_path)
+            target_base = output_dir or os.path.dirname(
+                archive.split_member(source)[0] if archive.is_member(source) else source)
+            targets = []
+            for path in event.outputs or (event.output_path,):
+                target = os.path.join(target_base, os.path.relpath(path, local_base))
+                if os.path.abspath(target) == os.path.abspath(source):
+                    # 与 _output_path 相同，避免覆盖原文件
+                    stem, suffix = os.path.splitext(target)
+                    target = f"{stem}_converted{suffix}"
+                area.upload(path, target)
+                targets.append(target)
+            return targets
+        
+        def translate(event):
+            if isinstance(event, BatchStarted) and upload:
+                return dataclasses.replace(event, output_dir=output_dir)
+            local_input = getattr(event, "input_path", None)
+            if local_input is None:
+                return event
+            source = area.source(local_input)
+            changes = {"input_path": source}
+            if isinstance(event, JobFinished) and upload:
+                targets = upload_outputs(event, source)
+                if targets:
+                    changes["output_path"] = targets[0]
+                    if event.outputs:
+                        changes["outputs"] = tuple(targets)
+            if isinstance(event, (JobFinished, JobFailed)):
+                area.finished(local_input)
+            return dataclasses.replace(event, **changes)
+        
+        self._translate_event = translate
+        self._staging = area
+        area.start()
+        try:
+            return self._convert_files(local_files, output_format, local_output)
+        finally:
+            self._translate_event = None
+            self._staging = None
+            errors = area.close()
+            if errors:
+                self._error(f"写回 {len(errors)} 个输出文件失败: {errors[0]}")
+            elif upload:
+                self._status(f"已写回 {area.uploaded} 个输出文件")
+    
+    def convert_folder(self, folder_path: str, output_format: str,
+                      output_dir: str = None, source_formats: List[str] = None,
+                      files: Optional[List[str]] = None) -> bool:
         """
         转换整个文件夹的音乐文件（优化版）
         
         Args:
             folder_path: 输入文件夹路径
             output_format: 输出格式
-            output_dir: 输出目录，如果为None则在原目录创建converted子文件夹
+            output_dir: 输出目录（可以是 .zip/.tar 等压缩包），如果为None则在原目录创建converted子文件夹
             source_formats: 源文件格式列表，如果为None则处理所有支持的格式
-            
+            files: 已展开的文件列表（例如界面已在后台扫描过），为None时扫描文件夹
+        
         Returns:
             bool: 转换是否成功
         """
@@ -164,12 +928,11 @@ class MusicConverter:
             # 确定要处理的格式
             target_formats = source_formats if source_formats else self.SUPPORTED_INPUT_FORMATS
             
-            # 查找所有支持的音频文件（优化搜索）
-            audio_files = []
-            for ext in target_formats:
-                # 使用大小写不敏感的搜索
-                audio_files.extend(Path(folder_path).glob(f"*.{ext}"))
-                audio_files.extend(Path(folder_path).glob(f"*.{ext.upper()}"))
+            # 查找所有支持的音频文件（一次遍历，扩展名不区分大小写）
+            if files is None:
+                audio_files = [Path(p) for p in iter_audio_files(folder_path, target_formats)]
+            else:
+                audio_files = [Path(p) for p in files if has_format(p, target_formats)]
             
             if not audio_files:
                 self._error(f"文件夹中没有找到匹配的音频文件")
@@ -181,71 +944,34 @@ class MusicConverter:
             else:
                 output_path = Path(folder_path) / "converted"
             
-            output_path.mkdir(exist_ok=True)
-            
-            total_files = len(audio_files)
-            success_count = 0
+            if not archive.archive_format(output_path):
+                output_path.mkdir(exist_ok=True)
             
-            self._status(f"准备转换 {total_files} 个文件...")
-            
-            # 使用线程池进行并行处理（限制并发数）
-            max_workers = min(4, os.cpu_count() or 1)
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                # 提交所有任务
-                futures = []
-                for i, file_path in enumerate(audio_files, 1):
-                    self._status(f"准备任务 ({i}/{total_files}): {file_path.name}")
-                    future = executor.submit(
-                        self.convert_single_file, 
-                        str(file_path), 
-                        output_format, 
-                        str(output_path)
-                    )
-                    futures.append((i, future, file_path.name))
-                
-                # 等待完成并收集结果
-                processed_count = 0
-                for i, future, filename in futures:
-                    self._status(f"正在处理: {filename}")
-                    
-                    try:
-                        if future.result(timeout=300):  # 5分钟超时
-                            success_count += 1
-                    except Exception as e:
-                        self._error(f"转换 {filename} 失败: {str(e)}")
-                    
-                    processed_count += 1
-                    # 更新进度条：显示已处理文件的进度
-                    self._progress(int(processed_count / total_files * 100))
-                    
-                    # 定期强制垃圾回收
-                    if i % 5 == 0:
-                        gc.collect()
-            
-            self._progress(100)
-            self._status(f"批量转换完成: {success_count}/{total_files} 个文件成功")
+            success_count = self._convert_batch(audio_files, output_format, str(output_path))
             
             # 最终清理
             gc.collect()
             
             return success_count > 0
-            
+        
         except Exception as e:
             self._error(f"批量转换过程中发生错误: {str(e)}")
             return False
     
-    def start_conversion(self, input_paths: List[str], output_format: str, 
+    def start_conversion(self, input_paths: List[str], output_format: str,
                         output_dir: str = None, is_batch: bool = False,
-                        source_formats: List[str] = None):
+                        source_formats: List[str] = None,
+                        files: Optional[List[str]] = None):
         """
         开始转换（异步优化版）
         
         Args:
             input_paths: 输入路径列表
             output_format: 输出格式
-            output_dir: 输出目录
+            output_dir: 输出目录（可以是 .zip/.tar 等压缩包）
             is_batch: 是否为批量转换模式
             source_formats: 源文件格式筛选列表
+            files: 已由调用方展开的输入文件列表，提供时不再遍历文件夹
         """
         if self.is_converting:
             self._error("已有转换任务正在进行")
@@ -256,80 +982,40 @@ class MusicConverter:
             success = False
             
             try:
-                if is_batch or len(input_paths) > 1:
+                if (is_batch or len(input_paths) > 1 or archive.archive_format(input_paths[0])
+                        or (output_dir and archive.archive_format(output_dir))):
                     # 批量转换
                     if len(input_paths) == 1 and os.path.isdir(input_paths[0]):
-                        success = self.convert_folder(input_paths[0], output_format, output_dir, source_formats)
+                        success = self.convert_folder(input_paths[0], output_format, output_dir,
+                                                      source_formats, files)
                     else:
-                        # 多个文件转换 - 使用优化的批量处理
-                        # 如果指定了源格式，先进行过滤
-                        if source_formats:
-                            filtered_paths = []
-                            for path in input_paths:
-                                ext = Path(path).suffix.lower()[1:]
-                                if ext in source_formats:
-                                    filtered_paths.append(path)
-                            current_paths = filtered_paths
+                        # 多个文件/文件夹/压缩包转换 - 使用优化的批量处理
+                        # 展开文件夹和压缩包，并按源格式过滤
+                        formats = source_formats or self.SUPPORTED_INPUT_FORMATS
+                        if files is None:
+                            current_paths = list(expand_paths(input_paths, formats))
                         else:
-                            current_paths = input_paths
-                            
-                        if not current_paths:
-                            self._error("没有找到符合条件的源文件")
-                            self.is_converting = False
-                            if self.complete_callback:
-                                self.complete_callback(False)
-                            return
-
-                        total = len(current_paths)
-                        success_count = 0
+                            current_paths = [p for p in files if has_format(p, formats)]
                         
-                        # 使用线程池处理多个文件
-                        base_workers = min(4, os.cpu_count() or 1)
-                        max_workers = base_workers
-                        
-                        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                            futures = []
-                            for i, path in enumerate(current_paths, 1):
-                                self._status(f"提交任务 ({i}/{total}): {Path(path).name}")
-                                # 这里的进度条不更新，等待任务完成时更新
-                                future = executor.submit(
-                                    self.convert_single_file, 
-                                    path, 
-                                    output_format, 
-                                    output_dir
-                                )
-                                futures.append((i, future, Path(path).name))
-                            
-                            # 等待结果
-                            processed_count = 0
-                            for i, future, filename in futures:
-                                self._status(f"正在处理: {filename}")
-                                try:
-                                    if future.result(timeout=300):
-                                        success_count += 1
-                                except Exception as e:
-                                    self._error(f"转换 {filename} 失败: {str(e)}")
-                                
-                                processed_count += 1
-                                # 更新进度条：显示已处理文件的进度
-                                self._progress(int(processed_count / total * 100))
-                                
-                                # 定期清理内存
-                                if i % 5 == 0:
-                                    gc.collect()
-                        
-                        success = success_count > 0
+                        if current_paths:
+                            # 使用线程池处理多个文件
+                            success_count = self._convert_batch(
+                                [Path(path) for path in current_paths], output_format, output_dir
+                            )
+                            success = success_count > 0
+                        else:
+                            self._error("没有找到符合条件的源文件")
                 else:
                     # 单个文件转换
                     success = self.convert_single_file(input_paths[0], output_format, output_dir)
-                
-                if self.complete_callback:
-                    self.complete_callback(success)
-                    
+            
             finally:
                 self.is_converting = False
+                # 单文件转换也可能打开了压缩包
+                archive.close_readers()
                 # 最终内存清理
                 gc.collect()
+                self._emit(ConversionFinished(success))
         
         # 启动转换线程
         thread = threading.Thread(target=conversion_thread, daemon=True)
@@ -340,20 +1026,30 @@ class MusicConverter:
         self.is_converting = False
         self._status("转换已停止")
     
-    def _progress(self, value: int):
-        """进度回调"""
-        if self.progress_callback:
-            self.progress_callback(value)
+    def _emit(self, event):
+        """发出事件（暂存模式下先把本地路径换回原始路径）"""
+        translate = self._translate_event
+        if translate is not None:
+            event = translate(event)
+        self.events.emit(event)
+    
+    def _job_progress(self, job: _JobContext, percent: int):
+        """任务进度事件"""
+        self._emit(JobProgress(job.job_id, job.input_path, percent, job.stage))
+    
+    def _fail(self, job: _JobContext, message: str) -> bool:
+        """发出任务失败事件，返回False便于直接 return"""
+        self._emit(JobFailed(job.job_id, job.input_path, message, job.stage,
+                             job.elapsed, dict(job.timings), self.ENGINE))
+        return False
     
     def _status(self, message: str):
-        """状态回调"""
-        if self.status_callback:
-            self.status_callback(message)
+        """状态提示"""
+        self._emit(Message("info", message))
     
     def _error(self, message: str):
-        """错误回调"""
-        if self.error_callback:
-            self.error_callback(message)
+        """与具体任务无关的错误提示"""
+        self._emit(Message("error", message))
     
     @staticmethod
     def get_supported_formats():
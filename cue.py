@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CUE 分轨
+整张专辑的镜像文件（flac/ape/wav 等）配合 .cue 文件时，扫描时用 .cue 代替镜像文件作为输入，
+转换时镜像只解码一次，再按 cue 中的 INDEX 01 位置切分为各音轨并行编码，
+音轨标题、音轨号、专辑和艺术家写入输出文件的标签
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# cue 时间单位：每秒75帧（CD扇区）
+FRAMES_PER_SECOND = 75
+
+# cue 文件常见编码（依次尝试）
+_ENCODINGS = ("utf-8-sig", "gb18030", "shift_jis", "latin-1")
+
+# 镜像文件可能的格式（cue 引用的文件不存在时按这些扩展名查找）
+IMAGE_FORMATS = ("flac", "ape", "wav", "tta", "wma", "m4a", "ogg", "mp3", "aac")
+
+# 文件名中不能使用的字符
+_INVALID_CHARS_RE = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+@dataclass
+class CueTrack:
+    """一个音轨"""
+    number: int
+    title: str = ""
+    performer: str = ""
+    # INDEX 01 的位置（秒）
+    start: float = 0.0
+
+
+@dataclass
+class CueSheet:
+    """解析后的 cue 文件（只支持引用单个镜像文件的 cue）"""
+    path: str
+    file: str = ""
+    title: str = ""
+    performer: str = ""
+    # REM DATE / REM GENRE 等附加信息
+    rem: Dict[str, str] = field(default_factory=dict)
+    tracks: List[CueTrack] = field(default_factory=list)
+
+    @property
+    def image_path(self) -> Optional[str]:
+        """镜像文件路径：优先使用 FILE 指定的文件，不存在时查找同名的其他格式文件"""
+        return find_image(self.path, self.file)
+
+    def ranges(self, duration: Optional[float]) -> List[Tuple[float, Optional[float]]]:
+        """各音轨的 (开始, 时长)（秒），最后一个音轨在不知道总时长时为None"""
+        ranges = []
+        for index, track in enumerate(self.tracks):
+            if index + 1 < len(self.tracks):
+                end = self.tracks[index + 1].start
+            else:
+                end = duration
+            ranges.append((track.start, None if end is None else max(0.0, end - track.start)))
+        return ranges
+
+    def tags(self, index: int) -> Dict[str, str]:
+        """第 index 个音轨（从0开始）写入输出文件的标签"""
+        track = self.tracks[index]
+        tags = {"track": f"{track.number}/{len(self.tracks)}"}
+        if track.title:
+            tags["title"] = track.title
+        if track.performer or self.performer:
+            tags["artist"] = track.performer or self.performer
+        if self.title:
+            tags["album"] = self.title
+        if self.performer:
+            tags["album_artist"] = self.performer
+        if "DATE" in self.rem:
+            tags["date"] = self.rem["DATE"]
+        if "GENRE" in self.rem:
+            tags["genre"] = self.rem["GENRE"]
+        return tags
+
+    def track_paths(self, output_dir: Optional[str], output_format: str) -> List[Path]:
+        """各音轨的输出路径：输出目录下以 cue 文件名命名的子文件夹，文件名为 "音轨号 - 标题" """
+        folder = Path(output_dir) if output_dir else Path(self.path).parent
+        folder = folder / safe_filename(Path(self.path).stem)
+        paths = []
+        for track in self.tracks:
+            name = f"{track.number:02d}"
+            if track.title:
+                name += f" - {safe_filename(track.title)}"
+            paths.append(folder / f"{name}.{output_format}")
+        return paths
+
+
+def safe_filename(name: str) -> str:
+    """替换文件名中不能使用的字符"""
+    return _INVALID_CHARS_RE.sub("_", name).strip().rstrip(".") or "_"
+
+
+def _parse_time(value: str) -> float:
+    """mm:ss:ff -> 秒"""
+    minutes, seconds, frames = (int(part) for part in value.split(":"))
+    return minutes * 60 + seconds + frames / FRAMES_PER_SECOND
+
+
+def _unquote(value: str) -> str:
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] == '"':
+        return value[1:-1]
+    return value
+
+
+def _read_text(path: str) -> str:
+    with open(path, "rb") as f:
+        data = f.read()
+    for encoding in _ENCODINGS:
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("latin-1")
+
+
+def parse_cue(path: str) -> CueSheet:
+    """
+    解析 cue 文件
+    引用多个文件（每个音轨一个文件）或没有音轨时抛出 ValueError
+    """
+    sheet = CueSheet(str(path))
+    files = []
+    track = None
+    for raw in _read_text(path).splitlines():
+        command, _, rest = raw.strip().partition(" ")
+        command = command.upper()
+        if command == "FILE":
+            # FILE "name.flac" WAVE：文件名可能带空格，最后是文件类型
+            rest = rest.strip()
+            if rest.startswith('"'):
+                name = rest[1:].split('"', 1)[0]
+            else:
+                name = rest.rsplit(" ", 1)[0]
+            files.append(name)
+        elif command == "TRACK":
+            number = rest.split()[0] if rest.split() else ""
+            if not number.isdigit():
+                raise ValueError(f"无效的音轨: {raw.strip()}")
+            track = CueTrack(int(number))
+            sheet.tracks.append(track)
+        elif command in ("TITLE", "PERFORMER"):
+            target = track if track is not None else sheet
+            setattr(target, command.lower(), _unquote(rest))
+        elif command == "INDEX" and track is not None:
+            parts = rest.split()
+            if len(parts) == 2 and parts[0] == "01":
+                track.start = _parse_time(parts[1])
+        elif command == "REM" and track is None:
+            key, _, value = rest.partition(" ")
+            if key:
+                sheet.rem[key.upper()] = _unquote(value)
+    if len(files) != 1:
+        raise ValueError(f"只支持引用单个镜像文件的cue（引用了 {len(files)} 个文件）")
+    if not sheet.tracks:
+        raise ValueError("cue 中没有音轨")
+    sheet.file = files[0]
+    return sheet
+
+
+def find_image(cue_path: str, file_name: str) -> Optional[str]:
+    """
+    查找 cue 引用的镜像文件
+    很多 cue 中写的是抓轨时的 wav 文件名，实际文件已压缩为 flac/ape，
+    因此引用的文件不存在时按主文件名查找同目录下的其他格式
+    """
+    folder = os.path.dirname(os.path.abspath(cue_path))
+    candidate = os.path.join(folder, file_name)
+    if os.path.isfile(candidate):
+        return candidate
+    stems = {os.path.splitext(file_name)[0].lower(), Path(cue_path).stem.lower()}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                stem, suffix = os.path.splitext(entry.name)
+                if (stem.lower() in stems and suffix.lower()[1:] in IMAGE_FORMATS
+                        and entry.is_file()):
+                    return entry.path
+    except OSError:
+        pass
+    return None
+
+
+def referenced_image(cue_path: str) -> Optional[str]:
+    """扫描时使用：cue 引用的镜像文件（cue 无效或文件不存在时为None）"""
+    try:
+        return parse_cue(cue_path).image_path
+    except (OSError, ValueError):
+        return None
+
+
+def is_cue(path) -> bool:
+    return str(path).lower().endswith(".cue")
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+按存储设备限制并发
+同一块机械硬盘上同时运行多个任务会不停寻道，反而更慢；分布在多块磁盘上的任务则可以更多地并行。
+每个任务按输入文件和输出目录所在的设备（st_dev）分组，
+在CPU并发数之外，每个设备同时运行的任务数不超过该设备的上限。
+线程池引擎使用 DeviceQueue：空闲的工作线程取第一个设备都有空闲名额的任务，
+不会因为排在前面的任务在等待忙碌的磁盘而让其他磁盘的任务也跟着等待；
+asyncio引擎的每个任务先取得设备名额再取得CPU名额（DeviceSlots），等待设备时不占用CPU名额
+"""
+
+import asyncio
+import functools
+import itertools
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Tuple
+
+import archive
+
+# 一个任务涉及的设备（排序后的 st_dev，按顺序取得名额，避免互相等待）
+DeviceKey = Tuple[int, ...]
+
+
+def device_of(path: str) -> Optional[int]:
+    """路径所在的设备；路径还不存在（例如输出目录）时取最近的已存在的上级目录"""
+    path = os.path.abspath(path)
+    while True:
+        try:
+            return os.stat(path).st_dev
+        except OSError:
+            parent = os.path.dirname(path)
+            if parent == path:
+                return None
+            path = parent
+
+
+@functools.lru_cache(maxsize=4096)
+def _directory_device(folder: str) -> Optional[int]:
+    # 同一目录下的文件在同一设备上，批量任务只需要对每个目录 stat 一次
+    return device_of(folder)
+
+
+def job_devices(input_path: str, output_dir: Optional[str]) -> DeviceKey:
+    """
+    任务读写的设备：输入文件（压缩包成员为压缩包，cue 为cue文件所在位置）和输出目录
+    （未指定输出目录时输出在输入文件旁边）
+    """
+    source = archive.split_member(input_path)[0] if archive.is_member(input_path) else input_path
+    devices = {_directory_device(os.path.dirname(os.path.abspath(source)))}
+    if output_dir:
+        devices.add(_directory_device(os.path.abspath(output_dir)))
+    return tuple(sorted(device for device in devices if device is not None))
+
+
+class DeviceLimits:
+    """每个设备的并发上限"""
+
+    def __init__(self, default: Optional[int] = None, overrides: Optional[Dict[int, int]] = None):
+        """
+        Args:
+            default: 未单独指定的设备的上限，为None时不限制
+            overrides: st_dev -> 上限
+        """
+        self.default = default
+        self.overrides = dict(overrides or {})
+
+    @classmethod
+    def parse(cls, specs: Iterable[str]) -> "DeviceLimits":
+        """
+        由命令行参数构造："N" 为默认上限，"路径=N" 为该路径所在设备的上限
+        格式错误时抛出 ValueError
+        """
+        limits = cls()
+        for spec in specs:
+            path, separator, value = spec.rpartition("=")
+            try:
+                limit = int(value)
+            except ValueError:
+                raise ValueError(f"设备并发上限必须是整数: {spec}") from None
+            if limit < 1:
+                raise ValueError(f"设备并发上限至少为 1: {spec}")
+            if not separator:
+                limits.default = limit
+                continue
+            device = device_of(path)
+            if device is None:
+                raise ValueError(f"无法获取所在设备: {path}")
+            limits.overrides[device] = limit
+        return limits
+
+    @property
+    def enabled(self) -> bool:
+        return self.default is not None or bool(self.overrides)
+
+    def limit(self, device: int) -> Optional[int]:
+        return self.overrides.get(device, self.default)
+
+
+class DeviceQueue:
+    """
+    按设备调度的任务队列（线程池引擎）
+    同一组设备的任务按提交顺序排成一队，take 在各队列的队首中选最早提交且设备都有空闲名额的任务
+    """
+
+    def __init__(self, limits: DeviceLimits):
+        self.limits = limits
+        self._condition = threading.Condition()
+        self._queues: Dict[DeviceKey, Deque[Tuple[int, Any]]] = {}
+        self._running: Dict[int, int] = {}
+        self._sequence = itertools.count()
+
+    def put(self, devices: DeviceKey, item: Any):
+        with self._condition:
+            self._queues.setdefault(devices, deque()).append((next(self._sequence), item))
+            self._condition.notify_all()
+
+    def _available(self, devices: DeviceKey) -> bool:
+        for device in devices:
+            limit = self.limits.limit(device)
+            if limit is not None and self._running.get(device, 0) >= limit:
+                return False
+        return True
+
+    def take(self) -> Tuple[DeviceKey, Any]:
+        """取出下一个可以运行的任务并占用其设备名额，没有时等待（队列不能为空）"""
+        with self._condition:
+            while True:
+                ready = [(queue[0][0], devices) for devices, queue in self._queues.items()
+                         if self._available(devices)]
+                if ready:
+                    _, devices = min(ready)
+                    queue = self._queues[devices]
+                    _, item = queue.popleft()
+                    if not queue:
+                        del self._queues[devices]
+                    for device in devices:
+                        self._running[device] = self._running.get(device, 0) + 1
+                    return devices, item
+                self._condition.wait()
+
+    def release(self, devices: DeviceKey):
+        """任务结束，释放设备名额"""
+        with self._condition:
+            for device in devices:
+                self._running[device] -= 1
+            self._condition.notify_all()
+
+
+class DeviceSlots:
+    """每个设备一个 asyncio.Semaphore（asyncio引擎，每次批量转换在事件循环中创建）"""
+
+    def __init__(self, limits: DeviceLimits):
+        self.limits = limits
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+
+    def _semaphore(self, device: int) -> Optional[asyncio.Semaphore]:
+        limit = self.limits.limit(device)
+        if limit is None:
+            return None
+        if device not in self._semaphores:
+            self._semaphores[device] = asyncio.Semaphore(limit)
+        return self._semaphores[device]
+
+    def guard(self, devices: DeviceKey, semaphore: asyncio.Semaphore) -> "_DeviceGuard":
+        """先取得各设备的名额、再取得 semaphore（CPU名额），可以代替 semaphore 用于 async with"""
+        semaphores = [self._semaphore(device) for device in devices]
+        return _DeviceGuard([s for s in semaphores if s is not None], semaphore)
+
+
+class _DeviceGuard:
+    """
+    设备名额 + CPU名额（不保存每次进入的状态，可以被多个协程同时使用）
+    设备按排序后的顺序取得，不会互相等待
+    """
+
+    def __init__(self, devices: List[asyncio.Semaphore], semaphore: asyncio.Semaphore):
+        self._devices = devices
+        self._semaphore = semaphore
+
+    async def __aenter__(self):
+        acquired = []
+        try:
+            for device in self._devices:
+                await device.acquire()
+                acquired.append(device)
+            await self._semaphore.acquire()
+        except BaseException:
+            for device in reversed(acquired):
+                device.release()
+            raise
+
+    async def __aexit__(self, *exc_info):
+        self._semaphore.release()
+        for device in reversed(self._devices):
+            device.release()
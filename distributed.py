@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分布式转换（协调节点 / 工作节点）
+协调节点把一批文件拆分为任务，通过TCP（每行一个JSON消息）分发给工作节点；
+工作节点使用与本机相同的转换引擎执行任务，并把进度和结果事件发回。
+工作节点断开或心跳超时时，它手上未完成的任务会重新排队。
+输入和输出路径需要在所有节点上可以访问（同一台机器或共享存储）
+协调节点默认只监听本机地址；监听其他地址时必须设置共享令牌，工作节点在握手时出示，
+令牌通过 --token 或环境变量 MUSIC_CONVERTER_TOKEN 指定
+
+用法:
+    export MUSIC_CONVERTER_TOKEN=...
+    python distributed.py coordinator /data/music -f mp3 -o /data/out --host 0.0.0.0 --port 9470
+    python distributed.py worker --host 10.0.0.5 --port 9470 -w 4
+    python distributed.py coordinator /data/music -f mp3 --local-workers 3   # 本机测试
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import select
+import socket
+import argparse
+import ipaddress
+import threading
+import subprocess
+import socketserver
+from collections import deque
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+# 添加当前目录到Python路径
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import archive
+from events import (EventBus, BatchStarted, BatchProgress, BatchFinished, ConversionFinished,
+                    JobQueued, JobFailed, JobFinished, JobProgress, JobStarted, Message,
+                    ThrottledDispatcher, describe_event, event_from_dict, event_to_dict)
+from options import (ConversionOptions, add_cache_argument, add_option_arguments,
+                     options_from_args)
+
+DEFAULT_PORT = 9470
+# 工作节点发送心跳的间隔（秒）
+HEARTBEAT_INTERVAL = 5.0
+# 共享令牌的环境变量（避免令牌出现在进程的命令行中）
+TOKEN_ENV = "MUSIC_CONVERTER_TOKEN"
+
+
+def is_loopback(host: str) -> bool:
+    """监听地址是否只能从本机访问"""
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return host == "localhost"
+
+
+class Connection:
+    """
+    按行收发JSON消息的TCP连接
+    套接字始终为阻塞模式：接收的超时用 select 实现，不能用 settimeout，
+    否则其他线程正在进行的 sendall 也会超时，只发出半条消息
+    """
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.sock.settimeout(None)
+        self._buffer = b""
+        self._send_lock = threading.Lock()
+
+    def send(self, message: Dict):
+        """发送一条消息（线程安全）；发送失败时关闭连接，对方不会在半条消息后收到其他消息"""
+        data = (json.dumps(message, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._send_lock:
+            try:
+                self.sock.sendall(data)
+            except OSError:
+                self.close()
+                raise
+
+    def receive(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        接收一条消息
+        超时返回None，连接关闭时抛出 ConnectionError
+        """
+        while b"\n" not in self._buffer:
+            if timeout is not None:
+                try:
+                    readable, _, _ = select.select([self.sock], [], [], timeout)
+                except ValueError:
+                    # 发送失败时连接已在其他线程中关闭
+                    raise ConnectionError("连接已关闭") from None
+                if not readable:
+                    return None
+            chunk = self.sock.recv(65536)
+            if not chunk:
+                raise ConnectionError("连接已关闭")
+            self._buffer += chunk
+        line, self._buffer = self._buffer.split(b"\n", 1)
+        return json.loads(line.decode("utf-8"))
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class Coordinator:
+    """
+    协调节点
+    在 events 上发出与 MusicConverter 相同的事件，可以直接接入命令行输出和指标统计
+    """
+
+    def __init__(self, files: List[str], output_format: str, output_dir: Optional[str] = None,
+                 host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 max_attempts: int = 3, heartbeat_timeout: float = 3 * HEARTBEAT_INTERVAL,
+                 options: Optional[ConversionOptions] = None, token: Optional[str] = None):
+        """
+        Args:
+            files: 输入文件列表
+            output_format: 输出格式
+            output_dir: 输出目录，如果为None则输出到输入文件所在目录
+            host: 监听地址
+            port: 监听端口（0表示自动分配）
+            max_attempts: 单个任务因工作节点异常而重新分配的最大次数
+            heartbeat_timeout: 超过该时间没有收到工作节点的消息即视为失联（秒）
+            options: 转换选项，随任务发送给工作节点
+            token: 工作节点握手时需要出示的共享令牌；监听非本机地址时必须设置
+
+        Raises:
+            ValueError: 监听非本机地址但没有设置令牌
+        """
+        if not token and not is_loopback(host):
+            raise ValueError(f"监听非本机地址 {host} 时必须设置共享令牌（--token 或 {TOKEN_ENV}）")
+        self.token = token
+        self.output_format = output_format
+        self.output_dir = output_dir
+        self.options = options or ConversionOptions()
+        self.max_attempts = max_attempts
+        self.heartbeat_timeout = heartbeat_timeout
+        self.events = EventBus()
+
+        self._jobs = {job_id: {"job_id": job_id, "input_path": str(path), "attempts": 0}
+                      for job_id, path in enumerate(files, 1)}
+        self._pending = deque(self._jobs)
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._completed = 0
+        self.succeeded = 0
+        self.failed = 0
+        self._start = None
+
+        coordinator = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                coordinator._serve_worker(Connection(self.request), self.client_address)
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever,
+                                        name="coordinator", daemon=True)
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        """开始接受工作节点连接"""
+        self._start = time.perf_counter()
+        total = len(self._jobs)
+        self.events.emit(BatchStarted(total, self.output_format, self.output_dir))
+        for job in self._jobs.values():
+            self.events.emit(JobQueued(job["job_id"], job["input_path"]))
+        if not self._jobs:
+            self._finish()
+        self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待全部任务结束"""
+        return self._done.wait(timeout)
+
+    def close(self):
+        """停止服务"""
+        self.server.shutdown()
+        self.server.server_close()
+
+    def _finish(self):
+        self.events.emit(BatchFinished(len(self._jobs), self.succeeded, self.failed,
+                                       time.perf_counter() - self._start))
+        self.events.emit(ConversionFinished(self.succeeded > 0 or not self._jobs))
+        self._done.set()
+
+    # ---- 任务调度 ----
+
+    def _take_job(self) -> Optional[Dict]:
+        with self._lock:
+            if not self._pending:
+                return None
+            job = self._jobs[self._pending.popleft()]
+            job["attempts"] += 1
+            return job
+
+    def _requeue(self, job_ids, worker_name: str):
+        """工作节点失联，把它未完成的任务放回队列"""
+        exhausted = []
+        with self._lock:
+            for job_id in job_ids:
+                if self._jobs[job_id]["attempts"] >= self.max_attempts:
+                    exhausted.append(job_id)
+                else:
+                    # 优先重新分配
+                    self._pending.appendleft(job_id)
+        if job_ids:
+            self.events.emit(Message("warning", f"工作节点 {worker_name} 失联，"
+                                                f"{len(job_ids) - len(exhausted)} 个任务重新排队"))
+        for job_id in exhausted:
+            self._job_done(JobFailed(job_id, self._jobs[job_id]["input_path"],
+                                     f"工作节点多次异常退出，放弃任务: "
+                                     f"{Path(self._jobs[job_id]['input_path']).name}"))
+
+    def _job_done(self, event):
+        """记录任务最终结果"""
+        self.events.emit(event)
+        with self._lock:
+            self._completed += 1
+            if isinstance(event, JobFinished):
+                self.succeeded += 1
+            else:
+                self.failed += 1
+            progress = BatchProgress(self._completed, len(self._jobs),
+                                     self.succeeded, self.failed)
+            finished = self._completed == len(self._jobs)
+        self.events.emit(progress)
+        if finished:
+            self._finish()
+
+    def _serve_worker(self, conn: Connection, address):
+        """与一个工作节点通信（在服务器的连接线程中运行）"""
+        worker_name = f"{address[0]}:{address[1]}"
+        in_flight = set()
+        try:
+            hello = conn.receive(self.heartbeat_timeout)
+            if not hello or hello.get("type") != "hello":
+                return
+            if self.token and not hmac.compare_digest(str(hello.get("token") or "").encode("utf-8"),
+                                                      self.token.encode("utf-8")):
+                self.events.emit(Message("warning", f"拒绝令牌不正确的工作节点: {worker_name}"))
+                return
+            worker_name = hello.get("name") or worker_name
+            slots = max(1, int(hello.get("slots", 1)))
+            self.events.emit(Message("info", f"工作节点已连接: {worker_name}（{slots} 个并发）"))
+
+            last_seen = time.monotonic()
+            while not self._done.is_set():
+                # 补满工作节点的并发名额
+                while len(in_flight) < slots:
+                    job = self._take_job()
+                    if job is None:
+                        break
+                    in_flight.add(job["job_id"])
+                    conn.send({"type": "job", "job_id": job["job_id"],
+                               "input_path": job["input_path"],
+                               "output_format": self.output_format,
+                               "output_dir": self.output_dir,
+                               "options": self.options.to_dict()})
+
+                message = conn.receive(1.0)
+                if message is None:
+                    if time.monotonic() - last_seen > self.heartbeat_timeout:
+                        raise ConnectionError("心跳超时")
+                    continue
+                last_seen = time.monotonic()
+                if message.get("type") != "event":
+                    continue
+
+                event = event_from_dict(message["event"])
+                if isinstance(event, (JobFinished, JobFailed)):
+                    if event.job_id in in_flight:
+                        in_flight.discard(event.job_id)
+                        self._job_done(event)
+                elif isinstance(event, (JobStarted, JobProgress, Message)):
+                    self.events.emit(event)
+
+            conn.send({"type": "shutdown"})
+        except (ConnectionError, OSError, ValueError) as e:
+            self.events.emit(Message("warning", f"工作节点 {worker_name} 断开: {e}"))
+        finally:
+            conn.close()
+            if in_flight and not self._done.is_set():
+                self._requeue(sorted(in_flight), worker_name)
+
+
+class Worker:
+    """工作节点：连接协调节点，执行分配到的任务"""
+
+    def __init__(self, host: str, port: int = DEFAULT_PORT, engine: str = "pydub",
+                 slots: Optional[int] = None, name: Optional[str] = None,
+                 token: Optional[str] = None):
+        from converter import create_converter
+
+        self.converter = create_converter(engine, slots)
+        self.slots = self.converter.max_workers
+        self.name = name or f"{socket.gethostname()}-{os.getpid()}"
+        self.token = token
+        self.conn = Connection(socket.create_connection((host, port)))
+        self._active = set()
+        self._active_lock = threading.Lock()
+        self.converter.events.subscribe(self._forward)
+
+    def _forward(self, event):
+        """把本节点正在执行的任务事件转发给协调节点"""
+        job_id = getattr(event, "job_id", None)
+        with self._active_lock:
+            if job_id not in self._active:
+                return
+        if isinstance(event, (JobStarted, JobProgress, JobFinished, JobFailed, Message)):
+            try:
+                self.conn.send({"type": "event", "event": event_to_dict(event)})
+            except OSError:
+                pass
+
+    def _run_job(self, message: Dict):
+        job_id = message["job_id"]
+        with self._active_lock:
+            self._active.add(job_id)
+        try:
+            output_dir = message.get("output_dir")
+            if output_dir:
+                Path(output_dir).mkdir(parents=True, exist_ok=True)
+            self.converter.convert_single_file(
+                message["input_path"], message["output_format"], output_dir, job_id,
+                options=ConversionOptions.from_dict(message.get("options")))
+        except Exception as e:
+            # 转换器内部已处理常见错误，这里兜底，保证协调节点收到结果
+            self._forward(JobFailed(job_id, message["input_path"], f"工作节点异常: {e}"))
+        finally:
+            with self._active_lock:
+                self._active.discard(job_id)
+
+    def run(self):
+        """处理任务直到协调节点通知结束或连接断开"""
+        self.conn.send({"type": "hello", "name": self.name, "slots": self.slots,
+                        "token": self.token})
+        last_heartbeat = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.slots) as executor:
+            try:
+                while True:
+                    message = self.conn.receive(1.0)
+                    if time.monotonic() - last_heartbeat >= HEARTBEAT_INTERVAL:
+                        self.conn.send({"type": "heartbeat"})
+                        last_heartbeat = time.monotonic()
+                    if message is None:
+                        continue
+                    if message.get("type") == "job":
+                        executor.submit(self._run_job, message)
+                    elif message.get("type") == "shutdown":
+                        break
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                self.conn.close()
+        # 任务已全部结束（线程池已关闭）
+        archive.close_readers()
+
+
+def spawn_local_workers(count: int, port: int, engine: str = "pydub",
+                        slots: Optional[int] = None,
+                        token: Optional[str] = None) -> List[subprocess.Popen]:
+    """在本机启动若干工作节点进程（用于测试）"""
+    command = [sys.executable, os.path.abspath(__file__), "worker",
+               "--host", "127.0.0.1", "--port", str(port), "-e", engine]
+    if slots:
+        command += ["-w", str(slots)]
+    env = dict(os.environ)
+    if token:
+        env[TOKEN_ENV] = token
+    return [subprocess.Popen(command, env=env) for _ in range(count)]
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """构造命令行参数解析器"""
+    from converter import MusicConverter, ENGINES
+
+    parser = argparse.ArgumentParser(description="音乐格式转换器（分布式模式）")
+    sub = parser.add_subparsers(dest="role", required=True)
+
+    coordinator = sub.add_parser("coordinator", help="拆分并分发任务")
+    coordinator.add_argument("inputs", nargs="+", help="输入文件或文件夹")
+    coordinator.add_argument("-f", "--format", required=True,
+                             choices=MusicConverter.SUPPORTED_OUTPUT_FORMATS, help="输出格式")
+    coordinator.add_argument("-o", "--output-dir", help="输出目录（所有节点都需要可以访问）")
+    coordinator.add_argument("-s", "--source-formats", nargs="+",
+                             choices=MusicConverter.SUPPORTED_INPUT_FORMATS, help="源文件格式筛选")
+    coordinator.add_argument("--host", default="127.0.0.1",
+                             help=f"监听地址（非本机地址需要同时设置 --token 或 {TOKEN_ENV}）")
+    coordinator.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                             help=f"工作节点握手时出示的共享令牌（默认读取 {TOKEN_ENV}）")
+    coordinator.add_argument("--port", type=int, default=DEFAULT_PORT, help="监听端口")
+    coordinator.add_argument("--max-attempts", type=int, default=3,
+                             help="工作节点异常时单个任务的最大分配次数")
+    coordinator.add_argument("--local-workers", type=int, default=0,
+                             help="同时在本机启动的工作节点数（用于测试）")
+    coordinator.add_argument("-e", "--engine", choices=ENGINES, default="pydub",
+                             help="本机工作节点使用的转换引擎")
+    coordinator.add_argument("-q", "--quiet", action="store_true", help="只输出错误信息")
+    add_option_arguments(coordinator, cache=False)
+
+    worker = sub.add_parser("worker", help="执行协调节点分配的任务")
+    worker.add_argument("--host", required=True, help="协调节点地址")
+    worker.add_argument("--port", type=int, default=DEFAULT_PORT, help="协调节点端口")
+    worker.add_argument("-w", "--workers", type=int, help="本节点同时执行的任务数")
+    worker.add_argument("-e", "--engine", choices=ENGINES, default="pydub", help="转换引擎")
+    worker.add_argument("--name", help="节点名称（默认 主机名-进程号）")
+    worker.add_argument("--token", default=os.environ.get(TOKEN_ENV),
+                        help=f"协调节点的共享令牌（默认读取 {TOKEN_ENV}）")
+    add_cache_argument(worker)
+    return parser
+
+
+def run_coordinator(args) -> bool:
+    """运行协调节点"""
+    from converter import MusicConverter
+    from scanner import expand_paths
+
+    formats = args.source_formats or MusicConverter.SUPPORTED_INPUT_FORMATS
+    files = list(expand_paths(args.inputs, formats))
+    output_dir = args.output_dir
+    if output_dir is None and len(args.inputs) == 1 and os.path.isdir(args.inputs[0]):
+        # 与单机转换文件夹时的默认输出目录一致
+        output_dir = str(Path(args.inputs[0]) / "converted")
+
+    coordinator = Coordinator(files, args.format, output_dir, args.host, args.port,
+                              args.max_attempts, options=options_from_args(args),
+                              token=args.token)
+
+    def on_events(events):
+        for event in events:
+            text = describe_event(event)
+            if not text:
+                continue
+            if isinstance(event, JobFailed) or (isinstance(event, Message) and event.level == "error"):
+                print(f"❌ {text}", file=sys.stderr, flush=True)
+            elif not args.quiet:
+                print(text, flush=True)
+
+    dispatcher = ThrottledDispatcher(on_events, 5.0)
+    coordinator.events.subscribe(dispatcher.push)
+    coordinator.start()
+    print(f"🛰️ 协调节点监听端口 {coordinator.port}，共 {len(files)} 个任务", flush=True)
+
+    workers = spawn_local_workers(args.local_workers, coordinator.port, args.engine,
+                                  token=args.token)
+    try:
+        while not coordinator.wait(0.5):
+            pass
+    except KeyboardInterrupt:
+        print("\n⚠️ 用户中断转换", file=sys.stderr)
+    finally:
+        dispatcher.stop()
+        coordinator.close()
+        for process in workers:
+            try:
+                process.wait(10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+    return coordinator.succeeded > 0 or not files
+
+
+def main(argv=None) -> bool:
+    """主函数"""
+    args = build_parser().parse_args(argv)
+
+    # 设置ffmpeg路径（在导入pydub之前）
+    from ffmpeg_config import setup_ffmpeg
+    setup_ffmpeg()
+
+    if args.role == "coordinator":
+        if args.output_dir and archive.archive_format(args.output_dir):
+            print("❌ 分布式模式的输出由各节点写入，不支持输出到压缩包", file=sys.stderr)
+            return False
+        if not args.token and not is_loopback(args.host):
+            print(f"❌ 监听非本机地址 {args.host} 时必须设置共享令牌（--token 或 {TOKEN_ENV}）",
+                  file=sys.stderr)
+            return False
+        return run_coordinator(args)
+
+    worker = Worker(args.host, args.port, args.engine, args.workers, args.name, args.token)
+    if args.loudness_cache:
+        from loudness import LoudnessCache
+        worker.converter.set_options(None, LoudnessCache(args.loudness_cache))
+    worker.run()
+    return True
+
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换事件模块
+定义转换过程中的结构化事件，以及事件总线和限流合并工具，
+供界面、命令行和指标统计共同使用
+"""
+
+import time
+import threading
+from pathlib import Path
+from dataclasses import dataclass, field, asdict
+from typing import Callable, Dict, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class ConversionEvent:
+    """事件基类"""
+
+
+@dataclass(frozen=True)
+class BatchStarted(ConversionEvent):
+    """批量转换开始"""
+    total: int
+    output_format: str
+    output_dir: Optional[str]
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class JobQueued(ConversionEvent):
+    """任务已提交到线程池"""
+    job_id: int
+    input_path: str
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class JobStarted(ConversionEvent):
+    """任务开始执行"""
+    job_id: int
+    input_path: str
+    output_format: str
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class JobProgress(ConversionEvent):
+    """任务进度（0-100）"""
+    job_id: int
+    input_path: str
+    percent: int
+    stage: str
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class JobFinished(ConversionEvent):
+    """任务成功完成"""
+    job_id: int
+    input_path: str
+    output_path: str
+    input_bytes: int
+    output_bytes: int
+    audio_seconds: float
+    elapsed: float
+    # 各阶段耗时（秒），例如 {"decode": 0.8, "encode": 2.1}
+    timings: Dict[str, float] = field(default_factory=dict)
+    # 完成转换的引擎，例如 "pydub"
+    engine: str = ""
+    # 输出多个文件（静音拆分、cue分轨）时的全部输出文件（output_path 为第一个），否则为空
+    outputs: Tuple[str, ...] = ()
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class JobFailed(ConversionEvent):
+    """任务失败"""
+    job_id: int
+    input_path: str
+    error: str
+    stage: str = ""
+    elapsed: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)
+    engine: str = ""
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class BatchProgress(ConversionEvent):
+    """批量转换进度"""
+    completed: int
+    total: int
+    succeeded: int
+    failed: int
+    timestamp: float = field(default_factory=time.time)
+
+    @property
+    def percent(self) -> int:
+        return int(self.completed / self.total * 100) if self.total else 100
+
+
+@dataclass(frozen=True)
+class BatchFinished(ConversionEvent):
+    """批量转换结束"""
+    total: int
+    succeeded: int
+    failed: int
+    elapsed: float
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class ConversionFinished(ConversionEvent):
+    """一次 start_conversion 调用全部结束"""
+    success: bool
+    timestamp: float = field(default_factory=time.time)
+
+
+@dataclass(frozen=True)
+class Message(ConversionEvent):
+    """不属于某个任务结果的提示信息（level: info / warning / error）"""
+    level: str
+    text: str
+    job_id: Optional[int] = None
+    timestamp: float = field(default_factory=time.time)
+
+
+# 事件类型名 -> 类，用于反序列化
+_EVENT_TYPES = {cls.__name__: cls for cls in (
+    BatchStarted, JobQueued, JobStarted, JobProgress, JobFinished, JobFailed,
+    BatchProgress, BatchFinished, ConversionFinished, Message,
+)}
+
+
+class EventBus:
+    """
+    事件总线
+    监听者在发出事件的线程（通常是工作线程）中被同步调用，应尽快返回
+    """
+
+    def __init__(self):
+        self._listeners: List[Callable[[ConversionEvent], None]] = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, listener: Callable[[ConversionEvent], None]) -> Callable[[], None]:
+        """订阅事件，返回取消订阅的函数"""
+        with self._lock:
+            # 写时复制，发出事件时无需加锁
+            self._listeners = self._listeners + [listener]
+
+        def unsubscribe():
+            with self._lock:
+                self._listeners = [l for l in self._listeners if l is not listener]
+        return unsubscribe
+
+    def emit(self, event: ConversionEvent):
+        """发出事件"""
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"⚠️ 事件处理失败: {e}")
+
+
+class EventCoalescer:
+    """
+    事件合并缓冲区
+    工作线程调用 push 写入事件，消费者定期调用 drain 取出一批事件。
+    同一任务的多个进度事件只保留最新一个，批量进度也只保留最新一个，
+    所有事件按发生顺序保留
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events: List[Optional[ConversionEvent]] = []
+        # 进度事件在列表中的位置，用于原地替换
+        self._progress_index: Dict[object, int] = {}
+
+    def push(self, event: ConversionEvent):
+        """写入事件（线程安全）"""
+        if isinstance(event, JobProgress):
+            key = ("job", event.job_id)
+        elif isinstance(event, BatchProgress):
+            key = "batch"
+        else:
+            key = None
+
+        with self._lock:
+            if key is not None:
+                # 丢弃同一对象之前的进度事件，只保留最新的一个
+                index = self._progress_index.get(key)
+                if index is not None:
+                    self._events[index] = None
+                self._progress_index[key] = len(self._events)
+            self._events.append(event)
+
+    def drain(self) -> List[ConversionEvent]:
+        """取出当前缓冲的全部事件"""
+        with self._lock:
+            events, self._events = self._events, []
+            self._progress_index = {}
+        return [e for e in events if e is not None]
+
+
+class ThrottledDispatcher:
+    """
+    限流分发器
+    在后台线程中合并事件，每秒最多调用 callback(events) max_rate 次。
+    ConversionFinished 事件会立即触发一次分发，保证结束信号不被延迟
+    """
+
+    def __init__(self, callback: Callable[[List[ConversionEvent]], None], max_rate: float = 10.0):
+        self.callback = callback
+        self.interval = 1.0 / max_rate
+        self._coalescer = EventCoalescer()
+        self._wakeup = threading.Event()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="event-dispatcher", daemon=True)
+        self._thread.start()
+
+    def push(self, event: ConversionEvent):
+        """作为事件总线的监听者使用"""
+        self._coalescer.push(event)
+        if isinstance(event, ConversionFinished):
+            self._wakeup.set()
+
+    def _run(self):
+        while not self._stopped:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """立即分发缓冲的事件"""
+        events = self._coalescer.drain()
+        if events:
+            self.callback(events)
+
+    def stop(self):
+        """停止分发，并分发剩余事件"""
+        self._stopped = True
+        self._wakeup.set()
+        self._thread.join()
+        self.flush()
+
+
+def event_to_dict(event: ConversionEvent) -> Dict:
+    """把事件转换为可JSON序列化的字典（用于跨进程传递）"""
+    data = asdict(event)
+    data["type"] = type(event).__name__
+    return data
+
+
+def event_from_dict(data: Dict) -> ConversionEvent:
+    """由 event_to_dict 的结果还原事件"""
+    data = dict(data)
+    cls = _EVENT_TYPES.get(data.pop("type", None))
+    if cls is None:
+        raise ValueError(f"未知的事件类型: {data}")
+    return cls(**data)
+
+
+def describe_event(event: ConversionEvent) -> Optional[str]:
+    """把事件转换为一行可读的状态文本，不需要显示的事件返回None"""
+    if isinstance(event, BatchStarted):
+        return f"准备转换 {event.total} 个文件..."
+    if isinstance(event, JobStarted):
+        return f"正在转换: {Path(event.input_path).name} -> {event.output_format}"
+    if isinstance(event, JobFinished):
+        if len(event.outputs) > 1:
+            return (f"转换完成: {Path(event.output_path).name} 等 {len(event.outputs)} 个音轨 "
+                    f"({event.elapsed:.2f}s)")
+        return f"转换完成: {Path(event.output_path).name} ({event.elapsed:.2f}s)"
+    if isinstance(event, JobFailed):
+        return event.error
+    if isinstance(event, BatchProgress):
+        return f"进度: {event.percent}% ({event.completed}/{event.total})"
+    if isinstance(event, BatchFinished):
+        return f"批量转换完成: {event.succeeded}/{event.total} 个文件成功"
+    if isinstance(event, Message):
+        return event.text
+    return None
+
+
+class LegacyCallbackAdapter:
+    """
+    把事件转换为旧的四个回调（进度、状态、错误、完成），
+    用于兼容 MusicConverter.set_callbacks
+    """
+
+    def __init__(self, progress_cb: Callable, status_cb: Callable,
+                 error_cb: Callable, complete_cb: Callable):
+        self.progress_cb = progress_cb
+        self.status_cb = status_cb
+        self.error_cb = error_cb
+        self.complete_cb = complete_cb
+        self._in_batch = False
+
+    def __call__(self, event: ConversionEvent):
+        if isinstance(event, BatchStarted):
+            self._in_batch = True
+        elif isinstance(event, BatchFinished):
+            self._in_batch = False
+
+        if isinstance(event, JobProgress):
+            # 批量模式下进度条显示整体进度
+            if not self._in_batch:
+                self.progress_cb(event.percent)
+        elif isinstance(event, BatchProgress):
+            self.progress_cb(event.percent)
+        elif isinstance(event, ConversionFinished):
+            self.complete_cb(event.success)
+        elif isinstance(event, JobFailed) or (isinstance(event, Message) and event.level == "error"):
+            self.error_cb(describe_event(event))
+        else:
+            text = describe_event(event)
+            if text:
+                self.status_cb(text)
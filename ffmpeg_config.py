@@ -6,6 +6,7 @@ FFmpeg配置模块
 """
 
 import os
+import subprocess
 import sys
 import tempfile
 
@@ -58,12 +59,28 @@ def get_ffmpeg_path():
         if os.path.exists(system_ffmpeg):
             return system_ffmpeg
         else:
-            # 尝试系统PATH
+            # 尝试系统PATH（非Windows系统下可执行文件没有.exe后缀）
             import shutil
-            which_ffmpeg = shutil.which('ffmpeg.exe')
+            which_ffmpeg = shutil.which('ffmpeg.exe') or shutil.which('ffmpeg')
             if which_ffmpeg:
                 return which_ffmpeg
-            return "ffmpeg.exe"
+            return "ffmpeg.exe" if os.name == 'nt' else "ffmpeg"
+
+def get_ffprobe_path(ffmpeg_path=None):
+    """
+    获取与ffmpeg同目录的ffprobe路径
+    """
+    ffmpeg_path = ffmpeg_path or get_ffmpeg_path()
+    directory, name = os.path.split(ffmpeg_path)
+    return os.path.join(directory, name.replace('ffmpeg', 'ffprobe'))
+
+def subprocess_kwargs():
+    """
+    启动ffmpeg子进程时的额外参数（Windows下不弹出控制台窗口）
+    """
+    if os.name == 'nt':
+        return {"creationflags": subprocess.CREATE_NO_WINDOW}
+    return {}
 
 def setup_ffmpeg():
     """
@@ -77,7 +94,8 @@ def setup_ffmpeg():
     # 设置pydub的ffmpeg路径
     if os.path.exists(ffmpeg_path):
         pydub.utils.get_encoder_path = lambda: ffmpeg_path
-        pydub.utils.get_prober_path = lambda: ffmpeg_path.replace('ffmpeg.exe', 'ffprobe.exe')
+        AudioSegment.converter = ffmpeg_path
+        pydub.utils.get_prober_path = lambda: get_ffprobe_path(ffmpeg_path)
         
         # 设置环境变量
         ffmpeg_dir = os.path.dirname(ffmpeg_path)
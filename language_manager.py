@@ -31,6 +31,35 @@ class LanguageManager:
                 "group_control": "🎮 转换控制",
                 "group_progress": "📊 进度显示",
                 "group_log": "📝 操作日志",
+                "label_log_level": "日志级别:",
+                "log_level_debug": "全部",
+                "log_level_info": "信息",
+                "log_level_warning": "警告",
+                "log_level_error": "错误",
+                "btn_export_log": "导出日志",
+                "label_selected_count": "已选择 {count} 项",
+                "label_scanning": "（扫描中...）",
+                "tab_log": "日志",
+                "tab_results": "转换结果",
+                "btn_export_results": "导出CSV",
+                "label_results_summary": "成功 {succeeded} 个，失败 {failed} 个",
+                "col_result_status": "状态",
+                "col_result_input": "输入",
+                "col_result_output": "输出",
+                "col_result_engine": "引擎",
+                "col_result_decode_s": "解码(s)",
+                "col_result_encode_s": "编码(s)",
+                "col_result_elapsed_s": "总耗时(s)",
+                "col_result_realtime_factor": "实时倍率",
+                "col_result_input_bytes": "输入大小",
+                "col_result_output_bytes": "输出大小",
+                "col_result_size_ratio": "大小比",
+                "col_result_error": "错误",
+                "placeholder_selection_filter": "按文件名筛选...",
+                "col_name": "名称",
+                "col_format": "格式",
+                "col_size": "大小",
+                "col_location": "位置",
                 
                 # 标签文本
                 "label_format": "输出格式:",
@@ -122,6 +151,35 @@ class LanguageManager:
                 "group_control": "🎮 Conversion Control",
                 "group_progress": "📊 Progress Display",
                 "group_log": "📝 Operation Log",
+                "label_log_level": "Log Level:",
+                "log_level_debug": "All",
+                "log_level_info": "Info",
+                "log_level_warning": "Warning",
+                "log_level_error": "Error",
+                "btn_export_log": "Export Log",
+                "label_selected_count": "{count} selected",
+                "label_scanning": "(scanning...)",
+                "tab_log": "Log",
+                "tab_results": "Results",
+                "btn_export_results": "Export CSV",
+                "label_results_summary": "{succeeded} succeeded, {failed} failed",
+                "col_result_status": "Status",
+                "col_result_input": "Input",
+                "col_result_output": "Output",
+                "col_result_engine": "Engine",
+                "col_result_decode_s": "Decode (s)",
+                "col_result_encode_s": "Encode (s)",
+                "col_result_elapsed_s": "Total (s)",
+                "col_result_realtime_factor": "Realtime",
+                "col_result_input_bytes": "Input Size",
+                "col_result_output_bytes": "Output Size",
+                "col_result_size_ratio": "Size Ratio",
+                "col_result_error": "Error",
+                "placeholder_selection_filter": "Filter by file name...",
+                "col_name": "Name",
+                "col_format": "Format",
+                "col_size": "Size",
+                "col_location": "Location",
                 
                 # 标签文本
                 "label_format": "Output Format:",
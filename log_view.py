@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志视图组件
+日志先写入有上限的内存存储，再由定时器批量刷新到界面，
+支持按级别筛选和导出到文件，适合上万个文件的批量转换
+"""
+
+from collections import deque
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QPlainTextEdit,
+                             QComboBox, QPushButton, QLabel, QFileDialog, QMessageBox)
+from PyQt6.QtCore import QTimer
+
+# 日志级别（按严重程度递增）
+LEVELS = ["debug", "info", "warning", "error"]
+
+
+class LogStore:
+    """有上限的日志存储，超出上限时丢弃最旧的记录"""
+
+    def __init__(self, max_entries: int = 100000):
+        self.entries = deque(maxlen=max_entries)
+        # 尚未刷新到界面的记录（同样有上限）
+        self.pending = deque(maxlen=max_entries)
+        self.dropped = 0
+
+    def add(self, level: str, message: str, timestamp: Optional[str] = None):
+        """添加一条日志"""
+        entry = (timestamp or datetime.now().strftime("%H:%M:%S"), level, message)
+        if len(self.entries) == self.entries.maxlen:
+            self.dropped += 1
+        self.entries.append(entry)
+        self.pending.append(entry)
+
+    def take_pending(self) -> List[Tuple[str, str, str]]:
+        """取出尚未显示的记录"""
+        pending = list(self.pending)
+        self.pending.clear()
+        return pending
+
+    def filtered(self, min_level: str = "debug") -> List[Tuple[str, str, str]]:
+        """获取不低于指定级别的全部记录"""
+        threshold = LEVELS.index(min_level)
+        return [e for e in self.entries if LEVELS.index(e[1]) >= threshold]
+
+    def clear(self):
+        """清空日志"""
+        self.entries.clear()
+        self.pending.clear()
+        self.dropped = 0
+
+    def export(self, path: str, min_level: str = "debug"):
+        """导出日志到文本文件"""
+        with open(path, "w", encoding="utf-8") as f:
+            if self.dropped:
+                f.write(f"# 已丢弃最早的 {self.dropped} 条日志\n")
+            for timestamp, level, message in self.filtered(min_level):
+                f.write(f"[{timestamp}] {level.upper():<7} {message}\n")
+
+
+def format_entry(entry: Tuple[str, str, str]) -> str:
+    """格式化一条日志"""
+    timestamp, level, message = entry
+    return f"[{timestamp}] {message}"
+
+
+class LogView(QWidget):
+    """批量刷新的日志视图"""
+
+    # 界面刷新间隔（毫秒）
+    FLUSH_INTERVAL_MS = 200
+    # 文本框中最多保留的行数，更早的记录仍可导出
+    MAX_DISPLAY_LINES = 5000
+
+    def __init__(self, lang, parent=None, max_entries: int = 100000):
+        super().__init__(parent)
+        self.lang = lang
+        self.store = LogStore(max_entries)
+        self.min_level = "info"
+
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        # 工具栏：级别筛选和导出
+        toolbar = QHBoxLayout()
+        self.level_label = QLabel()
+        toolbar.addWidget(self.level_label)
+
+        self.level_combo = QComboBox()
+        for level in LEVELS:
+            self.level_combo.addItem("", level)
+        self.level_combo.setCurrentIndex(LEVELS.index(self.min_level))
+        self.level_combo.currentIndexChanged.connect(self.on_level_changed)
+        toolbar.addWidget(self.level_combo)
+        toolbar.addStretch()
+
+        self.export_btn = QPushButton()
+        self.export_btn.clicked.connect(self.export_log)
+        toolbar.addWidget(self.export_btn)
+        layout.addLayout(toolbar)
+
+        self.text_edit = QPlainTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setUndoRedoEnabled(False)
+        self.text_edit.setMaximumBlockCount(self.MAX_DISPLAY_LINES)
+        layout.addWidget(self.text_edit)
+
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setInterval(self.FLUSH_INTERVAL_MS)
+        self.flush_timer.timeout.connect(self.flush)
+        self.flush_timer.start()
+
+        self.update_language()
+
+    def add(self, message: str, level: str = "info"):
+        """添加日志（只写入存储，由定时器刷新到界面）"""
+        self.store.add(level, message)
+
+    def flush(self):
+        """把缓冲的日志一次性追加到文本框"""
+        pending = self.store.take_pending()
+        if not pending:
+            return
+        threshold = LEVELS.index(self.min_level)
+        lines = [format_entry(e) for e in pending[-self.MAX_DISPLAY_LINES:]
+                 if LEVELS.index(e[1]) >= threshold]
+        if not lines:
+            return
+
+        # 只有在用户没有向上翻看时才自动滚动到底部
+        scrollbar = self.text_edit.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 4
+        self.text_edit.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def rebuild(self):
+        """按当前筛选级别重新填充文本框"""
+        self.store.take_pending()
+        entries = self.store.filtered(self.min_level)[-self.MAX_DISPLAY_LINES:]
+        self.text_edit.setPlainText("\n".join(format_entry(e) for e in entries))
+        scrollbar = self.text_edit.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
+
+    def on_level_changed(self, index: int):
+        """筛选级别变化"""
+        self.min_level = self.level_combo.itemData(index) or "info"
+        self.rebuild()
+
+    def export_log(self):
+        """导出日志到文件"""
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            self.lang.get_text("btn_export_log"),
+            f"music_converter_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log",
+            "Log (*.log *.txt)"
+        )
+        if path:
+            try:
+                self.store.export(path, self.min_level)
+            except OSError as e:
+                QMessageBox.critical(self, "错误", f"导出失败: {e}")
+
+    def clear(self):
+        """清空日志"""
+        self.store.clear()
+        self.text_edit.clear()
+
+    def update_language(self):
+        """更新界面文字"""
+        self.level_label.setText(self.lang.get_text("label_log_level"))
+        self.export_btn.setText(self.lang.get_text("btn_export_log"))
+        for i, level in enumerate(LEVELS):
+            self.level_combo.setItemText(i, self.lang.get_text(f"log_level_{level}"))
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+响度分析（EBU R128）
+用ffmpeg的 loudnorm 滤镜测量整体响度、真峰值和响度范围，
+测量结果按输入文件内容的哈希缓存，以不同目标响度重新转换时不需要再次分析。
+标准化只计算一个线性增益，在导出时由编码所用的同一个ffmpeg进程应用（volume 滤镜），
+不需要额外的解码/编码过程
+"""
+
+import os
+import json
+import math
+import asyncio
+import hashlib
+import threading
+import subprocess
+from dataclasses import dataclass, asdict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from ffmpeg_config import subprocess_kwargs
+
+# 默认缓存文件（JSON Lines，每次测量追加一行）
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "music-converter",
+                                  "loudness.jsonl")
+
+# 计算内容哈希时每次读取的大小
+_HASH_CHUNK = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class LoudnessMeasurement:
+    """一个文件的响度测量结果"""
+    integrated: float   # 整体响度（LUFS）
+    true_peak: float    # 真峰值（dBTP）
+    lra: float          # 响度范围（LU）
+    threshold: float    # 门限（LUFS）
+
+    def gain_for(self, target: float, true_peak_limit: float) -> float:
+        """
+        达到目标响度所需的增益（dB）
+        增益受真峰值上限约束（不做压限），静音文件返回0
+        """
+        if not math.isfinite(self.integrated):
+            return 0.0
+        gain = target - self.integrated
+        if math.isfinite(self.true_peak):
+            gain = min(gain, true_peak_limit - self.true_peak)
+        return gain
+
+
+def content_hash(path: str) -> str:
+    """文件内容的哈希（与文件名和修改时间无关，复制或改名后仍可命中缓存）"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(_HASH_CHUNK)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def measure_command(ffmpeg_path: str, input_path: str) -> List[str]:
+    """测量响度的ffmpeg命令（只解码，不输出文件）"""
+    return [ffmpeg_path, "-hide_banner", "-nostdin", "-i", str(input_path), "-vn",
+            "-af", "loudnorm=print_format=json", "-f", "null", "-"]
+
+
+def parse_measurement(log: str) -> LoudnessMeasurement:
+    """从 loudnorm 的日志输出中解析测量结果"""
+    start = log.rfind("{")
+    end = log.rfind("}")
+    if start < 0 or end < start:
+        raise ValueError("ffmpeg没有输出响度测量结果")
+    data = json.loads(log[start:end + 1])
+    return LoudnessMeasurement(float(data["input_i"]), float(data["input_tp"]),
+                               float(data["input_lra"]), float(data["input_thresh"]))
+
+
+class LoudnessCache:
+    """按内容哈希保存测量结果（JSON Lines 文件，线程安全）"""
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE_PATH):
+        """
+        Args:
+            path: 缓存文件路径，为None时只在内存中缓存
+        """
+        self.path = path
+        self._entries: Dict[str, LoudnessMeasurement] = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._load()
+
+    def _load(self):
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    data = json.loads(line)
+                    key = data.pop("hash")
+                    self._entries[key] = LoudnessMeasurement(**data)
+                except (ValueError, KeyError, TypeError):
+                    # 忽略写了一半或格式不对的行
+                    continue
+
+    def get(self, key: str) -> Optional[LoudnessMeasurement]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key: str, measurement: LoudnessMeasurement):
+        with self._lock:
+            self._entries[key] = measurement
+            if not self.path:
+                return
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"hash": key, **asdict(measurement)}) + "\n")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class LoudnessAnalyzer:
+    """测量文件响度，优先使用缓存"""
+
+    def __init__(self, ffmpeg_path: str, cache: Optional[LoudnessCache] = None):
+        self.ffmpeg_path = ffmpeg_path
+        self.cache = cache if cache is not None else LoudnessCache(None)
+
+    def analyze(self, input_path: str) -> LoudnessMeasurement:
+        """同步测量（线程池引擎使用）"""
+        key = content_hash(input_path)
+        measurement = self.cache.get(key)
+        if measurement is None:
+            result = subprocess.run(measure_command(self.ffmpeg_path, input_path),
+                                    capture_output=True, **subprocess_kwargs())
+            log = result.stderr.decode("utf-8", "replace")
+            if result.returncode != 0:
+                raise RuntimeError(log.strip().splitlines()[-1] if log.strip()
+                                   else f"退出码 {result.returncode}")
+            measurement = parse_measurement(log)
+            self.cache.put(key, measurement)
+        return measurement
+
+    async def analyze_async(self, input_path: str) -> LoudnessMeasurement:
+        """异步测量（asyncio引擎使用），哈希计算放到线程中，不阻塞事件循环"""
+        key = await asyncio.to_thread(content_hash, input_path)
+        measurement = self.cache.get(key)
+        if measurement is None:
+            process = await asyncio.create_subprocess_exec(
+                *measure_command(self.ffmpeg_path, input_path),
+                stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE,
+                **subprocess_kwargs()
+            )
+            try:
+                _, stderr = await process.communicate()
+            except asyncio.CancelledError:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                raise
+            log = stderr.decode("utf-8", "replace")
+            if process.returncode != 0:
+                raise RuntimeError(log.strip().splitlines()[-1] if log.strip()
+                                   else f"退出码 {process.returncode}")
+            measurement = parse_measurement(log)
+            self.cache.put(key, measurement)
+        return measurement
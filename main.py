@@ -7,6 +7,7 @@
 
 import sys
 import os
+import argparse
 
 # 设置ffmpeg路径（在导入pydub之前）
 from ffmpeg_config import setup_ffmpeg
@@ -18,18 +19,23 @@ patch_pydub_for_no_window()
 
 from PyQt6.QtWidgets import QApplication
 from ui import MusicConverterUI
-from converter import MusicConverter
+from converter import ENGINES, create_converter
 
 def main():
     """主函数"""
+    # 解析本程序的参数，其余参数交给Qt
+    parser = argparse.ArgumentParser(description="音乐格式转换器")
+    parser.add_argument("--engine", choices=ENGINES, default="pydub", help="转换引擎")
+    args, qt_args = parser.parse_known_args()
+    
     # 创建应用程序
-    app = QApplication(sys.argv)
+    app = QApplication(sys.argv[:1] + qt_args)
     
     # 设置应用程序样式（现代化深色主题）
     app.setStyle('Fusion')
     
     # 创建转换器核心逻辑
-    converter = MusicConverter()
+    converter = create_converter(args.engine)
     
     # 创建主界面
     ui = MusicConverterUI(converter)
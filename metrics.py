@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换指标模块
+提供计数器、仪表和直方图，并通过可插拔的输出端导出
+（Prometheus文本文件、本地HTTP端点、JSON Lines）
+"""
+
+import os
+import json
+import time
+import threading
+from abc import ABC, abstractmethod
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, List, Optional, Tuple
+
+from events import JobQueued, JobStarted, JobFinished, JobFailed
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+# 指标名前缀
+PREFIX = "music_converter_"
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple:
+    """把标签字典转换为可哈希的键"""
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key: Tuple, extra: Optional[Tuple] = None) -> str:
+    """格式化为Prometheus标签字符串"""
+    items = list(key) + ([extra] if extra else [])
+    if not items:
+        return ""
+    escaped = ('{}="{}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"'))
+               for k, v in items)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Metric:
+    """指标基类"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, lock: threading.Lock):
+        self.name = name
+        self.help = help_text
+        self._lock = lock
+        self._values: Dict[Tuple, float] = {}
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        """返回 (指标名, 标签字符串, 数值) 列表"""
+        with self._lock:
+            return [(self.name, _format_labels(key), value)
+                    for key, value in self._values.items()]
+
+
+class Counter(Metric):
+    """只增不减的计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        """增加计数"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """可增可减的当前值"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        """设置当前值"""
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+    def inc(self, amount: float = 1, **labels):
+        """增加当前值"""
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        """减少当前值"""
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """分桶直方图"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, lock: threading.Lock,
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, lock)
+        self.buckets = tuple(sorted(buckets))
+        # 标签键 -> [各桶计数..., 总和, 总数]
+        self._data: Dict[Tuple, List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        """记录一个观测值"""
+        key = _label_key(labels)
+        with self._lock:
+            data = self._data.get(key)
+            if data is None:
+                data = self._data[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self) -> List[Tuple[str, str, float]]:
+        result = []
+        with self._lock:
+            for key, data in self._data.items():
+                for bound, count in zip(self.buckets, data):
+                    result.append((f"{self.name}_bucket", _format_labels(key, ("le", bound)), count))
+                result.append((f"{self.name}_bucket", _format_labels(key, ("le", "+Inf")), data[-1]))
+                result.append((f"{self.name}_sum", _format_labels(key), data[-2]))
+                result.append((f"{self.name}_count", _format_labels(key), data[-1]))
+        return result
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        """获取或创建计数器"""
+        return self._register(Counter(name, help_text, self._lock))
+
+    def gauge(self, name: str, help_text: str = "") -> Gauge:
+        """获取或创建仪表"""
+        return self._register(Gauge(name, help_text, self._lock))
+
+    def histogram(self, name: str, help_text: str = "",
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """获取或创建直方图"""
+        return self._register(Histogram(name, help_text, self._lock, buckets))
+
+    def metrics(self) -> List[Metric]:
+        """获取全部指标"""
+        return list(self._metrics.values())
+
+    def render_prometheus(self) -> str:
+        """渲染为Prometheus文本格式"""
+        lines = []
+        for metric in self.metrics():
+            if metric.help:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {value}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict[str, float]:
+        """获取扁平化的指标快照"""
+        return {f"{name}{labels}": value
+                for metric in self.metrics()
+                for name, labels, value in metric.samples()}
+
+
+class MetricsSink(ABC):
+    """指标输出端基类"""
+
+    @abstractmethod
+    def export(self, registry: MetricsRegistry):
+        """导出一次指标"""
+
+    def close(self):
+        """释放资源"""
+
+
+class PrometheusTextFileSink(MetricsSink):
+    """写入Prometheus文本文件（供node_exporter的textfile collector采集）"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, registry: MetricsRegistry):
+        # 先写临时文件再替换，避免采集到写了一半的文件
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(registry.render_prometheus())
+        os.replace(temp_path, self.path)
+
+
+class JsonLinesSink(MetricsSink):
+    """以JSON Lines追加指标快照"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, registry: MetricsRegistry):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"time": time.time(), "metrics": registry.snapshot()},
+                               ensure_ascii=False) + "\n")
+
+
+class PrometheusHTTPExporter(MetricsSink):
+    """在本地HTTP端口提供 /metrics 端点（按请求实时渲染）"""
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9464, host: str = "127.0.0.1"):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = registry.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不输出访问日志
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name="metrics-http", daemon=True)
+        self.thread.start()
+
+    def export(self, registry: MetricsRegistry):
+        # 请求时实时渲染，无需主动导出
+        pass
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class PeriodicExporter:
+    """定期把指标写入各输出端"""
+
+    def __init__(self, registry: MetricsRegistry, sinks: List[MetricsSink],
+                 interval: float = 10.0):
+        self.registry = registry
+        self.sinks = sinks
+        self.interval = interval
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-exporter", daemon=True)
+
+    def start(self):
+        """开始定期导出"""
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            self.flush()
+
+    def flush(self):
+        """立即导出一次"""
+        for sink in self.sinks:
+            try:
+                sink.export(self.registry)
+            except OSError as e:
+                print(f"⚠️ 指标导出失败: {e}")
+
+    def stop(self):
+        """停止导出，最后导出一次并关闭输出端"""
+        self._stop_event.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self.flush()
+        for sink in self.sinks:
+            sink.close()
+
+
+class ConverterMetrics:
+    """转换器使用的指标集合，通过订阅转换事件更新（见 MusicConverter.set_metrics）"""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or MetricsRegistry()
+        r = self.registry
+        self.jobs_started = r.counter(PREFIX + "jobs_started_total", "已开始的转换任务数")
+        self.jobs_succeeded = r.counter(PREFIX + "jobs_succeeded_total", "成功的转换任务数")
+        self.jobs_failed = r.counter(PREFIX + "jobs_failed_total", "失败的转换任务数")
+        self.bytes_in = r.counter(PREFIX + "input_bytes_total", "已读取的输入字节数")
+        self.bytes_out = r.counter(PREFIX + "output_bytes_total", "已写入的输出字节数")
+        self.audio_seconds = r.counter(PREFIX + "audio_seconds_total", "已处理的音频时长（秒）")
+        self.stage_seconds = r.histogram(PREFIX + "stage_duration_seconds", "各阶段耗时（秒）")
+        self.queue_depth = r.gauge(PREFIX + "queue_depth", "等待空闲线程的任务数")
+        self.active_workers = r.gauge(PREFIX + "active_workers", "正在转换的线程数")
+        # 先把无标签的指标初始化为0，保证采集端从一开始就能看到序列
+        for metric in (self.jobs_started, self.jobs_succeeded, self.jobs_failed,
+                       self.bytes_in, self.bytes_out, self.audio_seconds):
+            metric.inc(0)
+        self.queue_depth.set(0)
+        self.active_workers.set(0)
+        # 排队中和执行中的任务编号，用于正确维护两个仪表
+        self._lock = threading.Lock()
+        self._queued = set()
+        self._active = set()
+
+    def observe_stage(self, stage: str, seconds: float):
+        """记录阶段耗时"""
+        self.stage_seconds.observe(seconds, stage=stage)
+
+    def _leave(self, job_id: int, started: bool = False):
+        """任务离开排队或执行状态"""
+        with self._lock:
+            if job_id in self._queued:
+                self._queued.discard(job_id)
+                self.queue_depth.dec()
+            if job_id in self._active:
+                self._active.discard(job_id)
+                self.active_workers.dec()
+            if started:
+                self._active.add(job_id)
+                self.active_workers.inc()
+
+    def handle(self, event):
+        """事件监听入口"""
+        if isinstance(event, JobQueued):
+            with self._lock:
+                self._queued.add(event.job_id)
+                self.queue_depth.inc()
+        elif isinstance(event, JobStarted):
+            self._leave(event.job_id, started=True)
+            self.jobs_started.inc()
+        elif isinstance(event, JobFinished):
+            self._leave(event.job_id)
+            self.jobs_succeeded.inc()
+            self.bytes_in.inc(event.input_bytes)
+            self.bytes_out.inc(event.output_bytes)
+            self.audio_seconds.inc(event.audio_seconds)
+            for stage, seconds in event.timings.items():
+                self.observe_stage(stage, seconds)
+        elif isinstance(event, JobFailed):
+            self._leave(event.job_id)
+            self.jobs_failed.inc()
+            for stage, seconds in event.timings.items():
+                self.observe_stage(stage, seconds)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换选项
+默认值表示不做额外处理，与之前的转换结果完全相同；
+选项可以转换为字典，随任务一起发送给分布式工作节点或写入共享队列
+"""
+
+from dataclasses import dataclass, asdict, fields
+from typing import Dict, Optional
+
+# 重采样质量选项
+RESAMPLERS = ["fast", "standard", "high"]
+
+
+@dataclass
+class ConversionOptions:
+    """单个转换任务的处理选项"""
+    # 响度标准化目标（LUFS，例如 -14 / -16 / -23），为None时不做标准化
+    loudness_target: Optional[float] = None
+    # 标准化后允许的最大真峰值（dBTP），增益会被限制在该峰值以内
+    true_peak_limit: float = -1.0
+    # 淡入/淡出时长（秒），0表示不处理
+    fade_in: float = 0.0
+    fade_out: float = 0.0
+    # 去掉开头/结尾的静音；在不短于 min_silence 秒的静音处拆分为多个音轨
+    trim_silence: bool = False
+    split_silence: bool = False
+    # 低于该电平（dBFS）视为静音
+    silence_threshold: float = -50.0
+    min_silence: float = 2.0
+    # 输出采样率（Hz）、声道数和位深（16/24/32，只对wav/flac有效），为None时与源文件相同
+    sample_rate: Optional[int] = None
+    channels: Optional[int] = None
+    bit_depth: Optional[int] = None
+    # 重采样质量：fast / standard / high
+    resampler: str = "standard"
+    # 转换后完整解码输出文件，检查时长（无损输出还比较样本MD5），不通过时任务失败
+    verify: bool = False
+
+    @property
+    def normalize(self) -> bool:
+        return self.loudness_target is not None
+
+    @property
+    def needs_processing(self) -> bool:
+        """是否需要在样本上处理（pydub引擎使用 pcm.PcmBuffer，asyncio引擎使用ffmpeg滤镜）"""
+        return self.fade_in > 0 or self.fade_out > 0 or self.edits_silence
+
+    @property
+    def edits_silence(self) -> bool:
+        return self.trim_silence or self.split_silence
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> "ConversionOptions":
+        """由 to_dict 的结果还原，忽略未知字段（兼容不同版本的节点）"""
+        if not data:
+            return cls()
+        names = {f.name for f in fields(cls)}
+        return cls(**{key: value for key, value in data.items() if key in names})
+
+
+def add_option_arguments(parser, cache: bool = True):
+    """
+    向命令行解析器添加转换选项参数（cli.py 和 distributed.py 共用）
+    cache 为False时不添加缓存文件参数（分布式协调节点不做测量）
+    """
+    group = parser.add_argument_group("响度标准化")
+    group.add_argument("--loudness-target", type=float, metavar="LUFS",
+                       help="标准化到指定的整体响度（例如 -14 / -16 / -23），不指定则不做标准化")
+    group.add_argument("--true-peak", type=float, default=-1.0, metavar="DBTP",
+                       help="标准化后允许的最大真峰值")
+    if cache:
+        add_cache_argument(group)
+
+    group = parser.add_argument_group("音频处理")
+    group.add_argument("--fade-in", type=float, default=0.0, metavar="SECONDS", help="淡入时长（秒）")
+    group.add_argument("--fade-out", type=float, default=0.0, metavar="SECONDS", help="淡出时长（秒）")
+    group.add_argument("--trim-silence", action="store_true", help="去掉开头和结尾的静音")
+    group.add_argument("--split-silence", action="store_true",
+                       help="在长静音处拆分为多个音轨（输出为 文件名_01、文件名_02 ...）")
+    group.add_argument("--silence-threshold", type=float, default=-50.0, metavar="DBFS",
+                       help="静音电平阈值")
+    group.add_argument("--min-silence", type=float, default=2.0, metavar="SECONDS",
+                       help="拆分所需的最短静音时长（秒）")
+
+    group = parser.add_argument_group("输出音频格式")
+    group.add_argument("--sample-rate", type=int, metavar="HZ", help="输出采样率（例如 44100 / 48000）")
+    group.add_argument("--channels", type=int, choices=[1, 2], help="输出声道数")
+    group.add_argument("--bit-depth", type=int, choices=[16, 24, 32],
+                       help="输出位深（只对wav/flac有效，降低位深时加三角抖动）")
+    group.add_argument("--resampler", choices=RESAMPLERS, default="standard",
+                       help="重采样质量：fast 最快，high 使用 soxr（ffmpeg未编译时使用高精度swr参数）")
+
+    group = parser.add_argument_group("输出校验")
+    group.add_argument("--verify", action="store_true",
+                       help="转换后解码校验输出文件（时长；wav/flac 比较样本MD5），批量转换时与编码并行进行")
+
+
+def add_cache_argument(parser):
+    parser.add_argument("--loudness-cache", metavar="FILE",
+                        help="响度测量缓存文件（默认 ~/.cache/music-converter/loudness.jsonl）")
+
+
+def options_from_args(args) -> ConversionOptions:
+    """由 add_option_arguments 解析出的参数构造转换选项"""
+    return ConversionOptions(loudness_target=args.loudness_target,
+                             true_peak_limit=args.true_peak,
+                             fade_in=args.fade_in, fade_out=args.fade_out,
+                             trim_silence=args.trim_silence, split_silence=args.split_silence,
+                             silence_threshold=args.silence_threshold,
+                             min_silence=args.min_silence,
+                             sample_rate=args.sample_rate, channels=args.channels,
+                             bit_depth=args.bit_depth, resampler=args.resampler,
+                             verify=args.verify)
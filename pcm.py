@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PCM样本处理（NumPy）
+pydub 的 AudioSegment 不可变，每次淡入淡出或切片都会复制整段 bytes；
+这里直接在解码数据上建立整数数组视图（帧 x 声道），第一次修改时才复制为可写数组，
+之后的处理都原地完成：只把受影响的区间分块转换为浮点计算再写回，
+淡入淡出只处理开头结尾几秒，不需要一份完整的浮点副本；
+增益（响度标准化）和声道、采样率转换由编码的ffmpeg滤镜完成。
+处理结果通过管道直接交给编码的ffmpeg进程，不再生成中间 AudioSegment 和临时wav文件。
+NumPy 是可选依赖，只有需要样本处理时才用到（encode_raw 直接编码 AudioSegment 的数据，不需要NumPy）
+"""
+
+import subprocess
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from ffmpeg_config import subprocess_kwargs
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 未安装时 available() 返回False
+    np = None
+
+# 分块处理时每块的帧数（浮点临时数组约为 块帧数 x 声道数 x 4 字节）
+_BLOCK_FRAMES = 1 << 18
+
+
+def available() -> bool:
+    """是否可以使用样本处理（需要NumPy）"""
+    return np is not None
+
+
+class PcmBuffer:
+    """
+    解码后的音频样本
+    samples 为整数数组，形状 (帧数, 声道数)：16位源为 int16，
+    8位源转换为 int16，24/32位源为 int32（24位样本左对齐到高24位）
+    """
+
+    def __init__(self, samples, frame_rate: int, bits: int):
+        self.samples = samples
+        self.frame_rate = frame_rate
+        # 源文件的样本位数（至少16），wav输出时保持不变
+        self.bits = bits
+
+    @classmethod
+    def from_segment(cls, audio) -> "PcmBuffer":
+        """由 AudioSegment 构造（16/32位源直接建立视图，不复制）"""
+        return cls.from_bytes(audio.raw_data, audio.frame_rate, audio.channels, audio.sample_width)
+
+    @classmethod
+    def from_bytes(cls, data, frame_rate: int, channels: int, sample_width: int) -> "PcmBuffer":
+        """由小端整数PCM数据构造"""
+        if sample_width == 1:
+            # pydub 读取8位wav时已转换为有符号样本
+            samples = np.frombuffer(data, dtype=np.int8).astype(np.int16) << 8
+        elif sample_width == 3:
+            # 24位样本没有对应的dtype，拼成int32（左对齐）
+            packed = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3)
+            wide = np.zeros((len(packed), 4), dtype=np.uint8)
+            wide[:, 1:] = packed
+            samples = wide.view("<i4").reshape(-1)
+        else:
+            samples = np.frombuffer(data, dtype=f"<i{sample_width}")
+        return cls(samples.reshape(-1, channels), frame_rate, max(16, 8 * sample_width))
+
+    @property
+    def channels(self) -> int:
+        return self.samples.shape[1]
+
+    @property
+    def frames(self) -> int:
+        return self.samples.shape[0]
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.frames / self.frame_rate if self.frame_rate else 0.0
+
+    # ---- 原地处理 ----
+
+    def _writable(self):
+        """第一次修改前复制只读视图"""
+        if not self.samples.flags.writeable:
+            self.samples = self.samples.copy()
+        return self.samples
+
+    def _scale(self, start: int, stop: int, factors):
+        """把 [start, stop) 区间的样本乘以系数（标量或每帧一个系数），限幅后写回"""
+        samples = self._writable()
+        info = np.iinfo(samples.dtype)
+        # float32 只有24位有效数字，32位样本的上限会舍入为 2^31，转换回整数时溢出，改用 float64
+        work_type = np.float64 if info.bits > 16 else np.float32
+        for block in range(start, stop, _BLOCK_FRAMES):
+            end = min(stop, block + _BLOCK_FRAMES)
+            values = samples[block:end].astype(work_type)
+            if np.ndim(factors):
+                values *= factors[block - start:end - start, None]
+            else:
+                values *= factors
+            np.rint(values, out=values)
+            np.clip(values, info.min, info.max, out=values)
+            samples[block:end] = values
+
+    def fade_in(self, seconds: float) -> "PcmBuffer":
+        """线性淡入"""
+        count = min(self.frames, int(seconds * self.frame_rate))
+        if count > 0:
+            self._scale(0, count, np.linspace(0.0, 1.0, count, dtype=np.float32))
+        return self
+
+    def fade_out(self, seconds: float) -> "PcmBuffer":
+        """线性淡出"""
+        count = min(self.frames, int(seconds * self.frame_rate))
+        if count > 0:
+            self._scale(self.frames - count, self.frames,
+                        np.linspace(1.0, 0.0, count, dtype=np.float32))
+        return self
+
+    # ---- 静音检测和切分 ----
+
+    def detect_silence(self, threshold_db: float, window: float = 0.05,
+                       min_length: float = 0.1) -> List[Tuple[float, float]]:
+        """
+        查找静音区间（秒）
+        按 window 秒的窗口计算所有声道的均方值，低于阈值的连续窗口合并为一个区间，
+        短于 min_length 的区间忽略。整个数组一次遍历（分块转换为浮点），不复制样本
+        """
+        size = max(1, int(window * self.frame_rate))
+        count = -(-self.frames // size)
+        if count == 0:
+            return []
+        full_scale = float(-np.iinfo(self.samples.dtype).min)
+        limit = (full_scale * 10 ** (threshold_db / 20)) ** 2
+        power = np.empty(count, dtype=np.float64)
+        step = max(size, _BLOCK_FRAMES // size * size)
+        for block in range(0, self.frames, step):
+            end = min(self.frames, block + step)
+            values = self.samples[block:end].astype(np.float32)
+            values *= values
+            whole = (end - block) // size
+            first = block // size
+            if whole:
+                power[first:first + whole] = values[:whole * size].reshape(whole, -1).mean(
+                    axis=1, dtype=np.float64)
+            if whole * size < end - block:
+                # 最后不足一个窗口的尾部
+                power[first + whole] = values[whole * size:].mean(dtype=np.float64)
+
+        edges = np.diff(np.concatenate(([0], (power < limit).view(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        stops = np.flatnonzero(edges == -1)
+        keep = (stops - starts) * size >= min_length * self.frame_rate
+        return [(start * size / self.frame_rate, min(stop * size, self.frames) / self.frame_rate)
+                for start, stop in zip(starts[keep], stops[keep])]
+
+    def slice(self, start: float, end: float) -> "PcmBuffer":
+        """[start, end) 秒的片段（共享样本内存，不复制；修改时各片段各自复制）"""
+        first = int(round(start * self.frame_rate))
+        last = int(round(end * self.frame_rate))
+        samples = self.samples[first:last]
+        if self.samples.flags.writeable:
+            # 共享可写数组的片段改为只读视图，第一次修改时复制，避免互相影响
+            samples = samples.view()
+            samples.flags.writeable = False
+        return PcmBuffer(samples, self.frame_rate, self.bits)
+
+    # ---- 输出 ----
+
+    def input_args(self) -> List[str]:
+        """把本缓冲区作为ffmpeg管道输入的参数"""
+        return ["-f", f"s{8 * self.samples.itemsize}le", "-ar", str(self.frame_rate),
+                "-ac", str(self.channels), "-i", "pipe:0"]
+
+
+def encode(buffer: PcmBuffer, output_path: Path, ffmpeg_path: str,
+           codec_args: Optional[List[str]] = None, filters: Optional[List[str]] = None):
+    """
+    通过管道把样本交给ffmpeg编码（直接写出数组内存，不再复制）
+    失败时抛出 RuntimeError（信息为ffmpeg日志最后一行）
+    """
+    _run_encoder(buffer.input_args(), memoryview(np.ascontiguousarray(buffer.samples)).cast("B"),
+                 output_path, ffmpeg_path, codec_args, filters)
+
+
+def encode_raw(data: bytes, frame_rate: int, channels: int, sample_width: int,
+               output_path: Path, ffmpeg_path: str, codec_args: Optional[List[str]] = None,
+               filters: Optional[List[str]] = None):
+    """
+    通过管道把小端整数PCM（AudioSegment.raw_data）交给ffmpeg编码，不需要NumPy
+    代替 AudioSegment.export：export 先把整段PCM写成临时wav，编码结果也先写到临时文件再复制
+    """
+    # pydub 读取8位wav时已转换为有符号样本
+    sample_format = "s8" if sample_width == 1 else f"s{8 * sample_width}le"
+    input_args = ["-f", sample_format, "-ar", str(frame_rate), "-ac", str(channels),
+                  "-i", "pipe:0"]
+    _run_encoder(input_args, data, output_path, ffmpeg_path, codec_args, filters)
+
+
+def _run_encoder(input_args: List[str], data, output_path: Path, ffmpeg_path: str,
+                 codec_args: Optional[List[str]], filters: Optional[List[str]]):
+    command = [ffmpeg_path, "-hide_banner", "-nostdin", "-y", *input_args]
+    if filters:
+        command += ["-af", ",".join(filters)]
+    command += [*(codec_args or []), str(output_path)]
+
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                               stderr=subprocess.PIPE, **subprocess_kwargs())
+    # communicate 按块写入并同时读取日志，避免管道缓冲区写满后互相等待
+    _, stderr = process.communicate(data)
+    if process.returncode != 0:
+        log = stderr.decode("utf-8", "replace").strip()
+        raise RuntimeError(log.splitlines()[-1] if log else f"退出码 {process.returncode}")
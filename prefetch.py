@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入预读
+从机械硬盘或NAS转换时，工作线程经常在等待读取输入，CPU空闲。
+Prefetcher 订阅事件总线，按 JobQueued 的顺序在后台线程中提前读取即将开始的输入文件：
+数据读入页缓存后即丢弃，不占用进程内存，任务开始时直接从内存读取，读取延迟与正在进行的编码重叠。
+预读窗口（已预读但任务尚未开始的文件）同时受文件数和字节数限制；
+任务开始后不再继续读取该文件（工作线程已经在读）。
+cue 预读其引用的整轨镜像；压缩包成员需要解压整个压缩包，不预读
+"""
+
+import threading
+from collections import deque
+from typing import Deque, Dict, Optional, Set, Tuple
+
+import archive
+from cue import is_cue, parse_cue
+from events import BatchFinished, JobFailed, JobFinished, JobQueued, JobStarted
+
+# 默认预读窗口
+DEFAULT_DEPTH = 8
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+# 每次读取的大小
+_CHUNK_SIZE = 1024 * 1024
+
+
+class Prefetcher:
+    """按排队顺序把即将转换的输入读入页缓存"""
+
+    def __init__(self, depth: int = DEFAULT_DEPTH, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            depth: 最多预读多少个尚未开始的文件
+            max_bytes: 已预读但尚未开始的文件的总大小上限（字节）
+        """
+        self.depth = depth
+        self.max_bytes = max_bytes
+        # 统计：完整预读的文件数和字节数
+        self.files = 0
+        self.bytes = 0
+        self._condition = threading.Condition()
+        # 排队等待预读的任务 (job_id, 路径)
+        self._pending: Deque[Tuple[int, str]] = deque()
+        # 还没有加入预读窗口的任务（排队中或正在检查）
+        self._queued: Set[int] = set()
+        # 排队中就已开始（或结束）的任务，预读线程取到时跳过
+        self._skipped: Set[int] = set()
+        # 预读窗口：job_id -> 文件大小
+        self._window: Dict[int, int] = {}
+        self._used = 0
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """启动预读线程"""
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止预读线程（正在读取的文件读完当前块后停止）"""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def handle(self, event):
+        """事件监听入口（在发出事件的线程中调用，只更新队列）"""
+        if isinstance(event, JobQueued):
+            with self._condition:
+                self._pending.append((event.job_id, event.input_path))
+                self._queued.add(event.job_id)
+                self._condition.notify_all()
+        elif isinstance(event, (JobStarted, JobFinished, JobFailed)):
+            self._leave(event.job_id)
+        elif isinstance(event, BatchFinished):
+            with self._condition:
+                self._pending.clear()
+                self._queued.clear()
+                self._skipped.clear()
+
+    def _leave(self, job_id: int):
+        """任务开始：移出预读窗口，尚未预读的不再预读"""
+        with self._condition:
+            size = self._window.pop(job_id, None)
+            if size is not None:
+                self._used -= size
+                self._condition.notify_all()
+            elif job_id in self._queued:
+                self._skipped.add(job_id)
+
+    def _full(self) -> bool:
+        return len(self._window) >= self.depth or self._used >= self.max_bytes
+
+    def _next(self) -> Optional[Tuple[int, str]]:
+        """取下一个需要预读的任务，窗口已满时等待；停止时返回None"""
+        with self._condition:
+            while True:
+                if self._stopped:
+                    return None
+                if self._pending and not self._full():
+                    job_id, path = self._pending.popleft()
+                    if job_id in self._skipped:
+                        self._drop(job_id)
+                        continue
+                    return job_id, path
+                self._condition.wait()
+
+    def _admit(self, job_id: int, size: int) -> bool:
+        """把文件加入预读窗口，超出字节上限时等待；任务已开始或停止时返回False"""
+        with self._condition:
+            while (self._window and self._used + size > self.max_bytes
+                   and job_id not in self._skipped and not self._stopped):
+                self._condition.wait()
+            if job_id in self._skipped or self._stopped:
+                self._drop(job_id)
+                return False
+            self._queued.discard(job_id)
+            self._window[job_id] = size
+            self._used += size
+            return True
+
+    def _drop(self, job_id: int):
+        """不预读这个任务"""
+        with self._condition:
+            self._queued.discard(job_id)
+            self._skipped.discard(job_id)
+
+    @staticmethod
+    def _source(path: str) -> Optional[str]:
+        """实际需要读取的文件"""
+        if archive.is_member(path):
+            return None
+        if is_cue(path):
+            try:
+                return parse_cue(path).image_path
+            except (OSError, ValueError):
+                return None
+        return path
+
+    def _run(self):
+        buffer = bytearray(_CHUNK_SIZE)
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            job_id, path = item
+            try:
+                source = self._source(path)
+                if source is None:
+                    self._drop(job_id)
+                    continue
+                with open(source, "rb", buffering=0) as f:
+                    size = f.seek(0, 2)
+                    if size > self.max_bytes:
+                        self._drop(job_id)
+                        continue
+                    # 取出后到加入窗口之间任务可能已经开始，由 _admit 检查
+                    if not self._admit(job_id, size):
+                        continue
+                    f.seek(0)
+                    while True:
+                        with self._condition:
+                            if job_id not in self._window or self._stopped:
+                                break
+                        count = f.readinto(buffer)
+                        if not count:
+                            self.files += 1
+                            break
+                        self.bytes += count
+            except OSError:
+                # 预读只是优化，读取失败由转换任务自己报告
+                self._drop(job_id)
+                continue
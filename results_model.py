@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换结果表模型
+每个任务一行（输入、输出、引擎、解码/编码耗时、实时倍率、大小、错误），
+由界面定时器把一批 JobFinished / JobFailed 事件一次性追加，可排序并导出为CSV
+"""
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+from events import JobFinished, JobFailed
+from selection_model import format_size
+
+
+@dataclass
+class JobResult:
+    """单个任务的结果"""
+    job_id: int
+    input_path: str
+    output_path: str
+    engine: str
+    success: bool
+    decode_s: float
+    encode_s: float
+    elapsed: float
+    audio_seconds: float
+    input_bytes: int
+    output_bytes: int
+    error: str
+
+    @classmethod
+    def from_event(cls, event) -> Optional["JobResult"]:
+        """由任务结束事件构造，其他事件返回None"""
+        if not isinstance(event, (JobFinished, JobFailed)):
+            return None
+        decode_s = event.timings.get("decode", 0.0)
+        # ffmpeg-async 引擎在一个进程中完成解码和编码，整体计入编码列
+        encode_s = event.timings.get("encode", event.timings.get("transcode", 0.0))
+        if isinstance(event, JobFinished):
+            return cls(event.job_id, event.input_path, event.output_path, event.engine, True,
+                       decode_s, encode_s, event.elapsed, event.audio_seconds,
+                       event.input_bytes, event.output_bytes, "")
+        return cls(event.job_id, event.input_path, "", event.engine, False,
+                   decode_s, encode_s, event.elapsed, 0.0, 0, 0, event.error)
+
+    @property
+    def realtime_factor(self) -> float:
+        """音频时长 / 转换耗时（越大越快）"""
+        return self.audio_seconds / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def size_ratio(self) -> float:
+        """输出大小 / 输入大小"""
+        return self.output_bytes / self.input_bytes if self.input_bytes else 0.0
+
+
+# (列标识, 表头, 排序/导出用的取值函数)
+COLUMNS = [
+    ("status", "状态", lambda r: r.success),
+    ("input", "输入", lambda r: r.input_path),
+    ("output", "输出", lambda r: r.output_path),
+    ("engine", "引擎", lambda r: r.engine),
+    ("decode_s", "解码(s)", lambda r: r.decode_s),
+    ("encode_s", "编码(s)", lambda r: r.encode_s),
+    ("elapsed_s", "总耗时(s)", lambda r: r.elapsed),
+    ("realtime_factor", "实时倍率", lambda r: r.realtime_factor),
+    ("input_bytes", "输入大小", lambda r: r.input_bytes),
+    ("output_bytes", "输出大小", lambda r: r.output_bytes),
+    ("size_ratio", "大小比", lambda r: r.size_ratio),
+    ("error", "错误", lambda r: r.error),
+]
+
+
+class ResultsModel(QAbstractTableModel):
+    """转换结果表模型"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows: List[JobResult] = []
+        self._sort_column = -1
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        self.headers = [title for _, title, _ in COLUMNS]
+
+    def add_events(self, events) -> int:
+        """追加一批事件中的任务结果，返回追加的行数"""
+        results = [r for r in map(JobResult.from_event, events) if r is not None]
+        if not results:
+            return 0
+        start = len(self._rows)
+        self.beginInsertRows(QModelIndex(), start, start + len(results) - 1)
+        self._rows.extend(results)
+        self.endInsertRows()
+        if self._sort_column >= 0:
+            self.sort(self._sort_column, self._sort_order)
+        return len(results)
+
+    def clear(self):
+        """清空结果"""
+        self.beginResetModel()
+        self._rows = []
+        self.endResetModel()
+
+    def results(self) -> List[JobResult]:
+        return list(self._rows)
+
+    def counts(self):
+        """返回 (成功数, 失败数)"""
+        succeeded = sum(1 for r in self._rows if r.success)
+        return succeeded, len(self._rows) - succeeded
+
+    def export_csv(self, path: str):
+        """导出为CSV（数值保留原始精度，便于用表格软件分析）"""
+        with open(path, "w", encoding="utf-8-sig", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow([key for key, _, _ in COLUMNS])
+            for row in self._rows:
+                values = [getter(row) for _, _, getter in COLUMNS]
+                values[0] = "ok" if row.success else "failed"
+                writer.writerow(values)
+
+    def set_headers(self, headers: List[str]):
+        """更新表头文字（切换语言时调用）"""
+        self.headers = list(headers)
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(headers) - 1)
+
+    # ---- Qt模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        if column < 0:
+            return
+        getter = COLUMNS[column][2]
+        self.layoutAboutToBeChanged.emit()
+        self._rows.sort(key=getter, reverse=order == Qt.SortOrder.DescendingOrder)
+        self.layoutChanged.emit()
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self._rows[index.row()]
+        key = COLUMNS[index.column()][0]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if key == "status":
+                return "✅" if row.success else "❌"
+            if key in ("input", "output"):
+                path = row.input_path if key == "input" else row.output_path
+                return Path(path).name if path else ""
+            if key in ("decode_s", "encode_s", "elapsed_s"):
+                return f"{COLUMNS[index.column()][2](row):.2f}"
+            if key == "realtime_factor":
+                return f"{row.realtime_factor:.1f}x" if row.success else ""
+            if key in ("input_bytes", "output_bytes"):
+                value = COLUMNS[index.column()][2](row)
+                return format_size(value) if value else ""
+            if key == "size_ratio":
+                return f"{row.size_ratio:.2f}" if row.success else ""
+            return COLUMNS[index.column()][2](row)
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if key == "input":
+                return row.input_path
+            if key == "output":
+                return row.output_path
+            if key == "error":
+                return row.error
+        return None
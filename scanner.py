@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入路径展开
+用一次 os.scandir 遍历代替按扩展名重复 glob，扩展名匹配不区分大小写；
+格式中包含 cue 时，文件夹中有效的 .cue 文件代替它引用的整轨镜像（转换时按 cue 分轨）；
+格式中包含 zip/tar 时，压缩包展开为其中音频文件的虚拟路径（"压缩包!/内部路径"，见 archive.py）；
+BackgroundScanner 在后台线程中展开，界面可以边扫描边显示结果
+"""
+
+import os
+import tarfile
+import threading
+import zipfile
+from typing import Iterable, Iterator, List, Optional
+
+from archive import (ARCHIVE_FORMATS, MEMBER_FORMATS, archive_format, is_member, list_members,
+                     split_member)
+
+
+def _normalize_formats(formats: Iterable[str]) -> frozenset:
+    return frozenset(f.lower().lstrip(".") for f in formats)
+
+
+def has_format(path: str, formats: Iterable[str]) -> bool:
+    """
+    文件扩展名是否属于指定格式（不区分大小写）
+    压缩包按 zip/tar 匹配，压缩包成员（展开时已按格式筛选）按所在压缩包匹配
+    """
+    if not isinstance(formats, frozenset):
+        formats = _normalize_formats(formats)
+    if is_member(path):
+        return archive_format(split_member(path)[0]) in formats
+    fmt = archive_format(path)
+    if fmt is not None:
+        return fmt in formats
+    return os.path.splitext(path)[1][1:].lower() in formats
+
+
+def _expand_archives(paths: Iterable[str], formats: frozenset) -> Iterator[str]:
+    """
+    压缩包替换为其中指定格式的音频文件（不含嵌套的压缩包和 cue，
+    只筛选了压缩包格式时为其中所有音频文件）；压缩包损坏时抛出 OSError
+    """
+    member_formats = (formats - set(ARCHIVE_FORMATS) - {"cue"}) or frozenset(MEMBER_FORMATS)
+    for path in paths:
+        if archive_format(path) is None:
+            yield path
+            continue
+        try:
+            members = list_members(path, member_formats)
+        except (zipfile.BadZipFile, tarfile.TarError) as e:
+            raise OSError(f"无法读取压缩包 {path}: {e}") from e
+        yield from members
+
+
+def iter_audio_files(folder: str, formats: Iterable[str]) -> Iterator[str]:
+    """遍历文件夹（不含子文件夹）中指定格式的文件"""
+    formats = _normalize_formats(formats)
+    if "cue" in formats:
+        # 需要先看到文件夹中所有的 cue 才知道哪些文件是镜像，不能边遍历边返回
+        files = _replace_cue_images(_scan(folder, formats))
+    else:
+        files = _scan(folder, formats)
+    yield from _expand_archives(files, formats)
+
+
+def _scan(folder: str, formats: frozenset) -> Iterator[str]:
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if entry.is_file() and has_format(entry.name, formats):
+                    yield entry.path
+            except OSError:
+                continue
+
+
+def _replace_cue_images(paths: Iterable[str]) -> List[str]:
+    """
+    去掉被 cue 引用的镜像文件；
+    无效的 cue（引用多个文件或镜像不存在）不作为输入，对应的文件照常转换
+    """
+    from cue import is_cue, referenced_image
+    paths = list(paths)
+    images = set()
+    cues = set()
+    for path in paths:
+        if is_cue(path):
+            image = referenced_image(path)
+            if image is not None:
+                images.add(os.path.normcase(os.path.abspath(image)))
+                cues.add(path)
+    return [path for path in paths
+            if path in cues or (not is_cue(path)
+                                and os.path.normcase(os.path.abspath(path)) not in images)]
+
+
+def expand_paths(paths: Iterable[str], formats: Iterable[str]) -> Iterator[str]:
+    """把文件和文件夹混合的输入展开为文件列表"""
+    formats = _normalize_formats(formats)
+    for path in paths:
+        if os.path.isdir(path):
+            yield from iter_audio_files(path, formats)
+        elif has_format(path, formats):
+            yield from _expand_archives([path], formats)
+
+
+class BackgroundScanner:
+    """
+    后台展开输入路径
+    扫描线程把找到的文件写入缓冲区，界面线程定期调用 take_new 取出新文件
+    """
+
+    def __init__(self, paths: List[str], formats: Iterable[str]):
+        self.paths = list(paths)
+        self.formats = _normalize_formats(formats)
+        self.folders: List[str] = []
+        self.errors: List[str] = []
+        self.found = 0
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._cancelled = False
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="selection-scanner", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for path in self.paths:
+                if self._cancelled:
+                    break
+                if os.path.isdir(path):
+                    self.folders.append(path)
+                    files = iter_audio_files(path, self.formats)
+                elif has_format(path, self.formats):
+                    files = _expand_archives([path], self.formats)
+                else:
+                    continue
+                try:
+                    for file_path in files:
+                        if self._cancelled:
+                            break
+                        with self._lock:
+                            self._pending.append(file_path)
+                            self.found += 1
+                except OSError as e:
+                    self.errors.append(f"{path}: {e}")
+        finally:
+            self._done.set()
+
+    def take_new(self) -> List[str]:
+        """取出上次调用以来新找到的文件"""
+        with self._lock:
+            pending, self._pending = self._pending, []
+        return pending
+
+    @property
+    def finished(self) -> bool:
+        """扫描是否已结束（包括被取消）"""
+        return self._done.is_set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """等待扫描结束"""
+        return self._done.wait(timeout)
+
+    def scanned_with(self, formats: Iterable[str]) -> bool:
+        """是否按这些格式展开（被 cue 引用的镜像是否保留、压缩包展开哪些成员都取决于格式）"""
+        return self.formats == _normalize_formats(formats)
+
+    def cancel(self):
+        """取消扫描"""
+        self._cancelled = True
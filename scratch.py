@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+临时文件目录（scratch）
+压缩包成员解压、cue 镜像解码和输出压缩包的暂存文件都在这里创建。
+默认使用系统临时目录；可以指定为本地盘或 tmpfs，并设置容量上限：
+每次创建临时目录前按预计大小预留容量，超出上限时等待其他任务释放，避免把 tmpfs 写满。
+单个预留超过上限时只要没有其他预留就放行，不会永远等待。
+协程中的预留按先后顺序排队，由 release 通过 call_soon_threadsafe 唤醒，不轮询
+"""
+
+import asyncio
+import os
+import tempfile
+import threading
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Deque, Optional
+
+# 临时目录名前缀
+PREFIX = "music-converter-"
+
+
+def _resolve(future: "asyncio.Future"):
+    if not future.done():
+        future.set_result(None)
+
+
+def wake_threadsafe(loop: asyncio.AbstractEventLoop, future: "asyncio.Future"):
+    """从任意线程唤醒在事件循环中等待的 future（已取消的忽略）"""
+    try:
+        loop.call_soon_threadsafe(_resolve, future)
+    except RuntimeError:
+        # 事件循环已关闭
+        pass
+
+
+class _AsyncWaiter:
+    """协程中等待的一个预留"""
+
+    __slots__ = ("loop", "future", "size", "granted")
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, size: int):
+        self.loop = loop
+        self.future = loop.create_future()
+        self.size = size
+        # 已由 release 代为预留
+        self.granted = False
+
+
+class ScratchSpace:
+    """临时文件目录和容量上限（线程和事件循环中都可以使用）"""
+
+    def __init__(self, root: Optional[str] = None, limit: Optional[int] = None):
+        """
+        Args:
+            root: 临时目录所在的目录，为None时使用系统临时目录
+            limit: 同时预留的最大字节数，为None时不限制
+        """
+        self.root = root
+        self.limit = limit
+        self._used = 0
+        self._condition = threading.Condition()
+        self._waiters: Deque[_AsyncWaiter] = deque()
+        if root:
+            os.makedirs(root, exist_ok=True)
+
+    @property
+    def used(self) -> int:
+        """当前预留的字节数"""
+        return self._used
+
+    def _fits(self, size: int) -> bool:
+        return self.limit is None or not self._used or self._used + size <= self.limit
+
+    def _try_reserve(self, size: int) -> bool:
+        with self._condition:
+            if not self._fits(size):
+                return False
+            self._used += size
+            return True
+
+    def _grant_waiters(self):
+        """按排队顺序为放得下的协程预留并唤醒它们（调用时持有 _condition）"""
+        while self._waiters and self._fits(self._waiters[0].size):
+            waiter = self._waiters.popleft()
+            self._used += waiter.size
+            waiter.granted = True
+            wake_threadsafe(waiter.loop, waiter.future)
+
+    def reserve(self, size: int):
+        """预留容量，超出上限时阻塞等待"""
+        with self._condition:
+            while not self._try_reserve(size):
+                self._condition.wait()
+
+    async def reserve_async(self, size: int):
+        """预留容量，超出上限时在事件循环中排队等待（不占用线程池，被取消时不会留下预留）"""
+        with self._condition:
+            # 已有协程排队时排在它们后面
+            if not self._waiters and self._fits(size):
+                self._used += size
+                return
+            waiter = _AsyncWaiter(asyncio.get_running_loop(), size)
+            self._waiters.append(waiter)
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._condition:
+                granted = waiter.granted
+                if not granted:
+                    self._waiters.remove(waiter)
+                    # 排在最前面的等待者离开后，后面的可能放得下
+                    self._grant_waiters()
+            if granted:
+                self.release(size)
+            raise
+
+    def charge(self, size: int):
+        """直接计入已经写出的文件（不能等待），之后的预留会等它释放"""
+        with self._condition:
+            self._used += size
+
+    def release(self, size: int):
+        with self._condition:
+            self._used -= size
+            self._grant_waiters()
+            self._condition.notify_all()
+
+    def mkdtemp(self, prefix: str = PREFIX) -> str:
+        """创建不预留容量的临时目录（调用方负责删除）"""
+        return tempfile.mkdtemp(prefix=prefix, dir=self.root)
+
+    @contextmanager
+    def directory(self, size: int = 0):
+        """预留 size 字节并创建临时目录，退出时删除目录并释放预留"""
+        self.reserve(size)
+        try:
+            with tempfile.TemporaryDirectory(prefix=PREFIX, dir=self.root) as folder:
+                yield folder
+        finally:
+            self.release(size)
+
+    @asynccontextmanager
+    async def directory_async(self, size: int = 0):
+        """directory 的协程版本"""
+        await self.reserve_async(size)
+        try:
+            with tempfile.TemporaryDirectory(prefix=PREFIX, dir=self.root) as folder:
+                yield folder
+        finally:
+            self.release(size)
+
+
+def wav_size(duration: Optional[float], frame_rate: int, channels: int, bits: int) -> int:
+    """解码为wav后的大约大小（字节），用于预留容量"""
+    return int((duration or 0.0) * frame_rate * channels * ((bits + 7) // 8)) + 4096
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+输入选择列表模型
+只保存路径字符串，文件名、格式和大小在视图请求某一行时才计算，
+行按批次懒加载，筛选和排序在模型内部完成，
+选择几万个文件时界面开销与选择数量基本无关
+"""
+
+import os
+import stat
+from typing import Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import Qt, QAbstractTableModel, QModelIndex
+
+
+def format_size(size: Optional[int]) -> str:
+    """格式化文件大小"""
+    if size is None:
+        return "-"
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+class SelectionModel(QAbstractTableModel):
+    """输入文件/文件夹列表模型"""
+
+    COLUMN_NAME, COLUMN_FORMAT, COLUMN_SIZE, COLUMN_LOCATION = range(4)
+    HEADERS = ["名称", "格式", "大小", "位置"]
+    # 每次向视图追加的行数
+    FETCH_BATCH = 500
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._paths: List[str] = []
+        # 当前显示（筛选排序后）的行对应的 _paths 下标
+        self._visible: List[int] = []
+        # 已交给视图的行数
+        self._loaded = 0
+        self._filter = ""
+        self._sort_column = -1
+        self._sort_order = Qt.SortOrder.AscendingOrder
+        # 路径 -> (是否文件夹, 文件大小)，只缓存被访问过的行
+        self._info: Dict[str, Tuple[bool, Optional[int]]] = {}
+
+    # ---- 选择内容 ----
+
+    def set_paths(self, paths: List[str]):
+        """替换全部选择"""
+        self.beginResetModel()
+        self._paths = list(paths)
+        self._info = {}
+        self._rebuild()
+        self.endResetModel()
+
+    def add_paths(self, paths: List[str]):
+        """追加选择"""
+        if not paths:
+            return
+        if self._filter or self._sort_column >= 0:
+            self.beginResetModel()
+            self._paths.extend(paths)
+            self._rebuild()
+            self.endResetModel()
+            return
+
+        # 没有筛选和排序时直接追加到末尾，保留视图的滚动位置（后台扫描时会频繁调用）
+        start = len(self._paths)
+        self._paths.extend(paths)
+        self._visible.extend(range(start, len(self._paths)))
+        count = min(len(self._visible), self.FETCH_BATCH) - self._loaded
+        if count > 0:
+            self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+            self._loaded += count
+            self.endInsertRows()
+
+    def clear(self):
+        """清空选择"""
+        self.set_paths([])
+
+    def paths(self) -> List[str]:
+        """全部已选择的路径（不受筛选影响）"""
+        return list(self._paths)
+
+    def count(self) -> int:
+        """已选择的数量"""
+        return len(self._paths)
+
+    def visible_count(self) -> int:
+        """筛选后的数量"""
+        return len(self._visible)
+
+    def path_at(self, row: int) -> str:
+        """视图中某一行对应的路径"""
+        return self._paths[self._visible[row]]
+
+    # ---- 筛选和排序 ----
+
+    def set_filter(self, text: str):
+        """按文件名筛选（不区分大小写）"""
+        text = text.strip().lower()
+        if text == self._filter:
+            return
+        self.beginResetModel()
+        self._filter = text
+        self._rebuild()
+        self.endResetModel()
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        """排序（视图点击表头时调用）"""
+        # 排序后重新从第一批开始懒加载，行数可能变化，因此整体重置
+        self.beginResetModel()
+        self._sort_column = column
+        self._sort_order = order
+        self._rebuild()
+        self.endResetModel()
+
+    def _sort_key(self, column: int):
+        if column == self.COLUMN_NAME:
+            return lambda i: os.path.basename(self._paths[i]).lower()
+        if column == self.COLUMN_FORMAT:
+            return lambda i: self._format(self._paths[i])
+        if column == self.COLUMN_SIZE:
+            # 按大小排序需要读取全部文件信息，只在用户主动点击时发生
+            return lambda i: self._stat(self._paths[i])[1] or 0
+        return lambda i: self._paths[i].lower()
+
+    def _rebuild(self):
+        """重新计算显示的行"""
+        if self._filter:
+            visible = [i for i, path in enumerate(self._paths)
+                       if self._filter in os.path.basename(path).lower()]
+        else:
+            visible = list(range(len(self._paths)))
+        if self._sort_column >= 0:
+            visible.sort(key=self._sort_key(self._sort_column),
+                         reverse=self._sort_order == Qt.SortOrder.DescendingOrder)
+        self._visible = visible
+        self._loaded = min(len(visible), self.FETCH_BATCH)
+
+    # ---- 行信息（按需计算） ----
+
+    @staticmethod
+    def _format(path: str) -> str:
+        return os.path.splitext(path)[1][1:].lower()
+
+    def _stat(self, path: str) -> Tuple[bool, Optional[int]]:
+        info = self._info.get(path)
+        if info is None:
+            try:
+                st = os.stat(path)
+                is_dir = stat.S_ISDIR(st.st_mode)
+                info = (is_dir, None if is_dir else st.st_size)
+            except OSError:
+                info = (False, None)
+            self._info[path] = info
+        return info
+
+    # ---- Qt模型接口 ----
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else self._loaded
+
+    def columnCount(self, parent=QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.HEADERS)
+
+    def canFetchMore(self, parent=QModelIndex()) -> bool:
+        return not parent.isValid() and self._loaded < len(self._visible)
+
+    def fetchMore(self, parent=QModelIndex()):
+        if parent.isValid():
+            return
+        count = min(self.FETCH_BATCH, len(self._visible) - self._loaded)
+        if count <= 0:
+            return
+        self.beginInsertRows(QModelIndex(), self._loaded, self._loaded + count - 1)
+        self._loaded += count
+        self.endInsertRows()
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.HEADERS[section]
+        return None
+
+    def set_headers(self, headers: List[str]):
+        """更新表头文字（切换语言时调用）"""
+        self.HEADERS = list(headers)
+        self.headerDataChanged.emit(Qt.Orientation.Horizontal, 0, len(headers) - 1)
+
+    def data(self, index: QModelIndex, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= self._loaded:
+            return None
+        path = self._paths[self._visible[index.row()]]
+        column = index.column()
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column == self.COLUMN_NAME:
+                return os.path.basename(path.rstrip("/\\")) or path
+            if column == self.COLUMN_FORMAT:
+                return "📁" if self._stat(path)[0] else self._format(path)
+            if column == self.COLUMN_SIZE:
+                return format_size(self._stat(path)[1])
+            if column == self.COLUMN_LOCATION:
+                return os.path.dirname(path)
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            return path
+        elif role == Qt.ItemDataRole.TextAlignmentRole and column == self.COLUMN_SIZE:
+            return int(Qt.AlignmentFlag.AlignRight | Qt.AlignmentFlag.AlignVCenter)
+        return None
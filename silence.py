@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+静音裁剪和拆分
+两个引擎共用：pydub 引擎用 pcm.PcmBuffer.detect_silence 在样本数组上一次算出所有静音区间，
+ffmpeg-async 引擎解析 silencedetect 滤镜的输出；
+再由 track_ranges 计算去掉首尾静音、按长静音拆分后的各音轨区间（秒）
+"""
+
+import re
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+# 检测的最短静音（秒），更短的停顿不算静音
+MIN_SILENCE = 0.1
+# 拆分后短于该时长的片段视为噪声丢弃（秒）
+MIN_TRACK = 0.5
+
+_SILENCE_START_RE = re.compile(r"silence_start:\s*(-?[\d.]+)")
+_SILENCE_END_RE = re.compile(r"silence_end:\s*(-?[\d.]+)")
+
+
+def silencedetect_filter(threshold_db: float) -> str:
+    """ffmpeg silencedetect 滤镜参数"""
+    return f"silencedetect=noise={threshold_db}dB:d={MIN_SILENCE}"
+
+
+def parse_silencedetect(log: str, duration: Optional[float]) -> List[Tuple[float, float]]:
+    """解析 silencedetect 的日志，返回静音区间列表（文件以静音结尾时补上结束时间）"""
+    silences = []
+    start = None
+    for line in log.splitlines():
+        match = _SILENCE_START_RE.search(line)
+        if match:
+            start = max(0.0, float(match.group(1)))
+            continue
+        match = _SILENCE_END_RE.search(line)
+        if match and start is not None:
+            silences.append((start, float(match.group(1))))
+            start = None
+    if start is not None and duration:
+        silences.append((start, duration))
+    return silences
+
+
+def track_ranges(silences: List[Tuple[float, float]], duration: float, trim: bool,
+                 split: bool, min_silence: float) -> List[Tuple[float, float]]:
+    """
+    由静音区间计算输出音轨
+    trim 去掉开头和结尾的静音；split 在不短于 min_silence 的静音处拆分（静音本身丢弃）。
+    整个文件都是静音时返回空列表
+    """
+    # 允许的误差：检测窗口和ffmpeg时间戳的精度
+    tolerance = 0.05
+    start, end = 0.0, duration
+    if trim and silences:
+        if silences[0][0] <= tolerance:
+            start = silences[0][1]
+        if silences[-1][1] >= duration - tolerance:
+            end = min(end, silences[-1][0])
+    if end - start <= 0:
+        return []
+
+    ranges = [(start, end)]
+    if split:
+        ranges = []
+        position = start
+        for silence_start, silence_end in silences:
+            if silence_end - silence_start < min_silence:
+                continue
+            if silence_start <= position or silence_end >= end:
+                # 开头/结尾的静音不作为拆分点
+                continue
+            ranges.append((position, silence_start))
+            position = silence_end
+        ranges.append((position, end))
+    return [(s, e) for s, e in ranges if e - s >= MIN_TRACK or len(ranges) == 1]
+
+
+def track_path(output_path: Path, index: int) -> Path:
+    """拆分后第 index 个音轨（从1开始）的输出路径"""
+    return output_path.with_name(f"{output_path.stem}_{index:02d}{output_path.suffix}")
@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+共享目录任务队列（spool）
+适用于只有共享存储（NFS/SMB）、无法运行协调节点服务的场景：
+任务以文件形式放在共享目录中，任意数量的转换进程通过原子重命名认领任务。
+被认领的任务文件就是租约，执行期间定期刷新它的修改时间；
+进程崩溃后租约过期，任务由其他进程收回并重新排队
+
+目录结构:
+    pending/  待处理任务  <批次>-<序号>.<已尝试次数>.json
+    claimed/  已认领任务  <批次>-<序号>.<已尝试次数>@<节点>.json（修改时间即租约时间）
+    results/  任务结果    <批次>-<序号>.ok.json / <批次>-<序号>.failed.json
+    tmp/      写入中的文件，写完后再重命名到目标目录
+
+任务输出先写到输出目录中本节点专用的临时目录（.spool-<任务标识>-*），
+转换完成后确认租约仍由本节点持有才改名为最终输出并发布结果；
+租约已被收回（例如本节点长时间停顿）的任务直接丢弃输出，由收回它的节点负责
+
+用法:
+    python cli.py /mnt/share/music -f mp3 -o /mnt/share/out --spool /mnt/share/spool   # 提交并参与转换
+    python cli.py --spool /mnt/share/spool                                            # 其他机器加入
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import socket
+import tempfile
+import threading
+import dataclasses
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import count
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import archive
+from events import (BatchFinished, ConversionFinished, JobFailed, JobFinished, Message,
+                    event_to_dict)
+from options import ConversionOptions
+
+# 租约有效期（秒），持有者每 1/4 有效期刷新一次
+LEASE_TIMEOUT = 60.0
+# 队列为空时的轮询间隔（秒）
+POLL_INTERVAL = 1.0
+
+
+def _parse_name(name: str) -> Tuple[str, int, str]:
+    """解析任务文件名，返回 (任务标识, 已尝试次数, 认领节点)"""
+    stem = name[:-len(".json")] if name.endswith(".json") else name
+    stem, _, owner = stem.partition("@")
+    key, _, attempt = stem.rpartition(".")
+    return key, int(attempt), owner
+
+
+def _is_empty(folder: Path) -> bool:
+    with os.scandir(folder) as entries:
+        return next(entries, None) is None
+
+
+class SpoolQueue:
+    """共享目录中的任务队列，所有操作都只依赖文件的原子重命名"""
+
+    def __init__(self, root: str, owner: Optional[str] = None,
+                 lease_timeout: float = LEASE_TIMEOUT, max_attempts: int = 3):
+        """
+        Args:
+            root: 队列目录（所有节点挂载的同一共享目录）
+            owner: 本节点名称（默认 主机名-进程号），不能包含 "@"
+            lease_timeout: 租约有效期（秒），超过该时间未刷新的任务会被收回
+            max_attempts: 单个任务因节点崩溃而重新分配的最大次数
+        """
+        self.root = Path(root)
+        self.owner = (owner or f"{socket.gethostname()}-{os.getpid()}").replace("@", "_")
+        self.lease_timeout = lease_timeout
+        self.max_attempts = max_attempts
+        self.pending_dir = self.root / "pending"
+        self.claimed_dir = self.root / "claimed"
+        self.results_dir = self.root / "results"
+        self.tmp_dir = self.root / "tmp"
+        for folder in (self.pending_dir, self.claimed_dir, self.results_dir, self.tmp_dir):
+            folder.mkdir(parents=True, exist_ok=True)
+        # 上次列出的待处理任务，依次尝试认领，用完再重新列目录
+        self._candidates = deque()
+
+    # ---- 提交 ----
+
+    def submit(self, files: List[str], output_format: str, output_dir: Optional[str] = None,
+               options: Optional[ConversionOptions] = None) -> int:
+        """把文件列表加入队列，返回加入的任务数"""
+        batch = uuid.uuid4().hex[:8]
+        options = (options or ConversionOptions()).to_dict()
+        for index, path in enumerate(files, 1):
+            job = {"job_id": index, "input_path": str(path), "output_format": output_format,
+                   "output_dir": output_dir, "options": options}
+            self._write_atomic(self.pending_dir / f"{batch}-{index:06d}.0.json", job)
+        return len(files)
+
+    def _write_atomic(self, path: Path, data: Dict):
+        """先写入 tmp/ 再重命名，其他节点不会读到写了一半的文件"""
+        tmp_path = self.tmp_dir / f"{path.name}.{self.owner}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    # ---- 认领和租约 ----
+
+    def claim(self) -> Optional[Dict]:
+        """认领一个待处理任务，队列为空时返回None"""
+        for _ in range(2):
+            if not self._candidates:
+                self._candidates.extend(sorted(
+                    name for name in os.listdir(self.pending_dir) if name.endswith(".json")
+                ))
+            while self._candidates:
+                name = self._candidates.popleft()
+                key, attempt, _ = _parse_name(name)
+                lease = self.claimed_dir / f"{key}.{attempt}@{self.owner}.json"
+                try:
+                    # 只有一个节点的重命名会成功
+                    os.rename(self.pending_dir / name, lease)
+                except FileNotFoundError:
+                    continue
+                # 重命名保留原修改时间，立即刷新，避免被当作过期租约
+                os.utime(lease)
+                try:
+                    with open(lease, encoding="utf-8") as f:
+                        job = json.load(f)
+                except (OSError, ValueError) as e:
+                    job = {"job_id": 0, "input_path": name, "error": f"任务文件损坏: {e}"}
+                job.update(key=key, attempt=attempt, lease=str(lease))
+                return job
+        return None
+
+    def renew(self, job: Dict) -> bool:
+        """刷新租约，租约已被收回时返回False"""
+        try:
+            os.utime(job["lease"])
+            return True
+        except FileNotFoundError:
+            return False
+
+    def release(self, job: Dict):
+        """放弃任务（例如用户中断），不计入尝试次数"""
+        try:
+            os.rename(job["lease"], self.pending_dir / f"{job['key']}.{job['attempt']}.json")
+        except FileNotFoundError:
+            pass
+
+    def complete(self, job: Dict, event):
+        """发布任务结果并释放租约"""
+        status = "ok" if isinstance(event, JobFinished) else "failed"
+        self._write_atomic(self.results_dir / f"{job['key']}.{status}.json", {
+            "owner": self.owner, "attempt": job["attempt"], "event": event_to_dict(event),
+        })
+        try:
+            os.unlink(job["lease"])
+        except FileNotFoundError:
+            pass
+
+    def _has_result(self, key: str) -> bool:
+        return any((self.results_dir / f"{key}.{status}.json").exists()
+                   for status in ("ok", "failed"))
+
+    def _now(self) -> float:
+        """
+        共享存储上的当前时间
+        刷新一个本节点专用文件并读取它的修改时间，与租约文件使用同一时钟，
+        不受各节点本地时钟偏差影响
+        """
+        clock = self.tmp_dir / f".clock-{self.owner}"
+        clock.touch()
+        return clock.stat().st_mtime
+
+    def close(self):
+        """删除本节点的时钟文件"""
+        try:
+            os.unlink(self.tmp_dir / f".clock-{self.owner}")
+        except FileNotFoundError:
+            pass
+
+    def reclaim_expired(self) -> List[Tuple[str, str]]:
+        """收回过期租约，返回 (任务标识, 原认领节点) 列表"""
+        now = self._now()
+        reclaimed = []
+        for name in os.listdir(self.claimed_dir):
+            lease = self.claimed_dir / name
+            try:
+                if now - lease.stat().st_mtime < self.lease_timeout:
+                    continue
+                key, attempt, owner = _parse_name(name)
+            except (OSError, ValueError):
+                continue
+
+            if self._has_result(key):
+                # 结果已发布，只是租约没来得及删除
+                try:
+                    os.unlink(lease)
+                except FileNotFoundError:
+                    pass
+                continue
+
+            if attempt + 1 < self.max_attempts:
+                target = self.pending_dir / f"{key}.{attempt + 1}.json"
+            else:
+                target = self.tmp_dir / f"{name}.{self.owner}.reclaim"
+            try:
+                # 与认领相同，多个节点同时收回时只有一个成功
+                os.rename(lease, target)
+            except FileNotFoundError:
+                continue
+            if target.parent == self.tmp_dir:
+                self._give_up(key, attempt + 1, target)
+            reclaimed.append((key, owner))
+        return reclaimed
+
+    def _give_up(self, key: str, attempts: int, path: Path):
+        """多次分配都没有完成的任务记为失败"""
+        try:
+            with open(path, encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            job = {"job_id": 0, "input_path": key}
+        event = JobFailed(job["job_id"], job["input_path"],
+                          f"任务 {attempts} 次认领后节点均未完成，放弃: "
+                          f"{Path(job['input_path']).name}")
+        self.complete({"key": key, "attempt": attempts, "lease": str(path)}, event)
+
+    # ---- 状态 ----
+
+    def status(self) -> Dict[str, int]:
+        """各状态的任务数"""
+        results = os.listdir(self.results_dir)
+        return {
+            "pending": len(os.listdir(self.pending_dir)),
+            "claimed": len(os.listdir(self.claimed_dir)),
+            "succeeded": sum(1 for name in results if name.endswith(".ok.json")),
+            "failed": sum(1 for name in results if name.endswith(".failed.json")),
+        }
+
+    def is_drained(self) -> bool:
+        """没有待处理和执行中的任务"""
+        return (not self._candidates and _is_empty(self.pending_dir)
+                and _is_empty(self.claimed_dir))
+
+
+class SpoolWorker:
+    """
+    从队列认领任务并用本机转换引擎执行
+    任务事件从 converter.events 发出，与本机转换相同；队列处理完后发出 BatchFinished 和
+    ConversionFinished（total 为本节点完成的任务数）
+    """
+
+    def __init__(self, queue: SpoolQueue, converter, poll_interval: float = POLL_INTERVAL):
+        self.queue = queue
+        self.converter = converter
+        self.poll_interval = poll_interval
+        self.succeeded = 0
+        self.failed = 0
+        self._stopped = False
+        # 本地任务编号：不同批次的序号可能重复，事件中使用本节点分配的编号
+        self._job_ids = count(1)
+        self._results: Dict[int, object] = {}
+        self._results_lock = threading.Lock()
+        converter.events.subscribe(self._capture)
+
+    def _capture(self, event):
+        if isinstance(event, (JobFinished, JobFailed)):
+            with self._results_lock:
+                self._results[event.job_id] = event
+
+    def _run_job(self, job: Dict):
+        """执行一个任务，租约仍由本节点持有时发布输出和结果"""
+        job_id = next(self._job_ids)
+        staging = None
+        if job.get("error"):
+            event = JobFailed(job_id, job["input_path"], job["error"])
+            self.converter.events.emit(event)
+        else:
+            input_path = job["input_path"]
+            # 未指定输出目录时输出在输入文件（压缩包成员为压缩包）旁边
+            output_dir = job.get("output_dir") or os.path.dirname(os.path.abspath(
+                archive.split_member(input_path)[0] if archive.is_member(input_path)
+                else input_path))
+            try:
+                Path(output_dir).mkdir(parents=True, exist_ok=True)
+                staging = tempfile.mkdtemp(prefix=f".spool-{job['key']}-", dir=output_dir)
+                self.converter.convert_single_file(
+                    input_path, job["output_format"], staging, job_id,
+                    options=ConversionOptions.from_dict(job.get("options")))
+            except Exception as e:
+                # 转换器内部已处理常见错误，这里兜底，保证任务有结果
+                self.converter.events.emit(
+                    JobFailed(job_id, input_path, f"转换异常: {e}"))
+            with self._results_lock:
+                event = self._results.pop(job_id, None)
+
+        try:
+            if self._stopped and not isinstance(event, JobFinished):
+                # 被用户中断的任务放回队列，由其他节点继续
+                self.queue.release(job)
+                return
+            if job.get("lost") or not self.queue.renew(job):
+                # 租约已被其他节点收回，输出和结果都交给那个节点
+                self.converter.events.emit(Message(
+                    "warning", f"任务 {job['key']} 的租约已被其他节点收回，丢弃本节点的输出"))
+                return
+            if event is None:
+                event = JobFailed(job_id, job["input_path"], "转换未返回结果")
+            elif isinstance(event, JobFinished):
+                event = self._publish(event, staging, output_dir)
+            self.queue.complete(job, event)
+        finally:
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+        if isinstance(event, JobFinished):
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    @staticmethod
+    def _publish(event: JobFinished, staging: str, output_dir: str):
+        """把临时目录中的输出改名到最终位置（相对位置不变），返回对应最终路径的事件"""
+        source = os.path.abspath(event.input_path)
+        moved = []
+        try:
+            for path in event.outputs or (event.output_path,):
+                target = os.path.join(output_dir, os.path.relpath(path, staging))
+                if os.path.abspath(target) == source:
+                    # 与 _output_path 相同，避免覆盖原文件
+                    stem, suffix = os.path.splitext(target)
+                    target = f"{stem}_converted{suffix}"
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                os.replace(path, target)
+                moved.append(target)
+        except OSError as e:
+            return JobFailed(event.job_id, event.input_path, f"发布输出失败: {e}")
+        return dataclasses.replace(event, output_path=moved[0],
+                                   outputs=tuple(moved) if event.outputs else ())
+
+    def run(self) -> bool:
+        """处理任务直到队列为空或被停止，返回本节点是否没有失败的任务"""
+        start = time.perf_counter()
+        slots = self.converter.max_workers
+        renew_interval = self.queue.lease_timeout / 4
+        active: Dict[object, Dict] = {}
+        last_renew = last_reclaim = 0.0
+        emit = self.converter.events.emit
+        emit(Message("info", f"已加入任务队列 {self.queue.root}（节点 {self.queue.owner}，"
+                             f"{slots} 个并发）"))
+
+        with ThreadPoolExecutor(max_workers=slots) as executor:
+            while not self._stopped:
+                now = time.monotonic()
+                if now - last_reclaim >= self.queue.lease_timeout / 2:
+                    last_reclaim = now
+                    for key, owner in self.queue.reclaim_expired():
+                        emit(Message("warning", f"节点 {owner} 的任务 {key} 租约过期，已收回"))
+                if now - last_renew >= renew_interval:
+                    last_renew = now
+                    for job in active.values():
+                        if not job.get("lost") and not self.queue.renew(job):
+                            # 任务继续运行到结束，但不会发布输出和结果（见 _run_job）
+                            job["lost"] = True
+                            emit(Message("warning", f"任务 {job['key']} 的租约已被其他节点收回"))
+
+                while len(active) < slots and not self._stopped:
+                    job = self.queue.claim()
+                    if job is None:
+                        break
+                    active[executor.submit(self._run_job, job)] = job
+
+                if active:
+                    done, _ = wait(list(active), timeout=self.poll_interval,
+                                   return_when=FIRST_COMPLETED)
+                    for future in done:
+                        active.pop(future)
+                elif self.queue.is_drained():
+                    break
+                else:
+                    # 其他节点仍在执行，等待它们完成或租约过期
+                    time.sleep(self.poll_interval)
+
+            for future in list(active):
+                future.result()
+        self.queue.close()
+        archive.close_readers()
+
+        total = self.succeeded + self.failed
+        emit(BatchFinished(total, self.succeeded, self.failed, time.perf_counter() - start))
+        emit(ConversionFinished(self.failed == 0))
+        return self.failed == 0
+
+    def stop(self):
+        """停止认领新任务，正在执行的任务被中断后放回队列"""
+        self._stopped = True
+        self.converter.stop_conversion()
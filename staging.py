@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地暂存（SMB共享、U盘等慢速存储）
+直接在慢速存储上转换时，解码和编码的小块随机读写都要经过慢速链路。暂存模式下：
+下载线程按任务顺序用大块顺序读把输入复制到本地临时目录（scratch），与转换流水线并行；
+转换只读写本地文件；上传线程把完成的输出用大块顺序写写回目标位置（先写 "路径.part" 再改名）。
+本地占用的空间受 ScratchSpace 容量上限控制：下载等待已完成的任务删除输入、上传删除输出后继续；
+同时保留在本地的输入数也有上限（depth），没有设置容量上限时下载也不会把整批文件都复制过来。
+下载和上传共用可选的带宽上限。
+cue 连同引用的镜像一起复制；压缩包成员直接从压缩包读取，不暂存
+"""
+
+import asyncio
+import os
+import queue
+import shutil
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+import archive
+from cue import is_cue, parse_cue
+from scratch import ScratchSpace, wake_threadsafe
+
+# 复制时每次读写的大小（大块顺序读写）
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# 默认同时保留在本地的输入数
+DEFAULT_DEPTH = 8
+
+
+class Throttle:
+    """带宽限制（多个线程共用）：每块数据按顺序占用链路 size/rate 秒"""
+
+    def __init__(self, rate: Optional[float] = None):
+        """rate: 字节/秒，为None时不限制"""
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._free_at = 0.0
+
+    def consume(self, size: int):
+        """传输 size 字节之前调用，超出带宽时等待"""
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._free_at)
+            self._free_at = start + size / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class _Entry:
+    """一个暂存的输入"""
+
+    __slots__ = ("source", "local", "files", "size", "error", "done", "counted", "ready",
+                 "waiters")
+
+    def __init__(self, source: str, local: str):
+        self.source = source
+        self.local = local
+        # 本地副本 [(源文件, 本地文件)]，下载后确定
+        self.files: List[Tuple[str, str]] = []
+        self.size = 0
+        self.error: Optional[str] = None
+        # 任务已经结束（本地副本可以删除）
+        self.done = False
+        # 计入了本地输入数（删除副本时减去）
+        self.counted = False
+        self.ready = threading.Event()
+        # 等待复制完成的协程 [(事件循环, future)]
+        self.waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+
+
+class StagingArea:
+    """一次批量转换的本地暂存目录、下载线程和上传线程"""
+
+    def __init__(self, scratch: ScratchSpace, bandwidth: Optional[float] = None,
+                 depth: int = DEFAULT_DEPTH):
+        """
+        Args:
+            scratch: 本地临时目录和容量上限
+            bandwidth: 下载和上传共用的带宽上限（字节/秒），为None时不限制
+            depth: 同时保留在本地的输入数上限（正在转换的和已复制等待转换的）
+        """
+        self.scratch = scratch
+        self.throttle = Throttle(bandwidth)
+        self.depth = max(1, depth)
+        self.root = scratch.mkdtemp(prefix="music-converter-stage-")
+        # 指定了输出目录时的本地输出目录
+        self.output_dir = os.path.join(self.root, "out")
+        self.uploaded = 0
+        self.errors: List[str] = []
+        self._entries: Dict[str, _Entry] = {}
+        self._order: List[_Entry] = []
+        self._condition = threading.Condition()
+        # 已复制到本地、任务还没有结束的输入数
+        self._resident = 0
+        self._closed = False
+        self._uploads: "queue.Queue[Optional[Tuple[str, str, int]]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+
+    def add(self, path: str) -> str:
+        """登记一个输入，返回转换时使用的本地路径（不暂存的返回原路径）"""
+        if archive.is_member(path):
+            return path
+        folder = os.path.join(self.root, "in", str(len(self._order)))
+        entry = _Entry(path, os.path.join(folder, os.path.basename(path)))
+        self._entries[entry.local] = entry
+        self._order.append(entry)
+        return entry.local
+
+    def source(self, path: str) -> str:
+        """本地路径对应的原始路径（不是暂存的路径时原样返回）"""
+        entry = self._entries.get(path)
+        return entry.source if entry else path
+
+    def is_staged(self, path: str) -> bool:
+        return path in self._entries
+
+    def start(self):
+        """启动下载和上传线程"""
+        for target, name in ((self._download_all, "stage-download"),
+                             (self._upload_all, "stage-upload")):
+            thread = threading.Thread(target=target, name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    # ---- 下载 ----
+
+    def wait(self, path: str) -> Optional[str]:
+        """等待输入复制到本地，复制失败时返回错误信息"""
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        entry.ready.wait()
+        return entry.error
+
+    async def wait_async(self, path: str) -> Optional[str]:
+        """wait 的协程版本（不占用线程池，复制结束时由下载线程唤醒）"""
+        entry = self._entries.get(path)
+        if entry is None:
+            return None
+        with self._condition:
+            if entry.ready.is_set():
+                return entry.error
+            future = asyncio.get_running_loop().create_future()
+            entry.waiters.append((future.get_loop(), future))
+        await future
+        return entry.error
+
+    def _set_ready(self, entry: _Entry):
+        """复制结束（或不再复制），唤醒等待的线程和协程"""
+        with self._condition:
+            entry.ready.set()
+            waiters, entry.waiters = entry.waiters, []
+        for loop, future in waiters:
+            wake_threadsafe(loop, future)
+
+    @staticmethod
+    def _files(entry: _Entry) -> List[Tuple[str, str]]:
+        """需要复制的文件：cue 还要复制其目录下引用的镜像（保持相对位置）"""
+        files = [(entry.source, entry.local)]
+        if is_cue(entry.source):
+            try:
+                image = parse_cue(entry.source).image_path
+            except (OSError, ValueError):
+                image = None
+            if image:
+                relative = os.path.relpath(image, os.path.dirname(entry.source))
+                if not relative.startswith(os.pardir):
+                    files.append((image, os.path.join(os.path.dirname(entry.local), relative)))
+        return files
+
+    def _copy(self, source: str, target: str):
+        """大块顺序复制，写到 "目标.part" 后改名"""
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        partial = target + ".part"
+        with open(source, "rb") as src, open(partial, "wb") as dst:
+            while True:
+                chunk = src.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                self.throttle.consume(len(chunk))
+                dst.write(chunk)
+        os.replace(partial, target)
+
+    def _download_all(self):
+        for entry in self._order:
+            if self._closed:
+                entry.error = "暂存已停止"
+                self._set_ready(entry)
+                continue
+            if entry.done:
+                # 任务在复制之前已经结束（例如被取消）
+                self._set_ready(entry)
+                continue
+            with self._condition:
+                # 本地输入数已达上限时等待任务结束
+                while self._resident >= self.depth and not (entry.done or self._closed):
+                    self._condition.wait()
+                if entry.done or self._closed:
+                    entry.error = None if entry.done else "暂存已停止"
+                    self._set_ready(entry)
+                    continue
+                self._resident += 1
+                entry.counted = True
+            try:
+                files = self._files(entry)
+                size = sum(os.path.getsize(source) for source, _ in files)
+                # 本地空间不足时等待已完成的任务释放
+                self.scratch.reserve(size)
+                with self._condition:
+                    entry.files, entry.size = files, size
+                for source, local in files:
+                    self._copy(source, local)
+            except OSError as e:
+                entry.error = f"复制到本地失败: {os.path.basename(entry.source)}: {e}"
+            self._set_ready(entry)
+            with self._condition:
+                if entry.done:
+                    self._discard(entry)
+
+    def finished(self, path: str):
+        """任务结束（完成事件已发出，校验也已结束），删除本地输入副本并释放空间"""
+        entry = self._entries.get(path)
+        if entry is None:
+            return
+        with self._condition:
+            entry.done = True
+            if entry.ready.is_set():
+                self._discard(entry)
+            self._condition.notify_all()
+
+    def _discard(self, entry: _Entry):
+        """删除本地副本（调用时持有 _condition，同一个输入只计数一次）"""
+        if entry.counted:
+            entry.counted = False
+            self._resident -= 1
+            self._condition.notify_all()
+        for _, local in entry.files:
+            try:
+                os.remove(local)
+            except OSError:
+                pass
+        if entry.size:
+            self.scratch.release(entry.size)
+        entry.files, entry.size = [], 0
+
+    # ---- 上传 ----
+
+    def upload(self, local: str, target: str):
+        """把本地输出文件提交给上传线程，写回后删除本地文件"""
+        try:
+            size = os.path.getsize(local)
+        except OSError as e:
+            self.errors.append(f"{os.path.basename(local)}: {e}")
+            return
+        # 等待上传的输出也占用本地空间，下载会等它写回
+        self.scratch.charge(size)
+        self._uploads.put((local, target, size))
+
+    def _upload_all(self):
+        while True:
+            item = self._uploads.get()
+            if item is None:
+                break
+            local, target, size = item
+            try:
+                self._copy(local, target)
+                self.uploaded += 1
+            except OSError as e:
+                self.errors.append(f"{target}: {e}")
+                try:
+                    os.remove(target + ".part")
+                except OSError:
+                    pass
+            finally:
+                try:
+                    os.remove(local)
+                except OSError:
+                    pass
+                self.scratch.release(size)
+
+    def close(self) -> List[str]:
+        """等待上传全部写回，删除暂存目录，返回写回失败的信息"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._uploads.put(None)
+        for thread in self._threads:
+            thread.join()
+        shutil.rmtree(self.root, ignore_errors=True)
+        return self.errors
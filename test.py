@@ -57,6 +57,957 @@ def test_converter_class():
         print(f"❌ 转换器测试失败: {e}")
         return False
 
+def test_tracing():
+    """测试阶段计时导出"""
+    print("\n🔍 测试阶段计时...")
+    try:
+        import asyncio
+        import json
+        import tempfile
+        import time
+        from tracing import Tracer
+        
+        tracer = Tracer()
+        
+        async def job(job_id):
+            # 两个任务在同一个事件循环线程中同时运行
+            start = time.perf_counter_ns()
+            with tracer.span("transcode", job_id):
+                await asyncio.sleep(0.02)
+            tracer.record("job", start, time.perf_counter_ns(), job_id, file=f"{job_id}.wav")
+        
+        async def main():
+            await asyncio.gather(job(1), job(2))
+        
+        asyncio.run(main())
+        with tracer.span("decode", 3):
+            pass
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "trace.json")
+            tracer.export_chrome_trace(path)
+            with open(path, encoding="utf-8") as f:
+                events = json.load(f)["traceEvents"]
+        names = {event["tid"]: event["args"]["name"] for event in events if event["ph"] == "M"}
+        tracks = {}
+        for event in events:
+            if event["ph"] == "X":
+                tracks.setdefault(event["args"]["job_id"], set()).add(event["tid"])
+        # 协程中的阶段按任务分轨，线程中的阶段仍在线程轨道上
+        passed = (len(tracks[1]) == 1 and len(tracks[2]) == 1 and tracks[1] != tracks[2]
+                  and names[next(iter(tracks[1]))] == "job 1 1.wav"
+                  and names[next(iter(tracks[3]))] == "MainThread")
+        print(f"{'✅' if passed else '❌'} trace 轨道: {sorted(names.values())}")
+        return passed
+        
+    except Exception as e:
+        print(f"❌ 阶段计时测试失败: {e}")
+        return False
+
+def test_event_coalescing():
+    """测试事件合并"""
+    print("\n🔍 测试事件合并...")
+    try:
+        from events import EventCoalescer, JobProgress, JobFinished, BatchProgress
+        
+        coalescer = EventCoalescer()
+        for percent in (0, 50, 100):
+            coalescer.push(JobProgress(1, "a.wav", percent, "encode"))
+        coalescer.push(JobFinished(1, "a.wav", "a.mp3", 10, 5, 1.0, 0.1))
+        for completed in range(1, 4):
+            coalescer.push(BatchProgress(completed, 3, completed, 0))
+        
+        events = coalescer.drain()
+        ok = (len(events) == 3 and events[0].percent == 100
+              and isinstance(events[1], JobFinished) and events[2].completed == 3
+              and coalescer.drain() == [])
+        print(f"{'✅' if ok else '❌'} 合并后事件数: {len(events)}")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 事件合并测试失败: {e}")
+        return False
+
+def test_async_cancel():
+    """测试asyncio引擎取消转换"""
+    print("\n🔍 测试asyncio引擎取消...")
+    if os.name == "nt":
+        print("⚠️ 需要可执行脚本代替ffmpeg，Windows下跳过")
+        return True
+    try:
+        import tempfile
+        import threading
+        import time
+        from async_engine import AsyncFFmpegConverter
+        from events import JobFailed, JobStarted
+        
+        with tempfile.TemporaryDirectory() as folder:
+            # 一直不结束的"ffmpeg"，只能被取消结束
+            ffmpeg = os.path.join(folder, "ffmpeg")
+            with open(ffmpeg, "w") as f:
+                f.write(f"#!{sys.executable}\nimport time\ntime.sleep(60)\n")
+            os.chmod(ffmpeg, 0o755)
+            files = []
+            for name in ("a.wav", "b.wav", "c.wav"):
+                path = os.path.join(folder, name)
+                with open(path, "wb") as f:
+                    f.write(bytes(1000))
+                files.append(Path(path))
+            
+            converter = AsyncFFmpegConverter(max_workers=3, ffmpeg_path=ffmpeg, job_timeout=None)
+            events = []
+            converter.events.subscribe(events.append)
+            results = {}
+            # 批量转换和单文件转换同时进行（例如队列工作节点），停止时都要取消
+            threads = [
+                threading.Thread(target=lambda: results.update(
+                    batch=converter._convert_files(files[:2], "mp3", folder)), daemon=True),
+                threading.Thread(target=lambda: results.update(
+                    single=converter.convert_single_file(str(files[2]), "mp3", folder)),
+                    daemon=True),
+            ]
+            for thread in threads:
+                thread.start()
+            deadline = time.monotonic() + 10
+            while (sum(isinstance(event, JobStarted) for event in events) < 3
+                   and time.monotonic() < deadline):
+                time.sleep(0.05)
+            running = len(converter._active_tasks)
+            start = time.monotonic()
+            converter.stop_conversion()
+            for thread in threads:
+                thread.join(10)
+            elapsed = time.monotonic() - start
+            failed = sorted(Path(event.input_path).name for event in events
+                            if isinstance(event, JobFailed))
+            passed = (running == 2 and not any(thread.is_alive() for thread in threads)
+                      and results == {"batch": 0, "single": False}
+                      and failed == ["a.wav", "b.wav", "c.wav"]
+                      and not converter._active_tasks and elapsed < 10)
+            converter.close()
+            print(f"{'✅' if passed else '❌'} 停止后所有任务结束（{elapsed:.2f}秒）: {failed}")
+        return passed
+        
+    except Exception as e:
+        print(f"❌ asyncio引擎取消测试失败: {e}")
+        return False
+
+def test_spool():
+    """测试共享目录队列的租约"""
+    print("\n🔍 测试共享目录队列...")
+    try:
+        import json
+        import tempfile
+        import time
+        from events import EventBus, JobFinished, Message
+        from spool import SpoolQueue, SpoolWorker
+        
+        def backdate(path):
+            old = time.time() - 600
+            os.utime(path, (old, old))
+        
+        ok = True
+        with tempfile.TemporaryDirectory() as folder:
+            # 租约过期后带着加一的尝试次数回到 pending/，达到上限后记为失败
+            queue = SpoolQueue(os.path.join(folder, "spool"), owner="crashed", max_attempts=2)
+            queue.submit(["/music/a.wav"], "mp3")
+            job = queue.claim()
+            backdate(job["lease"])
+            reclaimed = queue.reclaim_expired()
+            pending = os.listdir(queue.pending_dir)
+            passed = (reclaimed == [(job["key"], "crashed")] and job["attempt"] == 0
+                      and pending == [f"{job['key']}.1.json"] and not os.listdir(queue.claimed_dir))
+            
+            job = queue.claim()
+            backdate(job["lease"])
+            queue.reclaim_expired()
+            result_path = queue.results_dir / f"{job['key']}.failed.json"
+            with open(result_path, encoding="utf-8") as f:
+                result = json.load(f)
+            passed = (passed and job["attempt"] == 1 and result["attempt"] == 2
+                      and result["event"]["input_path"] == "/music/a.wav"
+                      and queue.status() == {"pending": 0, "claimed": 0,
+                                             "succeeded": 0, "failed": 1})
+            queue.close()
+            ok = passed
+            print(f"{'✅' if passed else '❌'} 过期租约重新排队，达到最大次数后放弃")
+            
+            class FakeConverter:
+                """把输出写到指定目录的转换器；lose_lease 模拟转换期间租约被其他节点收回"""
+                max_workers = 1
+                
+                def __init__(self, lose_lease):
+                    self.events = EventBus()
+                    self.lose_lease = lose_lease
+                
+                def convert_single_file(self, input_path, output_format, output_dir, job_id,
+                                        options=None):
+                    output = os.path.join(output_dir, f"{Path(input_path).stem}.{output_format}")
+                    with open(output, "wb") as f:
+                        f.write(b"data")
+                    if self.lose_lease:
+                        backdate(current["lease"])
+                        other.reclaim_expired()
+                    self.events.emit(JobFinished(job_id, input_path, output, 4, 4, 1.0, 0.1))
+                    return True
+            
+            output_dir = os.path.join(folder, "out")
+            for lose_lease in (True, False):
+                root = os.path.join(folder, f"spool-{lose_lease}")
+                queue = SpoolQueue(root, owner="slow")
+                other = SpoolQueue(root, owner="other")
+                queue.submit([os.path.join(folder, "b.wav")], "mp3", output_dir)
+                current = queue.claim()
+                worker = SpoolWorker(queue, FakeConverter(lose_lease))
+                messages = []
+                worker.converter.events.subscribe(
+                    lambda event: isinstance(event, Message) and messages.append(event.text))
+                worker._run_job(current)
+                published = os.path.exists(os.path.join(output_dir, "b.mp3"))
+                leftovers = [name for name in os.listdir(output_dir) if name.startswith(".spool-")]
+                status = queue.status()
+                if lose_lease:
+                    # 丢弃输出，不发布结果，任务由收回它的节点重新执行
+                    passed = (not published and status["pending"] == 1
+                              and status["succeeded"] == 0 and worker.succeeded == 0
+                              and any("租约" in text for text in messages))
+                else:
+                    passed = published and status["succeeded"] == 1 and worker.succeeded == 1
+                passed = passed and not leftovers
+                ok = ok and passed
+                print(f"{'✅' if passed else '❌'} {'租约被收回时丢弃输出' if lose_lease else '租约有效时发布输出'}")
+                queue.close()
+                other.close()
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 共享目录队列测试失败: {e}")
+        return False
+
+def test_format_options():
+    """测试采样率、声道和位深转换参数"""
+    print("\n🔍 测试格式转换参数...")
+    try:
+        import subprocess
+        import tempfile
+        import wave
+        import wavfile
+        from converter import OUTPUT_CODEC_ARGS, _HIGH_QUALITY_SWR, codec_args, format_filter
+        from ffmpeg_config import get_ffmpeg_path
+        from options import ConversionOptions
+        
+        ffmpeg = get_ffmpeg_path()
+        checks = [
+            format_filter(ConversionOptions(), ffmpeg) is None,
+            format_filter(ConversionOptions(sample_rate=48000, resampler="fast"), ffmpeg)
+            == "aresample=osr=48000:filter_size=8:phase_shift=6",
+            format_filter(ConversionOptions(sample_rate=48000), ffmpeg) == "aresample=osr=48000",
+            # 只改声道和位深时不加重采样参数，降低位深加抖动
+            format_filter(ConversionOptions(channels=1, bit_depth=16, resampler="fast"), ffmpeg)
+            == "aresample=ochl=mono:osf=s16:dither_method=triangular",
+            # 没有 libsoxr 的ffmpeg使用 swr 的高质量参数
+            format_filter(ConversionOptions(sample_rate=44100, resampler="high"),
+                          os.path.join("missing", "ffmpeg"))
+            == f"aresample=osr=44100:{_HIGH_QUALITY_SWR}",
+        ]
+        ok = all(checks)
+        print(f"{'✅' if ok else '❌'} aresample 滤镜: {checks}")
+        
+        checks = [
+            codec_args("wav", 24) == ["-c:a", "pcm_s24le"],
+            codec_args("flac", 24) == ["-c:a", "flac", "-sample_fmt", "s32",
+                                       "-bits_per_raw_sample", "24"],
+            codec_args("flac", 16) == ["-c:a", "flac", "-sample_fmt", "s16"],
+            # 有损格式忽略位深
+            codec_args("mp3", 24) == OUTPUT_CODEC_ARGS["mp3"],
+            codec_args("wav") == OUTPUT_CODEC_ARGS["wav"],
+        ]
+        passed = all(checks)
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} 编码参数: {checks}")
+        
+        # 实际编码：44.1kHz 立体声 16位 -> 48kHz 单声道 24位
+        options = ConversionOptions(sample_rate=48000, channels=1, bit_depth=24)
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, "in.wav")
+            with wave.open(source, "wb") as w:
+                w.setnchannels(2)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes(bytes(44100 * 4))
+            output = os.path.join(folder, "out.wav")
+            result = subprocess.run([ffmpeg, "-hide_banner", "-nostdin", "-y", "-i", source,
+                                     "-af", format_filter(options, ffmpeg),
+                                     *codec_args("wav", options.bit_depth), output],
+                                    capture_output=True)
+            info = wavfile.read_info(output) if result.returncode == 0 else None
+            passed = (info is not None and info.frame_rate == 48000 and info.channels == 1
+                      and info.bits == 24 and abs(info.duration_seconds - 1.0) < 0.01)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} ffmpeg 输出 48kHz 单声道 24位")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 格式转换参数测试失败: {e}")
+        return False
+
+def test_output_verifier():
+    """测试输出校验"""
+    print("\n🔍 测试输出校验...")
+    try:
+        import math
+        import shutil
+        import struct
+        import subprocess
+        import tempfile
+        import wave
+        from ffmpeg_config import get_ffmpeg_path
+        from options import ConversionOptions
+        from verify import OutputVerifier
+        
+        ffmpeg = get_ffmpeg_path()
+        verifier = OutputVerifier(ffmpeg)
+        options = ConversionOptions(verify=True)
+        with tempfile.TemporaryDirectory() as folder:
+            source = os.path.join(folder, "in.wav")
+            with wave.open(source, "wb") as w:
+                w.setnchannels(1)
+                w.setsampwidth(2)
+                w.setframerate(44100)
+                w.writeframes(b"".join(struct.pack("<h", int(10000 * math.sin(i / 10)))
+                                       for i in range(2 * 44100)))
+            good = os.path.join(folder, "good.flac")
+            subprocess.run([ffmpeg, "-hide_banner", "-nostdin", "-y", "-i", source,
+                            "-c:a", "flac", good], capture_output=True, check=True)
+            result = verifier.verify(source, [good], "flac", options)
+            ok = result is None
+            print(f"{'✅' if ok else '❌'} 完整的flac通过校验: {result}")
+            
+            # 截掉后半部分（文件头中的总样本数和MD5不变）
+            truncated = os.path.join(folder, "truncated.flac")
+            shutil.copy(good, truncated)
+            with open(truncated, "r+b") as f:
+                f.truncate(os.path.getsize(good) // 2)
+            result = verifier.verify(source, [truncated], "flac", options)
+            passed = result is not None
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 截断的flac校验失败: {result}")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 输出校验测试失败: {e}")
+        return False
+
+def test_archive():
+    """测试压缩包路径和读写"""
+    print("\n🔍 测试压缩包...")
+    try:
+        import tempfile
+        import archive
+        
+        ok = True
+        # 内部路径不能指向输出目录之外
+        for name, expected in (("../../etc/passwd", "etc/passwd"),
+                               ("/abs/a.wav", "abs/a.wav"),
+                               ("C:\\music\\a.wav", "music/a.wav"),
+                               ("./a/../b.wav", "a/b.wav"),
+                               ("..", "_")):
+            result = str(archive.safe_relative_path(name))
+            status = "✅" if result == expected else "❌"
+            ok = ok and result == expected
+            print(f"{status} 内部路径 {name!r} -> {result}")
+        
+        checks = [
+            archive.split_member("/data/a.tar.gz!/disc 1/01.flac") == ("/data/a.tar.gz", "disc 1/01.flac"),
+            archive.split_member("x.zip!/y.zip!/z.wav") == ("x.zip", "y.zip!/z.wav"),
+            not archive.is_member("/data/a.wav"),
+            archive.output_folder("pack.zip") != archive.output_folder("pack.tar.gz"),
+        ]
+        try:
+            archive.split_member("/data/a.wav")
+            checks.append(False)
+        except ValueError:
+            checks.append(True)
+        print(f"{'✅' if all(checks) else '❌'} 成员虚拟路径解析")
+        ok = ok and all(checks)
+        
+        # ArchiveWriter 写入后作为输入读回
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ("out.zip", "out.tar.gz"):
+                source = os.path.join(folder, "a.wav")
+                with open(source, "wb") as f:
+                    f.write(b"RIFF-test-data")
+                writer = archive.ArchiveWriter(os.path.join(folder, name))
+                writer.add(source, "disc1/a.wav")
+                error = writer.close()
+                members = archive.list_members(os.path.join(folder, name), ["wav"])
+                with archive.open_member(members[0]) as stream:
+                    data = stream.read()
+                passed = (error is None and len(members) == 1 and data == b"RIFF-test-data"
+                          and not os.path.exists(source)
+                          and not os.path.exists(os.path.join(folder, name + ".part")))
+                ok = ok and passed
+                print(f"{'✅' if passed else '❌'} {name} 写入并读回: {members}")
+            
+            # 恶意的成员名输出后仍在输出目录中
+            import zipfile
+            evil = os.path.join(folder, "evil.zip")
+            with zipfile.ZipFile(evil, "w") as z:
+                z.writestr("../../evil.wav", b"x")
+                z.writestr("/abs/evil.wav", b"x")
+            output_dir = os.path.join(folder, "out")
+            outputs = [archive.output_path(member, "mp3", output_dir)
+                       for member in archive.list_members(evil, ["wav"])]
+            passed = len(outputs) == 2 and all(
+                os.path.abspath(path).startswith(output_dir + os.sep) for path in outputs)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 成员输出路径: {[str(path) for path in outputs]}")
+            
+            # 打开的压缩包数有上限；正在使用的压缩包在用完后才关闭
+            archive.close_readers()
+            packs = []
+            for index in range(archive.MAX_OPEN_READERS + 2):
+                pack = os.path.join(folder, f"pack{index}.zip")
+                with zipfile.ZipFile(pack, "w") as z:
+                    z.writestr("a.wav", b"member-data")
+                archive.list_members(pack, ["wav"])
+                packs.append(pack)
+            bounded = len(archive._readers) == archive.MAX_OPEN_READERS
+            stream = archive.open_member(archive.member_path(packs[-1], "a.wav"))
+            with archive._using(packs[0]) as reader:
+                archive.close_readers()
+                with open(os.devnull, "wb") as sink:
+                    reader.copy("a.wav", sink)
+                in_use = reader._zip.fp is not None
+            with stream:
+                data = stream.read()
+            passed = (bounded and in_use and reader._zip.fp is None and data == b"member-data"
+                      and not archive._readers)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 压缩包缓存上限和使用中的压缩包")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 压缩包测试失败: {e}")
+        return False
+
+def test_wavfile():
+    """测试 wav 文件头读写和直通转换"""
+    print("\n🔍 测试wav直通...")
+    try:
+        import struct
+        import tempfile
+        import wave
+        import numpy as np
+        import wavfile
+        from options import ConversionOptions
+        
+        ok = True
+        frames = 1000
+        with tempfile.TemporaryDirectory() as folder:
+            for channels in (1, 2):
+                for bits in (16, 24):
+                    # 覆盖正负满幅的样本
+                    limit = 1 << (bits - 1)
+                    values = np.linspace(-limit, limit - 1, frames * channels).astype(np.int32)
+                    data = values.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :bits // 8]
+                    source = os.path.join(folder, f"{channels}ch{bits}.wav")
+                    with wave.open(source, "wb") as w:
+                        w.setnchannels(channels)
+                        w.setsampwidth(bits // 8)
+                        w.setframerate(44100)
+                        w.writeframes(data.tobytes())
+                    info = wavfile.read_info(source)
+                    passed = (info.container == "RIFF" and info.channels == channels
+                              and info.bits == bits and info.frame_rate == 44100
+                              and info.frames == frames)
+                    
+                    # 提高位深是精确的：读回的左对齐样本与源文件相同
+                    target_bits = 24 if bits == 16 else 32
+                    output = Path(folder) / f"{channels}ch{bits}-{target_bits}.wav"
+                    wavfile.transcode(source, output, ConversionOptions(bit_depth=target_bits))
+                    out_info = wavfile.read_info(str(output))
+                    _, samples = wavfile.map_samples(str(output), out_info)
+                    result = wavfile._block_int32(samples, target_bits, 0, frames)
+                    expected = values.reshape(frames, channels) << (32 - bits)
+                    passed = (passed and out_info.is_integer_pcm and out_info.bits == target_bits
+                              and out_info.frames == frames and np.array_equal(result, expected))
+                    del samples, result
+                    ok = ok and passed
+                    print(f"{'✅' if passed else '❌'} {channels}声道 {bits}位 -> {target_bits}位")
+            
+            # 超过4GB的输出写 RF64：ds64 中记录 RIFF 大小、data 大小和帧数
+            big_frames = 800_000_000
+            header = wavfile._header(2, 48000, 24, big_frames)
+            riff_size, data_size, sample_count = struct.unpack("<QQQ", header[20:44])
+            passed = (header[:4] == b"RF64" and header[4:8] == b"\xff\xff\xff\xff"
+                      and header[12:16] == b"ds64" and data_size == big_frames * 6
+                      and sample_count == big_frames and riff_size == len(header) - 8 + data_size
+                      and header[-8:] == b"data\xff\xff\xff\xff")
+            rf64 = os.path.join(folder, "big.wav")
+            with open(rf64, "wb") as f:
+                f.write(header + bytes(600))
+            info = wavfile.read_info(rf64)
+            passed = (passed and info.container == "RF64" and info.bits == 24
+                      and info.data_offset == len(header) and info.frames == 100)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} RF64 文件头")
+            
+            # W64：GUID 块头，块按8字节对齐
+            fmt = struct.pack("<HHIIHH", 1, 2, 48000, 48000 * 4, 4, 16)
+            body = (b"fmt " + wavfile._W64_SUFFIX + struct.pack("<Q", 24 + len(fmt)) + fmt
+                    + bytes((-len(fmt)) % 8)
+                    + b"data" + wavfile._W64_SUFFIX + struct.pack("<Q", 24 + 400) + bytes(400))
+            w64 = os.path.join(folder, "a.w64")
+            with open(w64, "wb") as f:
+                f.write(wavfile._W64_RIFF + struct.pack("<Q", 40 + len(body))
+                        + wavfile._W64_WAVE + body)
+            info = wavfile.read_info(w64)
+            passed = (info.container == "W64" and info.channels == 2 and info.bits == 16
+                      and info.frames == 100)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} W64 文件头")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ wav直通测试失败: {e}")
+        return False
+
+def test_plan_groups():
+    """测试小文件分组"""
+    print("\n🔍 测试小文件分组...")
+    try:
+        import tempfile
+        from async_engine import AsyncFFmpegConverter
+        from options import ConversionOptions
+        
+        with tempfile.TemporaryDirectory() as folder:
+            def write(name, size):
+                path = os.path.join(folder, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(bytes(size))
+                return Path(path)
+            
+            files = [write("a/s1.flac", 100), write("b/s1.flac", 100), write("a/s2.flac", 100),
+                     write("a/big.flac", 1000), write("a/s3.flac", 100), write("a/s4.wav", 100),
+                     write("a/s5.flac", 100)]
+            output_dir = os.path.join(folder, "out")
+            converter = AsyncFFmpegConverter(max_workers=1, batch_files=3, batch_max_bytes=500)
+            
+            def plan(output_format, options=ConversionOptions()):
+                groups = converter._plan_groups(files, output_format, output_dir, options)
+                return [[(os.path.relpath(path, folder).replace(os.sep, "/"), size)
+                         for path, size in group] for group in groups]
+            
+            # 同名文件输出到同一路径，分到不同的组；超过大小上限的文件单独转换
+            groups = plan("mp3")
+            passed = groups == [[("a/s1.flac", 100)], [("a/big.flac", None)],
+                                [("b/s1.flac", 100), ("a/s2.flac", 100), ("a/s3.flac", 100)],
+                                [("a/s4.wav", 100), ("a/s5.flac", 100)]]
+            ok = passed
+            print(f"{'✅' if passed else '❌'} 按数量、大小和输出路径分组: {groups}")
+            
+            # wav 转 wav 走直通，不分组
+            groups = plan("wav")
+            passed = [("a/s4.wav", None)] in groups and all(
+                len(group) == 1 for group in groups if group[0][0].endswith(".wav"))
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} wav 直通不分组")
+            
+            # 需要分别分析每个文件的处理不分组
+            singles = [[(os.path.relpath(path, folder).replace(os.sep, "/"), None)]
+                       for path in files]
+            passed = (plan("mp3", ConversionOptions(loudness_target=-14.0)) == singles
+                      and plan("mp3", ConversionOptions(fade_out=1.0)) == singles)
+            converter.batch_files = 1
+            passed = passed and plan("mp3") == singles
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 响度标准化、淡出和 batch_files=1 时不分组")
+            converter.close()
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 小文件分组测试失败: {e}")
+        return False
+
+def test_scratch_space():
+    """测试临时目录容量上限"""
+    print("\n🔍 测试临时目录容量...")
+    try:
+        import asyncio
+        import threading
+        from scratch import ScratchSpace
+        
+        # 超出上限时阻塞，释放后继续
+        space = ScratchSpace(limit=100)
+        space.reserve(60)
+        thread = threading.Thread(target=space.reserve, args=(60,), daemon=True)
+        thread.start()
+        thread.join(0.2)
+        blocked = thread.is_alive()
+        space.release(60)
+        thread.join(5)
+        passed = blocked and not thread.is_alive() and space.used == 60
+        ok = passed
+        print(f"{'✅' if passed else '❌'} 超出上限时等待释放")
+        
+        # 单个预留超过上限：没有其他预留时放行，之后的预留等它释放
+        space = ScratchSpace(limit=100)
+        space.reserve(500)
+        thread = threading.Thread(target=space.reserve, args=(1,), daemon=True)
+        thread.start()
+        thread.join(0.2)
+        blocked = thread.is_alive()
+        space.release(500)
+        thread.join(5)
+        passed = blocked and not thread.is_alive() and space.used == 1
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} 超过上限的单个预留")
+        
+        # 协程按排队顺序由其他线程的 release 唤醒；取消的等待者不留下预留
+        async def waiters():
+            space = ScratchSpace(limit=100)
+            space.reserve(80)
+            order = []
+            
+            async def take(name, size):
+                await space.reserve_async(size)
+                order.append(name)
+            
+            first = asyncio.create_task(take("a", 50))
+            await asyncio.sleep(0)
+            # 放得下也排在 a 后面
+            second = asyncio.create_task(take("b", 10))
+            third = asyncio.create_task(take("c", 90))
+            await asyncio.sleep(0.05)
+            waiting = order == []
+            threading.Timer(0.05, space.release, (80,)).start()
+            await asyncio.wait_for(asyncio.gather(first, second), 5)
+            third.cancel()
+            await asyncio.gather(third, return_exceptions=True)
+            return waiting and order == ["a", "b"] and space.used == 60
+        
+        passed = asyncio.run(waiters())
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} 协程排队等待和取消")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 临时目录容量测试失败: {e}")
+        return False
+
+def test_staging():
+    """测试暂存模式"""
+    print("\n🔍 测试暂存模式...")
+    try:
+        import tempfile
+        import wave
+        from converter import MusicConverter
+        from events import JobFinished
+        from scratch import ScratchSpace
+        from staging import StagingArea
+        
+        ok = True
+        with tempfile.TemporaryDirectory() as folder:
+            source_dir = os.path.join(folder, "share")
+            os.makedirs(source_dir)
+            sources = []
+            for name in ("a.wav", "b.wav"):
+                path = os.path.join(source_dir, name)
+                with wave.open(path, "wb") as w:
+                    w.setnchannels(1)
+                    w.setsampwidth(2)
+                    w.setframerate(8000)
+                    w.writeframes(bytes(8000))
+                sources.append(path)
+            scratch_root = os.path.join(folder, "scratch")
+            scratch = ScratchSpace(scratch_root)
+            
+            # 本地路径和原始路径互相对应，任务结束后删除本地副本
+            area = StagingArea(scratch)
+            local = area.add(sources[0])
+            area.start()
+            error = area.wait(local)
+            copied = os.path.exists(local) and os.path.getsize(local) == os.path.getsize(sources[0])
+            area.finished(local)
+            passed = (error is None and copied and local != sources[0]
+                      and area.source(local) == sources[0] and area.is_staged(local)
+                      and area.source(sources[1]) == sources[1] and not os.path.exists(local))
+            area.close()
+            passed = passed and not os.path.exists(area.root)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 复制、原始路径和删除本地副本")
+            
+            # 批量转换的事件中是原始输入和写回后的输出路径，没有本地临时路径
+            converter = MusicConverter(max_workers=2)
+            converter.set_scratch(scratch)
+            converter.set_staging(True)
+            events = []
+            converter.events.subscribe(events.append)
+            output_dir = os.path.join(folder, "out")
+            converter.convert_folder(source_dir, "flac", output_dir)
+            finished = [event for event in events if isinstance(event, JobFinished)]
+            paths = [str(value) for event in events
+                     for value in (getattr(event, "input_path", None),
+                                   getattr(event, "output_path", None),
+                                   getattr(event, "output_dir", None)) if value]
+            passed = (sorted(event.input_path for event in finished) == sources
+                      and sorted(event.output_path for event in finished)
+                      == [os.path.join(output_dir, "a.flac"), os.path.join(output_dir, "b.flac")]
+                      and all(os.path.exists(event.output_path) for event in finished)
+                      and not any(path.startswith(scratch_root) for path in paths)
+                      and os.listdir(scratch_root) == [])
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 事件中的路径: {[event.output_path for event in finished]}")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 暂存模式测试失败: {e}")
+        return False
+
+def test_cue():
+    """测试 cue 解析"""
+    print("\n🔍 测试cue解析...")
+    try:
+        import tempfile
+        from cue import parse_cue
+        
+        ok = True
+        with tempfile.TemporaryDirectory() as folder:
+            def write(name, text):
+                path = os.path.join(folder, name)
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(text)
+                return path
+            
+            sheet = parse_cue(write("Album 1.cue", "\n".join([
+                'REM GENRE Rock',
+                'REM DATE "1999"',
+                'PERFORMER "Band"',
+                'TITLE "Album"',
+                'FILE "CD Image.flac" WAVE',
+                '  TRACK 01 AUDIO',
+                '    TITLE "Intro"',
+                '    INDEX 00 00:00:00',
+                '    INDEX 01 00:00:00',
+                '  TRACK 02 AUDIO',
+                '    TITLE "A/B?"',
+                '    PERFORMER "Guest"',
+                '    REM COMPOSER Someone',
+                '    INDEX 01 01:02:00',
+            ])))
+            tags = sheet.tags(1)
+            paths = sheet.track_paths("/out", "flac")
+            passed = (sheet.file == "CD Image.flac" and len(sheet.tracks) == 2
+                      and sheet.rem == {"GENRE": "Rock", "DATE": "1999"}
+                      and sheet.ranges(100.0) == [(0.0, 62.0), (62.0, 38.0)]
+                      and sheet.ranges(None)[-1] == (62.0, None)
+                      and tags["artist"] == "Guest" and tags["album_artist"] == "Band"
+                      and tags["track"] == "2/2"
+                      and [p.name for p in paths] == ["01 - Intro.flac", "02 - A_B_.flac"]
+                      and paths[0].parent.parent == Path("/out"))
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 带引号的FILE、REM、音轨区间和输出路径")
+            
+            # 时间的最后一段是帧（1/75秒）
+            sheet = parse_cue(write("b.cue", "FILE image.wav WAVE\nTRACK 01 AUDIO\nINDEX 01 00:00:00\n"
+                                             "TRACK 02 AUDIO\nINDEX 01 00:01:15\n"))
+            start, length = sheet.ranges(10.0)[1]
+            passed = (sheet.file == "image.wav" and abs(start - 1.2) < 1e-9
+                      and abs(length - 8.8) < 1e-9)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} 不带引号的FILE、帧时间")
+            
+            for name, text in (("multi.cue", 'FILE "1.wav" WAVE\nTRACK 01 AUDIO\n'
+                                             'FILE "2.wav" WAVE\nTRACK 02 AUDIO\n'),
+                               ("empty.cue", 'FILE "1.wav" WAVE\n')):
+                try:
+                    parse_cue(write(name, text))
+                    passed = False
+                except ValueError:
+                    passed = True
+                ok = ok and passed
+                print(f"{'✅' if passed else '❌'} {name} 抛出 ValueError")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ cue解析测试失败: {e}")
+        return False
+
+def test_scan_formats():
+    """测试按源格式扫描（界面后台扫描与转换器展开结果一致）"""
+    print("\n🔍 测试按源格式扫描...")
+    try:
+        import tempfile
+        import zipfile
+        import archive
+        from scanner import BackgroundScanner, iter_audio_files
+        
+        ok = True
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, "album.cue"), "w", encoding="utf-8") as f:
+                f.write('FILE "album.wav" WAVE\nTRACK 01 AUDIO\nINDEX 01 00:00:00\n')
+            with open(os.path.join(folder, "album.wav"), "wb") as f:
+                f.write(b"RIFF")
+            with zipfile.ZipFile(os.path.join(folder, "pack.zip"), "w") as z:
+                z.writestr("a.wav", b"x")
+                z.writestr("b.flac", b"x")
+            
+            def names(paths):
+                return sorted(os.path.relpath(path, folder) for path in paths)
+            
+            for formats, expected in ((["wav", "flac", "zip"], ["album.wav", "pack.zip!/a.wav",
+                                                                 "pack.zip!/b.flac"]),
+                                      (["wav", "cue"], ["album.cue"]),
+                                      (["flac", "zip"], ["pack.zip!/b.flac"])):
+                scanner = BackgroundScanner([folder], formats)
+                scanner.wait()
+                scanned = names(scanner.take_new())
+                passed = (scanned == expected
+                          and scanned == names(iter_audio_files(folder, formats))
+                          and scanner.scanned_with([fmt.upper() for fmt in formats])
+                          and not scanner.scanned_with(formats + ["cue"] if "cue" not in formats
+                                                       else ["wav"]))
+                ok = ok and passed
+                print(f"{'✅' if passed else '❌'} 源格式 {formats}: {scanned}")
+            archive.close_readers()
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 按源格式扫描测试失败: {e}")
+        return False
+
+def test_pcm():
+    """测试样本处理"""
+    print("\n🔍 测试样本处理...")
+    try:
+        import pcm
+        if not pcm.available():
+            print("⚠️ 未安装 numpy，跳过")
+            return True
+        import numpy as np
+        
+        ok = True
+        # 16/24/32 位小端数据（24位左对齐到 int32 的高24位）
+        for width, values, expected, dtype in (
+                (2, [0, 1, -1, 32767, -32768], [0, 1, -1, 32767, -32768], np.int16),
+                (3, [0, 1, -1, 8388607, -8388608], [0, 256, -256, 8388607 << 8, -8388608 << 8],
+                 np.int32),
+                (4, [0, 1, -1, 2 ** 31 - 1, -2 ** 31], [0, 1, -1, 2 ** 31 - 1, -2 ** 31],
+                 np.int32)):
+            data = b"".join(v.to_bytes(width, "little", signed=True) for v in values + values)
+            buffer = pcm.PcmBuffer.from_bytes(data, 1000, 2, width)
+            passed = (buffer.samples.dtype == dtype and buffer.channels == 2
+                      and buffer.frames == 5 and buffer.bits == 8 * width
+                      and buffer.samples.reshape(-1).tolist() == expected + expected)
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} {8 * width} 位数据读取")
+        
+        # 线性淡入淡出：第一帧为0，最后一帧为1；32位满幅样本不溢出
+        samples = np.full((5, 1), 2 ** 31 - 1, dtype=np.int32)
+        buffer = pcm.PcmBuffer(samples, 4, 32).fade_in(1.0)
+        values = buffer.samples[:, 0].tolist()
+        passed = (values[0] == 0 and values[3:] == [2 ** 31 - 1] * 2
+                  and abs(values[1] - (2 ** 31 - 1) / 3) < 256)
+        data = np.full((4, 2), 1000, dtype=np.int16).tobytes()
+        buffer = pcm.PcmBuffer.from_bytes(data, 4, 2, 2).fade_out(1.0)
+        passed = passed and buffer.samples[:, 1].tolist() == [1000, 667, 333, 0]
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} 淡入淡出")
+        
+        # 切片共享内存，修改时各自复制
+        buffer = pcm.PcmBuffer(np.arange(10, dtype=np.int16).reshape(-1, 1) * 100, 10, 16)
+        head, tail = buffer.slice(0.0, 0.5), buffer.slice(0.5, 1.0)
+        shared = np.shares_memory(head.samples, buffer.samples)
+        tail.fade_in(0.3)
+        passed = (shared and head.frames == 5 and tail.frames == 5
+                  and tail.samples[:, 0].tolist() == [0, 300, 700, 800, 900]
+                  and buffer.samples[5:, 0].tolist() == [500, 600, 700, 800, 900])
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} 切片")
+        
+        # 1秒声音 + 0.5秒静音 + 1秒声音 + 0.05秒静音（短于最小长度，不算）
+        rate = 1000
+        loud = np.full(rate, 10000, dtype=np.int16)
+        quiet = np.zeros(rate // 2, dtype=np.int16)
+        samples = np.concatenate((loud, quiet, loud, np.zeros(50, dtype=np.int16), loud))
+        buffer = pcm.PcmBuffer(samples.reshape(-1, 1), rate, 16)
+        silences = buffer.detect_silence(-50.0, window=0.05, min_length=0.1)
+        silences = [(float(start), float(end)) for start, end in silences]
+        passed = silences == [(1.0, 1.5)]
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} 静音检测: {silences}")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 样本处理测试失败: {e}")
+        return False
+
+def test_silence_ranges():
+    """测试按静音裁剪和拆分"""
+    print("\n🔍 测试静音拆分...")
+    try:
+        from silence import track_ranges
+        
+        silences = [(0.0, 1.0), (10.0, 13.0), (20.0, 20.5), (28.0, 30.0)]
+        cases = [
+            # (trim, split, 预期的音轨)
+            (False, False, [(0.0, 30.0)]),
+            (True, False, [(1.0, 28.0)]),
+            # 短于 min_silence 的静音不拆分，开头和结尾的静音不作为拆分点
+            (False, True, [(0.0, 10.0), (13.0, 30.0)]),
+            (True, True, [(1.0, 10.0), (13.0, 28.0)]),
+        ]
+        ok = True
+        for trim, split, expected in cases:
+            result = track_ranges(silences, 30.0, trim, split, 2.0)
+            passed = result == expected
+            ok = ok and passed
+            print(f"{'✅' if passed else '❌'} trim={trim} split={split}: {result}")
+        passed = track_ranges([(0.0, 5.0)], 5.0, True, False, 2.0) == []
+        ok = ok and passed
+        print(f"{'✅' if passed else '❌'} 全部静音时没有音轨")
+        return ok
+        
+    except Exception as e:
+        print(f"❌ 静音拆分测试失败: {e}")
+        return False
+
+def test_device_queue():
+    """测试按设备调度"""
+    print("\n🔍 测试设备队列...")
+    try:
+        from devices import DeviceLimits, DeviceQueue
+        
+        queue = DeviceQueue(DeviceLimits(default=1))
+        for devices, name in (((1,), "a"), ((1,), "b"), ((2,), "c"), ((1, 2), "d"), ((3,), "e")):
+            queue.put(devices, name)
+        order = []
+        # 设备1忙时跳过排在前面的 b，取设备都空闲的最早任务
+        for _ in range(3):
+            order.append(queue.take()[1])
+        queue.release((1,))
+        order.append(queue.take()[1])
+        queue.release((1,))
+        queue.release((2,))
+        order.append(queue.take()[1])
+        passed = order == ["a", "c", "e", "b", "d"]
+        print(f"{'✅' if passed else '❌'} 取出顺序: {order}")
+        
+        limits = DeviceLimits.parse(["2"])
+        passed = passed and limits.enabled and limits.limit(12345) == 2
+        try:
+            DeviceLimits.parse(["0"])
+            passed = False
+        except ValueError:
+            pass
+        print(f"{'✅' if passed else '❌'} 上限参数解析")
+        return passed
+        
+    except Exception as e:
+        print(f"❌ 设备队列测试失败: {e}")
+        return False
+
 def test_ui_import():
     """测试UI模块导入"""
     print("\n🔍 测试UI模块...")
@@ -101,6 +1052,22 @@ def main():
         test_environment,
         test_imports,
         test_converter_class,
+        test_tracing,
+        test_event_coalescing,
+        test_async_cancel,
+        test_spool,
+        test_format_options,
+        test_output_verifier,
+        test_archive,
+        test_wavfile,
+        test_plan_groups,
+        test_scratch_space,
+        test_silence_ranges,
+        test_cue,
+        test_scan_formats,
+        test_pcm,
+        test_device_queue,
+        test_staging,
         test_ui_import
     ]
     
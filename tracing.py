@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换阶段计时模块
+记录每个任务各阶段（排队、stat、解码、垃圾回收、编码）的耗时，
+可导出为JSON Lines或Chrome/Perfetto trace文件。
+asyncio 引擎的所有任务都在事件循环线程中运行，协程中记录的阶段在trace中按任务分轨显示，
+否则同时进行的任务会重叠在同一个线程轨道上，看起来像错误的嵌套
+"""
+
+import os
+import json
+import time
+import asyncio
+import threading
+from contextlib import contextmanager
+from collections import namedtuple
+from typing import Dict, List, Optional
+
+# 单个计时区间，时间单位为 perf_counter_ns；in_task 表示在协程中记录
+Span = namedtuple("Span", ["name", "job_id", "start_ns", "end_ns", "thread_id", "args", "in_task"],
+                  defaults=(False,))
+
+
+def _in_task() -> bool:
+    """当前是否在事件循环的协程中运行"""
+    try:
+        return asyncio.current_task() is not None
+    except RuntimeError:
+        # 当前线程没有运行中的事件循环
+        return False
+
+
+class Tracer:
+    """阶段计时器（线程安全，开销仅为两次计时和一次列表追加）"""
+
+    def __init__(self):
+        """初始化计时器"""
+        self._spans: List[Span] = []
+        self._thread_names: Dict[int, str] = {}
+        # 记录单调时钟与墙上时钟的对应关系，导出时换算为绝对时间
+        self._origin_ns = time.perf_counter_ns()
+        self._origin_wall = time.time()
+
+    @contextmanager
+    def span(self, name: str, job_id: Optional[int] = None, **args):
+        """记录一个阶段的耗时"""
+        start_ns = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, start_ns, time.perf_counter_ns(), job_id, **args)
+
+    def record(self, name: str, start_ns: int, end_ns: int,
+               job_id: Optional[int] = None, **args):
+        """直接记录一个已知起止时间的阶段"""
+        thread = threading.current_thread()
+        if thread.ident not in self._thread_names:
+            self._thread_names[thread.ident] = thread.name
+        span = Span(name, job_id, start_ns, end_ns, thread.ident, args, _in_task())
+        # list.append 在CPython中是原子操作，无需加锁
+        self._spans.append(span)
+
+    def spans(self) -> List[Span]:
+        """获取已记录的阶段列表"""
+        return list(self._spans)
+
+    def clear(self):
+        """清空记录"""
+        self._spans = []
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """按阶段汇总：次数、总耗时、平均耗时和最大耗时（秒）"""
+        stages: Dict[str, List[float]] = {}
+        for span in self.spans():
+            stages.setdefault(span.name, []).append((span.end_ns - span.start_ns) / 1e9)
+        return {
+            name: {
+                "count": len(values),
+                "total_s": sum(values),
+                "mean_s": sum(values) / len(values),
+                "max_s": max(values),
+            }
+            for name, values in stages.items()
+        }
+
+    def _wall_time(self, ns: int) -> float:
+        """把单调时钟换算为Unix时间戳（秒）"""
+        return self._origin_wall + (ns - self._origin_ns) / 1e9
+
+    def export_jsonl(self, path: str):
+        """导出为JSON Lines，每行一个阶段"""
+        with open(path, "w", encoding="utf-8") as f:
+            for span in self.spans():
+                f.write(json.dumps({
+                    "name": span.name,
+                    "job_id": span.job_id,
+                    "start": self._wall_time(span.start_ns),
+                    "duration_s": (span.end_ns - span.start_ns) / 1e9,
+                    "thread": self._thread_names.get(span.thread_id, str(span.thread_id)),
+                    **span.args,
+                }, ensure_ascii=False) + "\n")
+
+    def export_chrome_trace(self, path: str):
+        """
+        导出为Chrome/Perfetto trace格式（可在 chrome://tracing 或 ui.perfetto.dev 打开）
+        线程中记录的阶段按线程分轨，协程中记录的阶段按任务分轨（轨道名为 "job 任务号 文件名"）
+        """
+        pid = os.getpid()
+        spans = self.spans()
+        # 轨道编号：线程按线程号，任务轨道使用不会与线程号重复的编号
+        tracks: Dict[object, int] = {}
+        names: Dict[int, str] = {}
+        for tid, name in list(self._thread_names.items()):
+            tracks[tid] = tid
+            names[tid] = name
+        next_tid = max(tracks.values(), default=0) + 1
+        for span in spans:
+            if span.in_task and span.job_id is not None and ("job", span.job_id) not in tracks:
+                tracks[("job", span.job_id)] = next_tid
+                names[next_tid] = f"job {span.job_id}"
+                next_tid += 1
+            if span.in_task and span.name == "job" and "file" in span.args:
+                names[tracks[("job", span.job_id)]] = f"job {span.job_id} {span.args['file']}"
+
+        events = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in names.items()
+        ]
+        for span in spans:
+            args = dict(span.args)
+            if span.job_id is not None:
+                args["job_id"] = span.job_id
+            if span.in_task and span.job_id is not None:
+                tid = tracks[("job", span.job_id)]
+            else:
+                tid = span.thread_id
+            events.append({
+                "name": span.name,
+                "cat": "convert",
+                "ph": "X",
+                "ts": (span.start_ns - self._origin_ns) / 1000,
+                "dur": (span.end_ns - span.start_ns) / 1000,
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
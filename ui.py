@@ -6,52 +6,66 @@
 """
 
 import os
-from pathlib import Path
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QLineEdit, QComboBox, 
-                             QProgressBar, QTextEdit, QFileDialog, QGroupBox,
+                             QProgressBar, QFileDialog, QGroupBox,
+                             QTableView, QAbstractItemView, QTabWidget,
                              QFormLayout, QMessageBox, QCheckBox, QGridLayout)
 from PyQt6.QtCore import Qt, QTimer, pyqtSignal, QObject, QMimeData
 from PyQt6.QtGui import QFont, QPalette, QColor, QIcon, QDragEnterEvent, QDropEvent
 
 from language_manager import LanguageManager
-
-class UISignals(QObject):
-    """用于线程安全的UI信号"""
-    progress_signal = pyqtSignal(int)
-    status_signal = pyqtSignal(str)
-    error_signal = pyqtSignal(str)
-    complete_signal = pyqtSignal(bool)
+from events import (EventCoalescer, BatchStarted, BatchFinished, BatchProgress, JobProgress,
+                    JobStarted, JobFailed, ConversionFinished, Message, describe_event)
+from log_view import LogView
+from selection_model import SelectionModel
+from scanner import BackgroundScanner
+from archive import ARCHIVE_SUFFIXES
+from results_model import ResultsModel, COLUMNS as RESULT_COLUMNS
 
 class MusicConverterUI(QMainWindow):
     """主界面类"""
     
+    # 界面每秒最多处理的转换事件批次数
+    EVENT_UPDATES_PER_SECOND = 10
+    # 日志存储上限（条），超出后丢弃最早的记录
+    LOG_MAX_ENTRIES = 100000
+    
     def __init__(self, converter):
         """初始化界面"""
         super().__init__()
         self.converter = converter
-        self.selected_paths = []
+        # 输入选择列表（模型/视图，支持大量文件）
+        self.selection = SelectionModel()
+        # 用户选择的原始路径（文件或文件夹），以及在后台展开它们的扫描器
+        self.input_roots = []
+        self.scanner = None
         self.output_dir = ""
         
         # 创建语言管理器
         self.lang = LanguageManager()
         
-        # 创建信号对象
-        self.ui_signals = UISignals()
-        
-        # 连接信号到槽函数
-        self.ui_signals.progress_signal.connect(self.update_progress)
-        self.ui_signals.status_signal.connect(self.update_status)
-        self.ui_signals.error_signal.connect(self.show_error)
-        self.ui_signals.complete_signal.connect(self.on_conversion_complete)
-        
-        # 设置回调（使用信号发射）
-        self.converter.set_callbacks(
-            lambda v: self.ui_signals.progress_signal.emit(v),
-            lambda m: self.ui_signals.status_signal.emit(m),
-            lambda e: self.ui_signals.error_signal.emit(e),
-            lambda s: self.ui_signals.complete_signal.emit(s)
-        )
+        # 转换事件先写入合并缓冲区，再由界面线程的定时器按固定频率取出，
+        # 避免工作线程向Qt事件循环投递大量信号
+        self.event_buffer = EventCoalescer()
+        self.converter.events.subscribe(self.event_buffer.push)
+        self.in_batch = False
+        
+        self.event_timer = QTimer(self)
+        self.event_timer.setInterval(1000 // self.EVENT_UPDATES_PER_SECOND)
+        self.event_timer.timeout.connect(self.process_events)
+        self.event_timer.start()
+        
+        # 后台扫描结果同样由定时器取出，边扫描边显示
+        self.scan_timer = QTimer(self)
+        self.scan_timer.setInterval(100)
+        self.scan_timer.timeout.connect(self.poll_scan)
+        
+        # 源格式变化后重新扫描（全选/清空会连续改变多个复选框，合并为一次）
+        self.rescan_timer = QTimer(self)
+        self.rescan_timer.setSingleShot(True)
+        self.rescan_timer.setInterval(300)
+        self.rescan_timer.timeout.connect(self.rescan_selection)
         
         self.init_ui()
         self.apply_dark_theme()
@@ -210,12 +224,34 @@ class MusicConverterUI(QMainWindow):
         folder_btn.clicked.connect(self.select_folder)
         layout.addWidget(folder_btn)
         
-        # 显示选择的路径
-        self.path_display = QTextEdit()
-        self.path_display.setReadOnly(True)
-        self.path_display.setMaximumHeight(80)
+        # 选择列表筛选
+        filter_layout = QHBoxLayout()
+        self.selection_filter = QLineEdit()
+        self.selection_filter.setPlaceholderText("按文件名筛选...")
+        self.selection_filter.textChanged.connect(self.on_selection_filter_changed)
+        filter_layout.addWidget(self.selection_filter)
+        self.selection_count_label = QLabel()
+        filter_layout.addWidget(self.selection_count_label)
+        layout.addLayout(filter_layout)
+        
+        # 显示选择的路径（行按需加载，可排序）
+        self.path_display = QTableView()
+        self.path_display.setModel(self.selection)
+        # 默认保持选择时的顺序，点击表头后才排序
+        self.path_display.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.path_display.setSortingEnabled(True)
+        self.path_display.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.path_display.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.path_display.setWordWrap(False)
+        self.path_display.verticalHeader().setVisible(False)
+        self.path_display.verticalHeader().setDefaultSectionSize(22)
+        self.path_display.horizontalHeader().setStretchLastSection(True)
+        self.path_display.setColumnWidth(SelectionModel.COLUMN_NAME, 220)
+        self.path_display.setColumnWidth(SelectionModel.COLUMN_FORMAT, 60)
+        self.path_display.setColumnWidth(SelectionModel.COLUMN_SIZE, 80)
+        self.path_display.setMaximumHeight(140)
         self.path_display.setStyleSheet("""
-            QTextEdit {
+            QTableView {
                 background-color: #1a202c;
                 border: 1px solid #4a5568;
                 border-radius: 4px;
@@ -224,8 +260,15 @@ class MusicConverterUI(QMainWindow):
                 font-family: Consolas, monospace;
                 font-size: 12px;
             }
+            QHeaderView::section {
+                background-color: #2d3748;
+                color: #e2e8f0;
+                border: none;
+                padding: 4px;
+            }
         """)
         layout.addWidget(self.path_display)
+        self.update_path_display()
         
         return group
 
@@ -248,6 +291,7 @@ class MusicConverterUI(QMainWindow):
             cb = QCheckBox(fmt.upper())
             cb.setChecked(True)  # 默认全选
             cb.setStyleSheet("QCheckBox { color: #e2e8f0; }")
+            cb.toggled.connect(self.on_source_formats_changed)
             self.source_format_checkboxes[fmt] = cb
             grid_layout.addWidget(cb, row, col)
             
@@ -289,6 +333,20 @@ class MusicConverterUI(QMainWindow):
     def get_selected_source_formats(self):
         """获取选中的源格式列表"""
         return [fmt for fmt, cb in self.source_format_checkboxes.items() if cb.isChecked()]
+
+    def on_source_formats_changed(self):
+        """源格式变化：扫描结果取决于格式（cue 引用的镜像、压缩包成员），需要重新扫描"""
+        if self.scanner is not None:
+            self.rescan_timer.start()
+
+    def rescan_selection(self):
+        """按当前源格式重新扫描选择的文件夹"""
+        source_formats = self.get_selected_source_formats()
+        if (self.scanner is None or not source_formats or self.converter.is_converting
+                or self.scanner.scanned_with(source_formats)):
+            return
+        self.add_log(f"源格式已变化，重新扫描: {', '.join(source_formats)}")
+        self.start_scan(self.input_roots)
     
     def create_output_group(self):
         """创建输出设置区域"""
@@ -419,11 +477,12 @@ class MusicConverterUI(QMainWindow):
         
         layout = QVBoxLayout(group)
         
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
+        # 日志先写入有上限的存储，由定时器批量刷新到界面
+        self.log_view = LogView(self.lang, max_entries=self.LOG_MAX_ENTRIES)
+        self.log_text = self.log_view.text_edit
         self.log_text.setMaximumHeight(120)
         self.log_text.setStyleSheet("""
-            QTextEdit {
+            QPlainTextEdit {
                 background-color: #0d1117;
                 border: 1px solid #30363d;
                 border-radius: 4px;
@@ -433,10 +492,72 @@ class MusicConverterUI(QMainWindow):
                 font-size: 11px;
             }
         """)
-        layout.addWidget(self.log_text)
+        
+        # 日志和每个文件的转换结果分两个标签页显示
+        self.log_tabs = QTabWidget()
+        self.log_tabs.addTab(self.log_view, "日志")
+        self.log_tabs.addTab(self.create_results_view(), "转换结果")
+        layout.addWidget(self.log_tabs)
         
         return group
     
+    def create_results_view(self):
+        """创建转换结果表"""
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(0, 0, 0, 0)
+        
+        toolbar = QHBoxLayout()
+        self.results_summary = QLabel()
+        toolbar.addWidget(self.results_summary)
+        toolbar.addStretch()
+        self.export_results_btn = QPushButton("导出CSV")
+        self.export_results_btn.clicked.connect(self.export_results)
+        toolbar.addWidget(self.export_results_btn)
+        layout.addLayout(toolbar)
+        
+        self.results = ResultsModel(self)
+        self.results_view = QTableView()
+        self.results_view.setModel(self.results)
+        self.results_view.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.results_view.setSortingEnabled(True)
+        self.results_view.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.results_view.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.results_view.setWordWrap(False)
+        self.results_view.verticalHeader().setVisible(False)
+        self.results_view.verticalHeader().setDefaultSectionSize(22)
+        self.results_view.horizontalHeader().setStretchLastSection(True)
+        self.results_view.setMaximumHeight(120)
+        self.results_view.setStyleSheet(self.path_display.styleSheet())
+        layout.addWidget(self.results_view)
+        
+        self.update_results_summary()
+        return widget
+    
+    def update_results_summary(self):
+        """更新结果统计"""
+        succeeded, failed = self.results.counts()
+        self.results_summary.setText(
+            self.lang.get_text("label_results_summary", succeeded=succeeded, failed=failed)
+        )
+    
+    def export_results(self):
+        """导出转换结果为CSV"""
+        if not self.results.rowCount():
+            return
+        path, _ = QFileDialog.getSaveFileName(
+            self,
+            self.lang.get_text("btn_export_results"),
+            "conversion_results.csv",
+            "CSV (*.csv)"
+        )
+        if path:
+            try:
+                self.results.export_csv(path)
+                self.add_log(f"转换结果已导出: {path}")
+            except OSError as e:
+                self.show_error(f"导出失败: {e}")
+    
     def apply_dark_theme(self):
         """应用深色主题"""
         palette = QPalette()
@@ -534,6 +655,7 @@ class MusicConverterUI(QMainWindow):
             log_bg = "#0d1117"
             log_border = "#30363d"
             log_text = "#c9d1d9"
+            header_bg = "#2d3748"
             hint_color = "#718096"
             hint_border = "#4a5568"
         else:
@@ -544,12 +666,13 @@ class MusicConverterUI(QMainWindow):
             log_bg = "#f7fafc"
             log_border = "#e2e8f0"
             log_text = "#2d3748"
+            header_bg = "#edf2f7"
             hint_color = "#4a5568"
             hint_border = "#cbd5e0"
         
-        # 更新路径显示
+        # 更新路径显示和结果表
         self.path_display.setStyleSheet(f"""
-            QTextEdit {{
+            QTableView {{
                 background-color: {bg_color};
                 border: 1px solid {border_color};
                 border-radius: 4px;
@@ -558,7 +681,14 @@ class MusicConverterUI(QMainWindow):
                 font-family: Consolas, monospace;
                 font-size: 12px;
             }}
+            QHeaderView::section {{
+                background-color: {header_bg};
+                color: {text_color};
+                border: none;
+                padding: 4px;
+            }}
         """)
+        self.results_view.setStyleSheet(self.path_display.styleSheet())
         
         # 更新格式选择框
         self.format_combo.setStyleSheet(f"""
@@ -620,7 +750,7 @@ class MusicConverterUI(QMainWindow):
         
         # 更新日志框
         self.log_text.setStyleSheet(f"""
-            QTextEdit {{
+            QPlainTextEdit {{
                 background-color: {log_bg};
                 border: 1px solid {log_border};
                 border-radius: 4px;
@@ -739,15 +869,23 @@ class MusicConverterUI(QMainWindow):
     
     def select_files(self):
         """选择音乐文件"""
+        formats = self.converter.SUPPORTED_INPUT_FORMATS
+        patterns = ['*.' + ext for ext in formats]
+        # .tar.gz 等压缩包扩展名
+        patterns += ['*' + suffix for suffix in ARCHIVE_SUFFIXES if suffix[1:] not in formats]
         files, _ = QFileDialog.getOpenFileNames(
             self,
             "选择音乐文件",
             "",
-            f"音频文件 ({' '.join(['*.' + ext for ext in self.converter.SUPPORTED_INPUT_FORMATS])})"
+            f"音频文件 ({' '.join(patterns)})"
         )
         
         if files:
-            self.selected_paths = files
+            self.cancel_scan()
+            # 上一次选择的文件夹不再参与判断是否为批量模式
+            self.scanner = None
+            self.input_roots = files
+            self.selection.set_paths(files)
             self.update_path_display()
             self.add_log(f"选择了 {len(files)} 个文件")
             self.update_button_states()
@@ -760,10 +898,8 @@ class MusicConverterUI(QMainWindow):
         )
         
         if folder:
-            self.selected_paths = [folder]
-            self.update_path_display()
             self.add_log(f"选择了文件夹: {folder}")
-            self.update_button_states()
+            self.start_scan([folder])
     
     def select_output_dir(self):
         """选择输出目录"""
@@ -777,18 +913,65 @@ class MusicConverterUI(QMainWindow):
             self.output_dir_input.setText(folder)
             self.add_log(f"输出目录设置为: {folder}")
     
+    def start_scan(self, paths):
+        """在后台展开选择的文件和文件夹"""
+        self.cancel_scan()
+        self.input_roots = list(paths)
+        self.selection.clear()
+        self.scanner = BackgroundScanner(
+            paths, self.get_selected_source_formats() or self.converter.SUPPORTED_INPUT_FORMATS
+        )
+        self.scan_timer.start()
+        self.update_path_display()
+        self.update_button_states()
+    
+    def cancel_scan(self):
+        """取消正在进行的扫描"""
+        if self.scanner and not self.scanner.finished:
+            self.scanner.cancel()
+        self.scan_timer.stop()
+    
+    def is_scanning(self):
+        """是否正在后台扫描"""
+        return self.scan_timer.isActive()
+    
+    def poll_scan(self):
+        """取出后台扫描到的新文件（在界面线程中由定时器调用）"""
+        scanner = self.scanner
+        finished = scanner.finished
+        self.selection.add_paths(scanner.take_new())
+        
+        if finished:
+            self.scan_timer.stop()
+            for error in scanner.errors:
+                self.add_log(f"⚠️ 无法读取: {error}", "warning")
+            if not scanner.cancelled:
+                self.add_log(f"扫描完成: {len(scanner.folders)} 个文件夹，{scanner.found} 个音频文件")
+                if scanner.found == 0:
+                    self.show_error("没有找到支持的音频文件！")
+        
+        self.update_path_display()
+        self.update_button_states()
+    
     def update_path_display(self):
         """更新路径显示"""
-        if not self.selected_paths:
-            self.path_display.clear()
-            return
-        
-        text = "\n".join(self.selected_paths)
-        self.path_display.setText(text)
+        total = self.selection.count()
+        visible = self.selection.visible_count()
+        text = self.lang.get_text("label_selected_count", count=total)
+        if visible != total:
+            text += f" ({visible})"
+        if self.is_scanning():
+            text += " " + self.lang.get_text("label_scanning")
+        self.selection_count_label.setText(text)
+    
+    def on_selection_filter_changed(self, text):
+        """筛选选择列表"""
+        self.selection.set_filter(text)
+        self.update_path_display()
     
     def start_conversion(self):
         """开始转换（异步优化版）"""
-        if not self.selected_paths:
+        if not self.input_roots:
             self.show_error("请先选择要转换的文件或文件夹！")
             return
         
@@ -801,10 +984,19 @@ class MusicConverterUI(QMainWindow):
             self.show_error("请至少选择一种源文件格式！")
             return
 
+        # 扫描已完成且按当前源格式扫描时直接使用扫描结果，避免转换器再次遍历文件夹；
+        # 仍在扫描、源格式已变化或直接选择的文件（其中可能有压缩包）由转换器自行展开
+        files = None
+        if self.is_scanning():
+            self.cancel_scan()
+            self.add_log("扫描未完成，将在转换时展开文件夹", "warning")
+            self.update_path_display()
+        elif self.scanner is not None and self.scanner.scanned_with(source_formats):
+            files = self.selection.paths()
+        
         # 检查是否为批量模式
-        is_batch = len(self.selected_paths) > 1 or (
-            len(self.selected_paths) == 1 and os.path.isdir(self.selected_paths[0])
-        )
+        has_folders = bool(self.scanner and self.scanner.folders)
+        is_batch = len(self.input_roots) > 1 or has_folders
         
         # 显示转换信息
         self.add_log("=" * 50)
@@ -813,9 +1005,8 @@ class MusicConverterUI(QMainWindow):
             self.add_log(f"输出目录: {output_dir}")
         if is_batch:
             self.add_log("模式: 批量转换")
-            # 显示预估文件数量
-            total_files = self._count_files(self.selected_paths)
-            self.add_log(f"预估文件数: {total_files} 个")
+            if files is not None:
+                self.add_log(f"文件数: {len(files)} 个")
         else:
             self.add_log("模式: 单文件转换")
             
@@ -826,6 +1017,8 @@ class MusicConverterUI(QMainWindow):
         self.stop_btn.setEnabled(True)
         self.format_combo.setEnabled(False)
         self.progress_bar.setValue(0)
+        self.results.clear()
+        self.update_results_summary()
         
         # 禁用文件选择按钮，防止在转换过程中修改选择
         for btn in self.findChildren(QPushButton):
@@ -834,54 +1027,91 @@ class MusicConverterUI(QMainWindow):
         
         # 启动转换
         self.converter.start_conversion(
-            self.selected_paths,
+            self.input_roots,
             output_format,
             output_dir,
             is_batch,
-            source_formats=source_formats
+            source_formats=source_formats,
+            files=files
         )
     
-    def _count_files(self, paths):
-        """计算预估文件数量"""
-        count = 0
-        for path in paths:
-            if os.path.isdir(path):
-                for ext in self.converter.SUPPORTED_INPUT_FORMATS:
-                    count += len(list(Path(path).glob(f"*.{ext}")))
-                    count += len(list(Path(path).glob(f"*.{ext.upper()}")))
-            else:
-                count += 1
-        return count
-    
     def stop_conversion(self):
         """停止转换"""
         self.converter.stop_conversion()
-        self.add_log("用户停止转换")
+        self.add_log("用户停止转换", "warning")
         self.update_button_states()
     
     def clear_selection(self):
         """清空选择"""
-        self.selected_paths = []
+        self.cancel_scan()
+        self.scanner = None
+        self.input_roots = []
+        self.selection.clear()
+        self.selection_filter.clear()
+        self.update_path_display()
         self.output_dir = ""
         self.output_dir_input.clear()
-        self.path_display.clear()
         self.progress_bar.setValue(0)
         self.status_label.setText("准备就绪")
         self.add_log("已清空选择")
         self.update_button_states()
     
+    def process_events(self):
+        """处理缓冲的转换事件（在界面线程中由定时器调用）"""
+        events = self.event_buffer.drain()
+        if not events:
+            return
+        
+        # 任务结果一批追加到结果表
+        if self.results.add_events(events):
+            self.update_results_summary()
+        
+        for event in events:
+            if isinstance(event, BatchStarted):
+                self.in_batch = True
+            elif isinstance(event, BatchFinished):
+                self.in_batch = False
+            
+            if isinstance(event, BatchProgress):
+                self.update_progress(event.percent)
+            elif isinstance(event, JobProgress):
+                # 批量模式下进度条显示整体进度
+                if not self.in_batch:
+                    self.update_progress(event.percent)
+            elif isinstance(event, ConversionFinished):
+                self.on_conversion_complete(event.success)
+            elif isinstance(event, JobFailed) and self.in_batch:
+                # 批量模式下单个文件失败只记录日志，不逐个弹窗
+                self.add_log(f"❌ 错误: {event.error}", "error")
+            elif isinstance(event, JobFailed) or (isinstance(event, Message) and event.level == "error"):
+                self.show_error(describe_event(event))
+            else:
+                text = describe_event(event)
+                if text:
+                    self.update_status(text, self.event_log_level(event))
+    
+    @staticmethod
+    def event_log_level(event):
+        """事件对应的日志级别"""
+        if isinstance(event, Message):
+            return event.level
+        if isinstance(event, JobStarted):
+            # 每个文件开始转换的记录量最大，默认不显示
+            return "debug"
+        return "info"
+    
     def update_progress(self, value):
         """更新进度条"""
         self.progress_bar.setValue(value)
     
-    def update_status(self, message):
+    def update_status(self, message, level="info"):
         """更新状态"""
         self.status_label.setText(message)
-        self.add_log(f"状态: {message}")
+        self.add_log(f"状态: {message}", level)
     
     def show_error(self, message):
         """显示错误"""
-        self.add_log(f"❌ 错误: {message}")
+        self.add_log(f"❌ 错误: {message}", "error")
         QMessageBox.critical(self, "错误", message)
     
     def on_conversion_complete(self, success):
@@ -890,7 +1120,7 @@ class MusicConverterUI(QMainWindow):
             self.add_log("✅ 转换完成！")
             QMessageBox.information(self, "完成", "所有转换任务已完成！")
         else:
-            self.add_log("⚠️ 转换完成，但可能存在错误")
+            self.add_log("⚠️ 转换完成，但可能存在错误", "warning")
         
         self.update_button_states()
         
@@ -898,23 +1128,18 @@ class MusicConverterUI(QMainWindow):
         import gc
         gc.collect()
     
-    def add_log(self, message):
-        """添加日志"""
-        from datetime import datetime
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_line = f"[{timestamp}] {message}"
-        self.log_text.append(log_line)
-        # 滚动到底部
-        self.log_text.verticalScrollBar().setValue(
-            self.log_text.verticalScrollBar().maximum()
-        )
+    def add_log(self, message, level="info"):
+        """添加日志（level: debug / info / warning / error）"""
+        self.log_view.add(message, level)
     
     # 资源监控和进度预测功能已删除
     
     def update_button_states(self):
         """更新按钮状态（优化版）"""
         is_converting = self.converter.is_converting
-        has_selection = len(self.selected_paths) > 0
+        has_selection = self.selection.count() > 0 or (
+            self.is_scanning() and bool(self.input_roots)
+        )
         
         self.start_btn.setEnabled(has_selection and not is_converting)
         self.stop_btn.setEnabled(is_converting)
@@ -981,34 +1206,14 @@ class MusicConverterUI(QMainWindow):
         # 获取拖拽的文件路径
         mime_data = event.mimeData()
         if mime_data.hasUrls():
-            dropped_paths = [url.toLocalFile() for url in mime_data.urls()]
-            
-            # 过滤出支持的音频文件
-            audio_files = []
-            folders = []
-            
-            for path in dropped_paths:
-                if os.path.isdir(path):
-                    folders.append(path)
-                elif os.path.isfile(path):
-                    # 检查文件扩展名
-                    ext = os.path.splitext(path)[1][1:].lower()
-                    if ext in self.converter.SUPPORTED_INPUT_FORMATS:
-                        audio_files.append(path)
-            
-            # 组合结果
-            if folders:
-                self.selected_paths = folders
-                self.add_log(f"拖拽选择了 {len(folders)} 个文件夹")
-            elif audio_files:
-                self.selected_paths = audio_files
-                self.add_log(f"拖拽选择了 {len(audio_files)} 个音频文件")
-            else:
+            dropped_paths = [url.toLocalFile() for url in mime_data.urls() if url.isLocalFile()]
+            if not dropped_paths:
                 self.show_error("拖拽的文件格式不支持！")
                 return
             
-            self.update_path_display()
-            self.update_button_states()
+            # 文件夹展开和格式过滤都在后台进行
+            self.add_log(f"拖拽选择了 {len(dropped_paths)} 个文件/文件夹")
+            self.start_scan(dropped_paths)
             event.acceptProposedAction()
     
     def toggle_language(self):
@@ -1100,6 +1305,20 @@ class MusicConverterUI(QMainWindow):
         # 更新拖拽提示
         if hasattr(self, 'drag_hint'):
             self.drag_hint.setText(self.lang.get_text("drag_drop_text"))
+        
+        # 更新选择列表
+        self.selection.set_headers([self.lang.get_text(key) for key in
+                                    ("col_name", "col_format", "col_size", "col_location")])
+        self.selection_filter.setPlaceholderText(self.lang.get_text("placeholder_selection_filter"))
+        self.update_path_display()
+        
+        # 更新日志工具栏和结果表
+        self.log_view.update_language()
+        self.log_tabs.setTabText(0, self.lang.get_text("tab_log"))
+        self.log_tabs.setTabText(1, self.lang.get_text("tab_results"))
+        self.results.set_headers([self.lang.get_text(f"col_result_{key}") for key, _, _ in RESULT_COLUMNS])
+        self.export_results_btn.setText(self.lang.get_text("btn_export_results"))
+        self.update_results_summary()
     
     def closeEvent(self, event):
         """关闭窗口事件"""
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+转换结果校验
+完整解码每个输出文件（解码出错即失败），并检查时长与输入一致；
+无损输出（wav/flac）且转换不改变样本时，还比较输入和输出解码后PCM的MD5。
+flac 输出另外检查编码器写入 STREAMINFO 的MD5与解码结果是否一致（与 flac -t 相同）。
+校验只运行ffmpeg解码，不依赖 pydub，两个引擎共用
+"""
+
+import os
+import re
+import subprocess
+from typing import List, Optional, Tuple
+
+from ffmpeg_config import subprocess_kwargs
+from options import ConversionOptions
+
+# 可以比较PCM的输出格式和输入格式（有损格式解码结果与编码器和解码器实现有关）
+LOSSLESS_OUTPUTS = ("wav", "flac")
+LOSSLESS_INPUTS = ("wav", "flac", "ape", "tta")
+
+# 允许的时长误差：有损编码器会补齐最后一帧，部分格式的文件头时长是估算的
+DURATION_TOLERANCE = 0.2
+DURATION_TOLERANCE_RATIO = 0.002
+
+_DURATION_RE = re.compile(r"Duration:\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_TIME_RE = re.compile(r"time=\s*(\d+):(\d+):(\d+(?:\.\d+)?)")
+_PCM_CODEC_RE = re.compile(r"Audio: pcm_[su](\d+)[lb]e")
+# 流信息中的样本格式，例如 "s16" 或 "s32 (24 bit)"
+_SAMPLE_BITS_RE = re.compile(r"Audio: .*?, [su](8|16|32)p?(?: \((\d+) bit\))?")
+_MD5_RE = re.compile(r"MD5=([0-9a-f]{32})")
+# 流信息中的采样率和声道布局，例如 "44100 Hz, stereo" 或 "48000 Hz, 5.1(side)"
+_LAYOUT_RE = re.compile(r"Audio: .*?, (\d+) Hz, ([^,\n]+)")
+_CHANNELS = {"mono": 1, "stereo": 2}
+
+
+def _seconds(match) -> float:
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def parse_duration(log: str) -> Optional[float]:
+    """文件头中的时长（秒）"""
+    match = _DURATION_RE.search(log)
+    return _seconds(match) if match else None
+
+
+def parse_decoded_time(log: str) -> Optional[float]:
+    """解码结束时的统计行中实际解码出的时长（秒）"""
+    matches = list(_TIME_RE.finditer(log))
+    return _seconds(matches[-1]) if matches else None
+
+
+def flac_streaminfo(path: str) -> Optional[Tuple[int, Optional[str]]]:
+    """
+    读取 flac 文件 STREAMINFO 中的位深和未编码样本的MD5
+    编码器没有计算MD5时（全为0）MD5返回None；不是flac文件时返回None
+    """
+    with open(path, "rb") as f:
+        header = f.read(42)
+    if len(header) < 42 or header[:4] != b"fLaC" or header[4] & 0x7F != 0:
+        return None
+    info = header[8:42]
+    bits = (((info[12] & 0x01) << 4) | (info[13] >> 4)) + 1
+    md5 = info[18:34]
+    return bits, (md5.hex() if any(md5) else None)
+
+
+def parse_sample_bits(log: str) -> Optional[int]:
+    """整数样本的有效位数，浮点样本返回None"""
+    match = _SAMPLE_BITS_RE.search(log)
+    if not match:
+        return None
+    return int(match.group(2) or match.group(1))
+
+
+def parse_stream_layout(log: str) -> Optional[Tuple[int, int]]:
+    """第一个音频流的 (采样率, 声道数)，无法识别时返回None"""
+    match = _LAYOUT_RE.search(log)
+    if not match:
+        return None
+    rate, layout = int(match.group(1)), match.group(2).strip()
+    channels = _CHANNELS.get(layout)
+    if channels is None:
+        # "6 channels" 或 "5.1(side)" / "7.1"
+        count = re.match(r"(\d+) channels", layout)
+        surround = re.match(r"(\d+)\.(\d+)", layout)
+        if count:
+            channels = int(count.group(1))
+        elif surround:
+            channels = int(surround.group(1)) + int(surround.group(2))
+        else:
+            return None
+    return rate, channels
+
+
+def _pcm_codec(bits: int) -> str:
+    """与 flac 计算MD5时相同的样本格式（有符号小端，每个样本 ceil(bits/8) 字节）"""
+    size = (bits + 7) // 8 * 8
+    return "pcm_s8" if size == 8 else f"pcm_s{size}le"
+
+
+def preserves_samples(options: ConversionOptions) -> bool:
+    """转换是否不改变样本（只改变容器/编码），这时无损输出的PCM应与输入完全相同"""
+    return (not options.normalize and options.fade_in <= 0 and options.fade_out <= 0
+            and not options.edits_silence and options.sample_rate is None
+            and options.channels is None and options.bit_depth is None)
+
+
+class OutputVerifier:
+    """校验一个任务的输出文件（同步运行ffmpeg，由调用方放到单独的线程池中）"""
+
+    def __init__(self, ffmpeg_path: str):
+        self.ffmpeg_path = ffmpeg_path
+
+    def _run(self, arguments: List[str]) -> Tuple[int, str, str]:
+        result = subprocess.run([self.ffmpeg_path, "-hide_banner", "-nostdin", *arguments],
+                                capture_output=True, **subprocess_kwargs())
+        return (result.returncode, result.stdout.decode("utf-8", "replace"),
+                result.stderr.decode("utf-8", "replace"))
+
+    def _decode(self, path: str, codec: Optional[str]) -> Tuple[float, Optional[str], str]:
+        """
+        完整解码，返回 (解码时长, PCM的MD5, 日志)
+        codec 为None时只解码不计算MD5；-xerror 使解码错误直接以非零退出码结束
+        """
+        output = ["-c:a", codec, "-f", "md5", "-"] if codec else ["-f", "null", "-"]
+        code, stdout, log = self._run(["-xerror", "-i", path, "-map", "0:a:0", *output])
+        if code != 0:
+            # 日志最后是统计行和 "Conversion failed!"，取第一条错误信息
+            lines = log.replace("\r", "\n").strip().splitlines()
+            errors = [line for line in lines if "rror" in line or "failed" in line]
+            detail = (errors or lines or [f"退出码 {code}"])[0]
+            raise ValueError(f"解码失败: {detail}")
+        decoded = parse_decoded_time(log)
+        if decoded is None:
+            raise ValueError("无法获取解码时长")
+        match = _MD5_RE.search(stdout)
+        return decoded, (match.group(1) if match else None), log
+
+    def _probe(self, input_path: str) -> str:
+        """只读文件头，返回ffmpeg打印的输入信息"""
+        return self._run(["-i", input_path])[2]
+
+    def verify(self, input_path: str, outputs: List[str], output_format: str,
+               options: ConversionOptions) -> Optional[str]:
+        """校验输出，通过时返回None，否则返回问题描述"""
+        input_format = os.path.splitext(input_path)[1].lower()[1:]
+        # 输出多个文件（cue 分轨）时只比较总时长
+        compare_pcm = (output_format in LOSSLESS_OUTPUTS and input_format in LOSSLESS_INPUTS
+                       and preserves_samples(options) and len(outputs) == 1)
+        input_log = self._probe(input_path)
+        expected = parse_duration(input_log)
+        total = 0.0
+        for path in outputs:
+            name = os.path.basename(path)
+            bits = None
+            codec = None
+            recorded_md5 = None
+            if output_format == "flac":
+                info = flac_streaminfo(path)
+                if info is None:
+                    return f"{name}: 不是有效的flac文件"
+                bits, recorded_md5 = info
+                codec = _pcm_codec(bits)
+            elif output_format == "wav":
+                # wav 的样本原样存储，直接对数据计算MD5
+                codec = "copy"
+            try:
+                decoded, md5, log = self._decode(path, codec)
+            except ValueError as e:
+                return f"{name}: {e}"
+            if recorded_md5 and md5 != recorded_md5:
+                return f"{name}: 解码结果与 STREAMINFO 中的MD5不一致"
+            total += decoded
+
+            if compare_pcm:
+                if output_format == "wav":
+                    match = _PCM_CODEC_RE.search(log)
+                    if not match:
+                        return f"{name}: 无法识别wav样本格式"
+                    bits = int(match.group(1))
+                # 按源文件和输出中较低的位数比较（源文件精度以下的填充位不算差异）
+                source_bits = parse_sample_bits(input_log)
+                if source_bits and source_bits < bits:
+                    bits = source_bits
+                    try:
+                        _, md5, _ = self._decode(path, _pcm_codec(bits))
+                    except ValueError as e:
+                        return f"{name}: {e}"
+                try:
+                    expected, input_md5, _ = self._decode(input_path, _pcm_codec(bits))
+                except ValueError as e:
+                    return f"输入文件 {e}"
+                if input_md5 != md5:
+                    return f"{name}: 解码后的样本与输入不一致"
+
+        # 裁剪/拆分静音后时长本来就比输入短
+        if options.edits_silence:
+            return None
+        if expected is None:
+            return "无法获取输入时长"
+        # 每个输出文件的最后一帧都可能被补齐
+        tolerance = max(DURATION_TOLERANCE * len(outputs), expected * DURATION_TOLERANCE_RATIO)
+        if abs(total - expected) > tolerance:
+            return f"输出时长 {total:.2f}s 与输入 {expected:.2f}s 不一致"
+        return None
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+WAV 直通（不经过ffmpeg）
+wav 转 wav（改封装、改位深、单声道/立体声互转、淡入淡出）时直接把输入的样本数据
+内存映射为 NumPy 数组，分块转换后写出，不解码为 bytes，也不启动ffmpeg进程。
+支持 RIFF、RF64 和 Sony Wave64（W64）输入，输出超过 4GB 时写 RF64。
+输出的总帧数事先已知，文件头一次写好，数据顺序写出，不需要回写文件头
+"""
+
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - 未安装时 native_supported 返回False
+    np = None
+
+from options import ConversionOptions
+
+# 每块处理的帧数
+_BLOCK_FRAMES = 1 << 18
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+# KSDATAFORMAT_SUBTYPE_PCM
+_PCM_SUBFORMAT = bytes.fromhex("0100000000001000800000aa00389b71")
+# W64 的块GUID：前4字节为块名，后12字节固定
+_W64_SUFFIX = bytes.fromhex("f3acd3118cd100c04f8edb8a")
+_W64_RIFF = bytes.fromhex("726966662e91cf11a5d628db04c10000")
+_W64_WAVE = b"wave" + _W64_SUFFIX
+
+# RIFF 大小字段的上限，超过时写 RF64
+_RIFF_LIMIT = 0xFFFFFFFF
+# 标准声道掩码
+_CHANNEL_MASKS = {1: 0x4, 2: 0x3}
+# 抖动噪声表的长度（每块从随机位置取一段，避免每块重新生成随机数）
+_DITHER_TABLE = 1 << 22
+
+
+@dataclass
+class WavInfo:
+    """wav 文件的样本格式和数据位置"""
+    container: str
+    format_tag: int
+    channels: int
+    frame_rate: int
+    # 每个样本占用的位数（8的倍数）和有效位数
+    bits: int
+    valid_bits: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def block_align(self) -> int:
+        return self.channels * self.bits // 8
+
+    @property
+    def frames(self) -> int:
+        return self.data_size // self.block_align
+
+    @property
+    def duration_seconds(self) -> float:
+        return self.frames / self.frame_rate if self.frame_rate else 0.0
+
+    @property
+    def is_integer_pcm(self) -> bool:
+        return self.format_tag == _WAVE_FORMAT_PCM
+
+
+def _parse_fmt(data: bytes) -> tuple:
+    """解析 fmt 块，返回 (格式, 声道, 采样率, 位数, 有效位数)"""
+    if len(data) < 16:
+        raise ValueError("fmt 块过短")
+    format_tag, channels, frame_rate, _, _, bits = struct.unpack("<HHIIHH", data[:16])
+    valid_bits = bits
+    if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(data) >= 40:
+        valid_bits = struct.unpack("<H", data[18:20])[0] or bits
+        subformat = data[24:40]
+        # 子格式GUID的前两字节为实际格式
+        format_tag = struct.unpack("<H", subformat[:2])[0]
+        if subformat[2:] != _PCM_SUBFORMAT[2:]:
+            format_tag = -1
+    return format_tag, channels, frame_rate, bits, valid_bits
+
+
+def read_info(path: str) -> WavInfo:
+    """读取 RIFF/RF64/W64 文件头，格式不支持或文件损坏时抛出 ValueError"""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = f.read(40)
+        if header[:16] == _W64_RIFF and header[24:40] == _W64_WAVE:
+            return _read_w64(f, path, file_size)
+        if len(header) < 12 or header[:4] not in (b"RIFF", b"RF64") or header[8:12] != b"WAVE":
+            raise ValueError("不是wav文件")
+        container = header[:4].decode("ascii")
+        f.seek(12)
+        fmt = None
+        data_size64 = None
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                raise ValueError("找不到 data 块")
+            name, size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+            if name == b"ds64":
+                ds64 = f.read(size + (size & 1))
+                # RIFF大小、data大小、样本数（各8字节）
+                data_size64 = struct.unpack("<Q", ds64[8:16])[0]
+                continue
+            if name == b"fmt ":
+                fmt = _parse_fmt(f.read(size + (size & 1)))
+                continue
+            if name == b"data":
+                if fmt is None:
+                    raise ValueError("data 块在 fmt 块之前")
+                if container == "RF64" and size == 0xFFFFFFFF and data_size64 is not None:
+                    size = data_size64
+                offset = f.tell()
+                # 录音中断的文件 data 大小可能大于实际长度
+                size = min(size, file_size - offset)
+                return WavInfo(container, *fmt, data_offset=offset, data_size=size)
+            f.seek(size + (size & 1), os.SEEK_CUR)
+
+
+def _read_w64(f, path: str, file_size: int) -> WavInfo:
+    """Sony Wave64：块头为16字节GUID + 8字节大小（包含块头），块按8字节对齐"""
+    f.seek(40)
+    fmt = None
+    while True:
+        chunk = f.read(24)
+        if len(chunk) < 24:
+            raise ValueError("找不到 data 块")
+        guid, size = chunk[:16], struct.unpack("<Q", chunk[16:])[0]
+        if size < 24:
+            raise ValueError("W64 块大小无效")
+        body = size - 24
+        if guid == b"fmt " + _W64_SUFFIX:
+            fmt = _parse_fmt(f.read(body))
+        elif guid == b"data" + _W64_SUFFIX:
+            if fmt is None:
+                raise ValueError("data 块在 fmt 块之前")
+            offset = f.tell()
+            return WavInfo("W64", *fmt, data_offset=offset,
+                           data_size=min(body, file_size - offset))
+        else:
+            f.seek(body, os.SEEK_CUR)
+        f.seek((-size) % 8, os.SEEK_CUR)
+
+
+def native_supported(info: WavInfo, options: ConversionOptions) -> bool:
+    """
+    这个 wav 到 wav 的转换能否走直通：整数PCM（16/24/32位），
+    不需要重采样、响度标准化和静音处理，声道只在单声道和立体声之间转换
+    """
+    if np is None or not info.is_integer_pcm or info.bits not in (16, 24, 32):
+        return False
+    if options.normalize or options.edits_silence:
+        return False
+    if options.sample_rate and options.sample_rate != info.frame_rate:
+        return False
+    if options.channels and options.channels != info.channels and info.channels not in (1, 2):
+        return False
+    return info.frames > 0
+
+
+def map_samples(path: str, info: WavInfo):
+    """
+    把样本数据映射为只读数组，返回 (原始数据, 样本)：
+    原始数据为 (帧, 每帧字节数) 的字节数组；样本为 (帧, 声道) 的整数视图，
+    24位样本为从每个样本前一个字节开始读取的 int32 跨步视图（低8位是前一个字节，使用时清零）
+    """
+    with open(path, "rb") as f:
+        # mmap 的偏移需要按分配粒度对齐，多映射的部分在数组中跳过
+        start = info.data_offset - info.data_offset % mmap.ALLOCATIONGRANULARITY
+        length = info.data_offset - start + info.frames * info.block_align
+        mapped = mmap.mmap(f.fileno(), length, access=mmap.ACCESS_READ, offset=start)
+    offset = info.data_offset - start
+    raw = np.frombuffer(mapped, dtype=np.uint8, offset=offset,
+                        count=info.frames * info.block_align).reshape(-1, info.block_align)
+    if info.bits == 24:
+        # data 块前面至少有文件头，offset - 1 总是有效的
+        samples = np.ndarray((info.frames, info.channels), dtype="<i4", buffer=mapped,
+                             offset=offset - 1, strides=(info.block_align, 3))
+    else:
+        samples = raw.view(f"<i{info.bits // 8}")
+    return raw, samples
+
+
+def _block_int32(samples, bits: int, start: int, stop: int):
+    """取出 [start, stop) 帧并转换为左对齐的 int32（低位补0）"""
+    block = samples[start:stop]
+    if bits == 16:
+        return block.astype(np.int32) << 16
+    if bits == 24:
+        return block & np.int32(-256)
+    return np.array(block, dtype=np.int32)
+
+
+def _header(channels: int, frame_rate: int, bits: int, frames: int) -> bytes:
+    """输出文件头：超过2声道或16位时使用 WAVE_FORMAT_EXTENSIBLE，数据超过4GB时为 RF64"""
+    block_align = channels * bits // 8
+    data_size = frames * block_align
+    if channels > 2 or bits > 16:
+        fmt = struct.pack("<HHIIHH", _WAVE_FORMAT_EXTENSIBLE, channels, frame_rate,
+                          frame_rate * block_align, block_align, bits)
+        fmt += struct.pack("<HHI", 22, bits, _CHANNEL_MASKS.get(channels, 0)) + _PCM_SUBFORMAT
+    else:
+        fmt = struct.pack("<HHIIHH", _WAVE_FORMAT_PCM, channels, frame_rate,
+                          frame_rate * block_align, block_align, bits)
+    chunks = b"fmt " + struct.pack("<I", len(fmt)) + fmt
+    # "WAVE" + fmt块 + data块头（数据为奇数字节时末尾补一个字节）
+    riff_size = 4 + len(chunks) + 8 + data_size + (data_size & 1)
+    if riff_size <= _RIFF_LIMIT:
+        return (b"RIFF" + struct.pack("<I", riff_size) + b"WAVE" + chunks
+                + b"data" + struct.pack("<I", data_size))
+    ds64 = struct.pack("<QQQI", riff_size + 36, data_size, frames, 0)
+    return (b"RF64" + struct.pack("<I", 0xFFFFFFFF) + b"WAVE"
+            + b"ds64" + struct.pack("<I", len(ds64)) + ds64 + chunks
+            + b"data" + struct.pack("<I", 0xFFFFFFFF))
+
+
+def _fade_factors(start: int, stop: int, frames: int, fade_in: int, fade_out: int, dtype):
+    """[start, stop) 帧的淡入淡出系数，不在淡入淡出区间内时返回None"""
+    if start >= fade_in and stop <= frames - fade_out:
+        return None
+    positions = np.arange(start, stop, dtype=np.float64)
+    factors = np.ones(stop - start, dtype=np.float64)
+    if fade_in:
+        # 与 pcm.PcmBuffer.fade_in 相同：第一帧为0，第 fade_in 帧为1
+        np.minimum(factors, positions / max(1, fade_in - 1), out=factors)
+    if fade_out:
+        np.minimum(factors, (frames - 1 - positions) / max(1, fade_out - 1), out=factors)
+    return factors.astype(dtype)
+
+
+def transcode(input_path: str, output_path: Path, options: ConversionOptions,
+              progress: Optional[Callable[[int], None]] = None) -> WavInfo:
+    """
+    把 wav 文件直接转换为 wav（调用前用 native_supported 检查）
+    位深默认与源文件相同，降低位深时加三角抖动（与ffmpeg路径的 dither_method=triangular 一致）；
+    progress 按百分比回调。返回源文件信息
+    """
+    info = read_info(input_path)
+    raw, samples = map_samples(input_path, info)
+    channels = options.channels or info.channels
+    bits = options.bit_depth or info.bits
+    frames = info.frames
+    fade_in = min(frames, int(options.fade_in * info.frame_rate)) if options.fade_in > 0 else 0
+    fade_out = min(frames, int(options.fade_out * info.frame_rate)) if options.fade_out > 0 else 0
+    # 位深和声道不变时，淡入淡出区间以外的数据直接复制（只重写文件头）
+    same_format = bits == info.bits and channels == info.channels and info.valid_bits == info.bits
+    # 24位以内的样本用 float32 计算（尾数足够精确表示），32位样本用 float64
+    dtype = np.float32 if info.valid_bits <= 24 and bits <= 24 else np.float64
+    dither = None
+    if bits < info.valid_bits:
+        dither = _Dither(dtype, _BLOCK_FRAMES * channels)
+    shift = 32 - bits
+    limit = (1 << (bits - 1)) - 1
+
+    partial = output_path.with_name(output_path.name + ".part")
+    try:
+        with open(partial, "wb") as f:
+            f.write(_header(channels, info.frame_rate, bits, frames))
+            for start in range(0, frames, _BLOCK_FRAMES):
+                stop = min(frames, start + _BLOCK_FRAMES)
+                factors = _fade_factors(start, stop, frames, fade_in, fade_out, dtype)
+                if same_format and factors is None:
+                    f.write(memoryview(raw[start:stop]).cast("B"))
+                else:
+                    f.write(_convert_block(samples, info, start, stop, channels, bits, shift,
+                                           limit, dither, dtype, factors))
+                if progress is not None:
+                    progress(int(stop * 100 / frames))
+            if (frames * channels * bits // 8) & 1:
+                f.write(b"\0")
+        os.replace(partial, output_path)
+    except BaseException:
+        try:
+            os.remove(partial)
+        except OSError:
+            pass
+        raise
+    return info
+
+
+class _Dither:
+    """三角分布抖动（两个均匀分布之差，幅度为 ±1 LSB），噪声预先生成一张表，每块从随机位置取用"""
+
+    def __init__(self, dtype, block_size: int):
+        self._rng = np.random.default_rng()
+        size = max(_DITHER_TABLE, 2 * block_size)
+        pairs = np.frombuffer(self._rng.bytes(2 * size), dtype=np.uint8).reshape(-1, 2)
+        self._table = pairs[:, 0].astype(dtype)
+        self._table -= pairs[:, 1]
+        self._table *= dtype(1 / 256)
+
+    def noise(self, shape):
+        count = int(np.prod(shape))
+        start = int(self._rng.integers(0, len(self._table) - count + 1))
+        return self._table[start:start + count].reshape(shape)
+
+
+def _convert_block(samples, info: WavInfo, start: int, stop: int, channels: int, bits: int,
+                   shift: int, limit: int, dither, dtype, factors) -> bytes:
+    """转换一块样本：声道混合、淡入淡出、位深转换，返回输出的小端数据"""
+    block = _block_int32(samples, info.bits, start, stop)
+    if channels != block.shape[1]:
+        if channels == 1:
+            # 立体声混合为单声道（两个声道的平均）
+            mixed = block[:, :1].astype(dtype)
+            mixed += block[:, 1:]
+            mixed *= dtype(0.5)
+            block = mixed
+        else:
+            block = np.repeat(block, channels, axis=1)
+    if factors is not None:
+        block = block * factors[:, None]
+
+    if dither is None and block.dtype == np.int32:
+        # 位深不降低且样本未经浮点计算：移位即可，结果精确
+        values = block >> shift
+    else:
+        values = block.astype(dtype)
+        values *= dtype(1.0 / (1 << shift))
+        if dither is not None:
+            values += dither.noise(values.shape)
+        np.rint(values, out=values)
+        np.clip(values, -limit - 1, limit, out=values)
+        values = values.astype(np.int32)
+
+    if bits == 16:
+        return values.astype("<i2").tobytes()
+    if bits == 24:
+        return values.astype("<i4").view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+    return values.astype("<i4").tobytes()